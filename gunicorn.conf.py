@@ -0,0 +1,18 @@
+"""
+Configuration gunicorn, lue automatiquement depuis le dossier courant.
+
+Demarrage : `gunicorn`, sans argument (un module passe en argument
+remplacerait `wsgi_app`). L'application servie est l'application ASGI, sous
+des workers uvicorn : le flux de la cuisine (/cuisine/flux/) attend dans la
+boucle d'evenements du worker au lieu d'occuper un worker par ecran ouvert.
+"""
+wsgi_app = 'restaurant_management.asgi:application'
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+
+def post_worker_init(worker):
+    # Connexion ouverte dans chaque worker, jamais dans le processus maitre :
+    # une connexion SQLite heritee d'un fork peut corrompre la base.
+    # Appele aussi par UvicornWorker, avant le demarrage de sa boucle.
+    from restaurant import sqlite
+    sqlite.prechauffer()
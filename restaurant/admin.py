@@ -1,11 +1,25 @@
 from django.contrib import admin
+from django.db.models import Q
+from django.utils import timezone
 from .models import *
+from . import occupation
+from datetime import timedelta
 
 @admin.register(Categorie)
 class CategorieAdmin(admin.ModelAdmin):
     list_display = ['nom', 'description']
     search_fields = ['nom']
 
+class PlatPrixHistoriqueInline(admin.TabularInline):
+    model = PlatPrixHistorique
+    fields = ['version', 'prix', 'valide_du', 'valide_au']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(Plat)
 class PlatAdmin(admin.ModelAdmin):
     list_display = [
@@ -17,12 +31,39 @@ class PlatAdmin(admin.ModelAdmin):
     list_filter = ['categorie', 'disponible']
     search_fields = ['nom', 'description']
     list_editable = ['disponible']
+    inlines = [PlatPrixHistoriqueInline]
+
+class OccupationTableInline(admin.TabularInline):
+    model = OccupationTable
+    fields = ['debut', 'fin', 'origine', 'commande']
+    readonly_fields = fields
+    extra = 0
+    max_num = 0
+    can_delete = False
+    ordering = ['-debut']
+    
+    def get_queryset(self, request):
+        # Les dernieres occupations seulement : le journal grossit chaque soir
+        debut = timezone.now() - timedelta(days=2)
+        return super().get_queryset(request).filter(
+            Q(fin__isnull=True) | Q(fin__gte=debut)
+        )
 
 @admin.register(Table)
 class TableAdmin(admin.ModelAdmin):
     list_display = ['numero', 'capacite', 'disponible']
     list_filter = ['disponible']
-    list_editable = ['disponible']
+    # Etat tenu par le journal d'occupation : ouvrir et liberer une table
+    # passe par les actions, jamais par le champ
+    readonly_fields = ['disponible']
+    actions = ['liberer']
+    inlines = [OccupationTableInline]
+    
+    @admin.action(description="Liberer les tables selectionnees")
+    def liberer(self, request, queryset):
+        for table_id in queryset.filter(disponible=False).values_list('pk', flat=True):
+            occupation.liberer(table_id)
+        self.message_user(request, "Tables liberees.")
 
 @admin.register(Reservation)
 class ReservationAdmin(admin.ModelAdmin):
@@ -51,6 +92,7 @@ class CommandeAdmin(admin.ModelAdmin):
         'table', 
         'serveur', 
         'statut', 
+        'montant_total',
         'date_creation'
     ]
     list_filter = ['statut', 'date_creation']
@@ -67,4 +109,50 @@ class FactureAdmin(admin.ModelAdmin):
         'date_emission'
     ]
     list_filter = ['payee', 'methode_paiement', 'date_emission']
-    search_fields = ['numero_facture']
\ No newline at end of file
+    search_fields = ['numero_facture']
+
+@admin.register(VenteJournaliere)
+class VenteJournaliereAdmin(admin.ModelAdmin):
+    list_display = [
+        'jour',
+        'methode_paiement',
+        'nombre_factures',
+        'couverts',
+        'montant_ttc',
+        'montant_encaisse'
+    ]
+    list_filter = ['methode_paiement']
+    date_hierarchy = 'jour'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Tache)
+class TacheAdmin(admin.ModelAdmin):
+    list_display = [
+        'nom',
+        'file',
+        'priorite',
+        'statut',
+        'tentatives',
+        'disponible_a',
+        'date_fin'
+    ]
+    list_filter = ['statut', 'file', 'nom']
+    search_fields = ['nom', 'cle', 'derniere_erreur']
+    readonly_fields = ['travailleur', 'bail', 'date_creation', 'date_fin']
+    actions = ['relancer']
+    
+    @admin.action(description="Relancer les taches selectionnees")
+    def relancer(self, request, queryset):
+        nombre = queryset.exclude(statut='EN_COURS').update(
+            statut='EN_ATTENTE',
+            tentatives=0,
+            disponible_a=timezone.now(),
+            date_fin=None
+        )
+        self.message_user(request, f"{nombre} tache(s) remise(s) en file.")
@@ -0,0 +1,346 @@
+"""
+Analyses des ventes sur une periode : chiffre d'affaires et volumes par
+plat, categorie, serveur, service, heure et jour de la semaine, rotation
+des tables, ticket moyen et reservations.
+
+Les ventes sont rattachees a la date de leur facture, comme le cumul
+journalier (ventes.py) : les totaux concordent avec le tableau de bord.
+
+Les agregats sont calcules en base par des GROUP BY (voir _lire) et gardes
+par jour. Le resultat d'un jour clos (anterieur a aujourd'hui) est mis en
+cache ; un rapport ne relit en base que les jours absents du cache et le
+jour en cours, puis cumule les jours en Python. Les signaux de Facture et
+Reservation oublient le jour modifie (et l'ancien jour d'une reservation
+deplacee), avant et apres le commit ; les autres corrections (items d'une
+commande payee, SQL) attendent l'expiration (ANALYSES_CACHE_DUREE).
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import (
+    Count, DecimalField, DurationField, ExpressionWrapper, F, FloatField, Func, Sum, Value
+)
+from django.db.models.functions import Extract, TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import Facture, ItemCommande, Plat, Reservation, Table
+from .utils import bornes_jour
+
+# A incrementer si le contenu des jours en cache change
+VERSION = 1
+JOURS_SEMAINE = ('Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche')
+# Heure de fin du service du midi (heure locale de la facture)
+FIN_MIDI = 16
+ZERO = Decimal('0.00')
+DIMENSIONS = ('plats', 'serveurs', 'heures', 'tables', 'reservations')
+# Nombre maximal de jours d'un rapport
+PERIODE_MAX = 366
+
+
+def duree_cache():
+    return getattr(settings, 'ANALYSES_CACHE_DUREE', 30 * 24 * 3600)
+
+
+def cle_jour(jour):
+    return f'analyses:{VERSION}:{jour.isoformat()}'
+
+
+def invalider(jour):
+    cle = cle_jour(jour)
+    cache.delete(cle)
+    # Et de nouveau apres le commit : un rapport concurrent a pu remettre
+    # l'ancien contenu du jour en cache entre-temps
+    transaction.on_commit(lambda: cache.delete(cle))
+
+
+def _montant(expression):
+    return Sum(ExpressionWrapper(
+        expression, output_field=DecimalField(max_digits=14, decimal_places=2)
+    ))
+
+
+def _julien(champ):
+    return Func(F(champ), function='JULIANDAY', output_field=FloatField())
+
+
+def _jours_entre(debut, fin):
+    """Duree de `debut` a `fin` (deux DateTimeField), en jours"""
+    if connection.vendor == 'sqlite':
+        # Fonction native de SQLite : la soustraction de deux DateTimeField
+        # passerait par une fonction Python (django_timestamp_diff) par ligne
+        return _julien(fin) - _julien(debut)
+    # PostgreSQL : intervalle natif, converti en secondes
+    return Extract(
+        ExpressionWrapper(F(fin) - F(debut), output_field=DurationField()),
+        'epoch', output_field=FloatField()
+    ) / Value(86400.0)
+
+
+def _ajouter(cumul, cle, valeurs):
+    if cle in cumul:
+        cumul[cle] = tuple(
+            total if valeur is None else total + valeur
+            for total, valeur in zip(cumul[cle], valeurs)
+        )
+    else:
+        cumul[cle] = valeurs
+
+
+def _lire(jours):
+    """{jour: {dimension: {cle: valeurs}}} des `jours` (consecutifs), lus en base"""
+    fuseau = timezone.get_current_timezone()
+    debut, fin = bornes_jour(jours[0])[0], bornes_jour(jours[-1])[1]
+    donnees = {
+        jour: {dimension: {} for dimension in DIMENSIONS} for jour in jours
+    }
+
+    # Factures : une requete par heure locale, serveur et table. Le fuseau
+    # est applique par une fonction Python de SQLite, une fois par ligne lue :
+    # jour, heure, serveur et table sortent tous de cette seule conversion.
+    factures = Facture.objects.filter(
+        date_emission__gte=debut, date_emission__lt=fin
+    ).order_by().annotate(
+        heure=TruncHour('date_emission', tzinfo=fuseau)
+    ).values('heure', 'commande__serveur_id', 'commande__table_id').annotate(
+        nombre=Count('id'),
+        couverts=Sum('commande__couverts'),
+        ht=Sum('montant_total'),
+        ttc=Sum('montant_ttc'),
+        # De l'ouverture de la commande a sa facture, en jours
+        occupation=Sum(
+            _jours_entre('commande__date_creation', 'date_emission'),
+            output_field=FloatField()
+        ),
+    ).values_list(
+        'heure', 'commande__serveur_id', 'commande__table_id',
+        'nombre', 'couverts', 'ht', 'ttc', 'occupation'
+    )
+    for heure, serveur, table, nombre, couverts, ht, ttc, occupation in factures:
+        jour = donnees.get(heure.date())
+        if jour is None:
+            continue
+        _ajouter(jour['heures'], heure.hour, (nombre, couverts or 0, ht, ttc))
+        _ajouter(jour['serveurs'], serveur, (nombre, couverts or 0, ht))
+        _ajouter(jour['tables'], table, (nombre, timedelta(days=occupation or 0)))
+
+    # Items : une requete par jour, sur l'index de date des factures, plutot
+    # qu'une conversion de fuseau par item
+    for jour in jours:
+        debut_jour, fin_jour = bornes_jour(jour)
+        donnees[jour]['plats'] = {
+            plat_id: (quantite, montant)
+            for plat_id, quantite, montant in ItemCommande.objects.filter(
+                commande__facture__date_emission__gte=debut_jour,
+                commande__facture__date_emission__lt=fin_jour,
+            ).order_by().values('plat_id').annotate(
+                quantite_vendue=Sum('quantite'),
+                montant=_montant(F('quantite') * F('prix_unitaire')),
+            ).values_list('plat_id', 'quantite_vendue', 'montant')
+        }
+
+    reservations = Reservation.objects.filter(
+        date_reservation__gte=debut, date_reservation__lt=fin
+    ).order_by().annotate(
+        jour=TruncDate('date_reservation', tzinfo=fuseau)
+    ).values('jour', 'statut').annotate(
+        nombre=Count('id'),
+        personnes=Sum('nombre_personnes'),
+    ).values_list('jour', 'statut', 'nombre', 'personnes')
+    for jour, statut, nombre, personnes in reservations:
+        if jour in donnees:
+            donnees[jour]['reservations'][statut] = (nombre, personnes)
+    return donnees
+
+
+def donnees_jours(du, au):
+    """{jour: {dimension: {cle: valeurs}}} des jours `du` a `au` inclus.
+
+    Les jours clos viennent du cache ; les manquants et le jour en cours
+    sont relus en base, sur l'intervalle qui les couvre.
+    """
+    aujourd_hui = timezone.localdate()
+    jours = [du + timedelta(days=n) for n in range((au - du).days + 1)]
+    en_cache = cache.get_many([cle_jour(jour) for jour in jours if jour < aujourd_hui])
+    donnees = {
+        jour: en_cache[cle_jour(jour)] for jour in jours if cle_jour(jour) in en_cache
+    }
+    manquants = [jour for jour in jours if jour not in donnees]
+    if manquants:
+        relus = _lire([
+            manquants[0] + timedelta(days=n)
+            for n in range((manquants[-1] - manquants[0]).days + 1)
+        ])
+        donnees.update((jour, relus[jour]) for jour in manquants)
+        cache.set_many(
+            {cle_jour(jour): relus[jour] for jour in relus if jour < aujourd_hui},
+            duree_cache()
+        )
+    return donnees
+
+
+def _cumuler(donnees, dimension, *zeros):
+    """{cle: [sommes]} de la dimension sur tous les jours ; `zeros` donne la
+    valeur initiale de chaque somme"""
+    cumul = defaultdict(lambda: list(zeros))
+    for jour in donnees.values():
+        for cle, valeurs in jour[dimension].items():
+            sommes = cumul[cle]
+            for indice, valeur in enumerate(valeurs):
+                if valeur is not None:
+                    sommes[indice] += valeur
+    return cumul
+
+
+def _part(valeur, total):
+    return round(100 * valeur / total, 1) if total else 0
+
+
+def _moyenne(total, nombre):
+    return total / nombre if nombre else ZERO
+
+
+def rapport(du, au):
+    """Analyses des jours `du` a `au` inclus ; dictionnaire pret pour le template"""
+    donnees = donnees_jours(du, au)
+    nombre_jours = len(donnees)
+
+    # Totaux et repartitions temporelles : depuis les lignes par heure
+    heures = _cumuler(donnees, 'heures', 0, 0, ZERO, ZERO)
+    factures = sum(valeurs[0] for valeurs in heures.values())
+    couverts = sum(valeurs[1] for valeurs in heures.values())
+    montant = sum((valeurs[2] for valeurs in heures.values()), ZERO)
+    montant_ttc = sum((valeurs[3] for valeurs in heures.values()), ZERO)
+
+    services = {'Midi': [0, ZERO], 'Soir': [0, ZERO]}
+    for heure, (nombre, _, montant_heure, _) in heures.items():
+        service = services['Midi' if heure < FIN_MIDI else 'Soir']
+        service[0] += nombre
+        service[1] += montant_heure
+
+    semaine = [[0, ZERO, 0] for _ in JOURS_SEMAINE]
+    for jour, lignes in donnees.items():
+        cumul = semaine[jour.weekday()]
+        cumul[2] += 1
+        for nombre, _, montant_heure, _ in lignes['heures'].values():
+            cumul[0] += nombre
+            cumul[1] += montant_heure
+
+    # Libelles lus a part : un renommage s'applique aussi aux jours en cache
+    plats = _cumuler(donnees, 'plats', 0, ZERO)
+    noms_plats = {
+        pk: (nom, categorie) for pk, nom, categorie in Plat.objects.filter(
+            pk__in=plats
+        ).values_list('pk', 'nom', 'categorie__nom')
+    }
+    categories = defaultdict(lambda: [0, ZERO])
+    for pk, (quantite, montant_plat) in plats.items():
+        cumul = categories[noms_plats.get(pk, ('', "Plat supprime"))[1]]
+        cumul[0] += quantite
+        cumul[1] += montant_plat
+
+    serveurs = _cumuler(donnees, 'serveurs', 0, 0, ZERO)
+    noms_serveurs = {
+        pk: (f'{prenom} {nom}'.strip() or identifiant)
+        for pk, prenom, nom, identifiant in User.objects.filter(
+            pk__in=[pk for pk in serveurs if pk]
+        ).values_list('pk', 'first_name', 'last_name', 'username')
+    }
+
+    tables = _cumuler(donnees, 'tables', 0, timedelta())
+    numeros = dict(Table.objects.filter(pk__in=tables).values_list('pk', 'numero'))
+    occupation_totale = sum((valeurs[1] for valeurs in tables.values()), timedelta())
+
+    reservations = _cumuler(donnees, 'reservations', 0, 0)
+    nombre_reservations = sum(valeurs[0] for valeurs in reservations.values())
+
+    return {
+        'du': du,
+        'au': au,
+        'jours': nombre_jours,
+        'totaux': {
+            'factures': factures,
+            'couverts': couverts,
+            'montant_ht': montant,
+            'montant_ttc': montant_ttc,
+            'ticket_moyen': _moyenne(montant, factures),
+            'ticket_par_couvert': _moyenne(montant, couverts),
+            'factures_par_jour': round(factures / nombre_jours, 1) if nombre_jours else 0,
+        },
+        'plats': sorted((
+            {
+                'nom': noms_plats.get(pk, ("Plat supprime", ''))[0],
+                'categorie': noms_plats.get(pk, ('', ''))[1],
+                'quantite': quantite,
+                'montant': montant_plat,
+                'part': _part(montant_plat, montant),
+            }
+            for pk, (quantite, montant_plat) in plats.items()
+        ), key=lambda ligne: ligne['montant'], reverse=True),
+        'categories': sorted((
+            {
+                'nom': nom,
+                'quantite': quantite,
+                'montant': montant_categorie,
+                'part': _part(montant_categorie, montant),
+            }
+            for nom, (quantite, montant_categorie) in categories.items()
+        ), key=lambda ligne: ligne['montant'], reverse=True),
+        'serveurs': sorted((
+            {
+                'nom': noms_serveurs.get(pk, "Sans serveur"),
+                'factures': nombre,
+                'couverts': couverts_serveur,
+                'montant': montant_serveur,
+                'ticket_moyen': _moyenne(montant_serveur, nombre),
+                'part': _part(montant_serveur, montant),
+            }
+            for pk, (nombre, couverts_serveur, montant_serveur) in serveurs.items()
+        ), key=lambda ligne: ligne['montant'], reverse=True),
+        'services': [
+            {'nom': nom, 'factures': nombre, 'montant': montant_service,
+             'part': _part(montant_service, montant)}
+            for nom, (nombre, montant_service) in services.items()
+        ],
+        'heures': [
+            {'heure': heure, 'factures': valeurs[0], 'couverts': valeurs[1],
+             'montant': valeurs[2], 'part': _part(valeurs[2], montant)}
+            for heure, valeurs in sorted(heures.items())
+        ],
+        'jours_semaine': [
+            {'nom': nom, 'jours': nombre_jours_semaine, 'factures': nombre,
+             'montant': montant_jour, 'moyenne': _moyenne(montant_jour, nombre_jours_semaine)}
+            for nom, (nombre, montant_jour, nombre_jours_semaine) in zip(JOURS_SEMAINE, semaine)
+        ],
+        'tables': sorted((
+            {
+                'numero': numeros.get(pk),
+                'commandes': nombre,
+                'rotation': round(nombre / nombre_jours, 2) if nombre_jours else 0,
+                'duree_moyenne': round(occupation.total_seconds() / 60 / nombre) if nombre else 0,
+            }
+            for pk, (nombre, occupation) in tables.items()
+        ), key=lambda ligne: ligne['numero'] or 0),
+        'rotation': {
+            'commandes_par_table_par_jour': (
+                round(factures / len(tables) / nombre_jours, 2) if tables and nombre_jours else 0
+            ),
+            'duree_moyenne': (
+                round(occupation_totale.total_seconds() / 60 / factures) if factures else 0
+            ),
+        },
+        'reservations': {
+            'nombre': nombre_reservations,
+            'personnes_moyen': round(
+                sum(valeurs[1] for valeurs in reservations.values()) / nombre_reservations, 1
+            ) if nombre_reservations else 0,
+            'par_statut': {statut: valeurs[0] for statut, valeurs in sorted(reservations.items())},
+            'taux_annulation': _part(
+                reservations.get('ANNULEE', [0])[0], nombre_reservations
+            ),
+        },
+    }
@@ -0,0 +1,415 @@
+"""
+API JSON en lecture pour les tablettes de salle.
+
+GET /api/<ressource>/ et /api/<ressource>/<id>/, ressources : categories,
+plats, tables, commandes, items, reservations, factures.
+
+- `?fields=id,statut` : seulement ces champs, et seulement ces colonnes
+  lues en base ;
+- `?expand=table,items.plat` : objets lies inclus. Une cle etrangere est
+  jointe a la requete principale, une relation inverse (items d'une
+  commande) coute une requete pour toute la page, jamais une par ligne ;
+- pagination par curseur (`?curseur=`, `?limite=`, voir pagination.py) ;
+- filtres propres a chaque ressource (`?statut=`, `?table=`...).
+
+Les lignes sont lues par .values() et converties a la main (montants en
+chaine, dates ISO 8601), sans instancier de modeles. Chaque reponse porte
+un ETag (304 si If-None-Match correspond ; pour le menu, l'ETag vient de
+la version du cache et le 304 ne coute aucune requete), et est compressee
+en brotli si le paquet `brotli` est installe, en gzip sinon.
+"""
+import hashlib
+import json
+import re
+
+from django.core.files.storage import default_storage
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.dateparse import parse_date
+from django.utils.text import compress_string
+
+from . import cache_menu
+from .models import Categorie, Commande, Facture, ItemCommande, Plat, Reservation, Table
+from .pagination import paginer
+from .utils import bornes_jour
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+LIMITE = 50
+LIMITE_MAX = 200
+TAILLE_MIN_COMPRESSION = 200
+
+_ACCEPTE_BROTLI = re.compile(r'\bbr\b')
+_ACCEPTE_GZIP = re.compile(r'\bgzip\b')
+
+
+class ErreurApi(Exception):
+    def __init__(self, message, statut=400):
+        self.statut = statut
+        super().__init__(message)
+
+
+def _texte(valeur):
+    # Decimal : str() garde toutes les decimales, sans passer par float
+    return str(valeur)
+
+
+def _date(valeur):
+    return valeur.isoformat()
+
+
+def _image(nom):
+    return default_storage.url(nom) if nom else None
+
+
+def _egal(chemin, conversion=str):
+    def filtre(valeur):
+        try:
+            return {chemin: conversion(valeur)}
+        except ValueError:
+            raise ErreurApi(f"Valeur invalide : {valeur!r}")
+    return filtre
+
+
+def _booleen(chemin):
+    def conversion(valeur):
+        if valeur not in ('0', '1', 'true', 'false'):
+            raise ValueError(valeur)
+        return valeur in ('1', 'true')
+    return _egal(chemin, conversion)
+
+
+def _jour(chemin):
+    def filtre(valeur):
+        try:
+            jour = parse_date(valeur)
+            if jour is None:
+                raise ValueError(valeur)
+            debut, fin = bornes_jour(jour)
+        except (ValueError, OverflowError):
+            raise ErreurApi("Date invalide, format attendu : AAAA-MM-JJ")
+        return {f'{chemin}__gte': debut, f'{chemin}__lt': fin}
+    return filtre
+
+
+class Ressource:
+    """Description d'une ressource de l'API.
+
+    `champs` : {nom: (chemin ORM, conversion ou None)} ; `relations` : cles
+    etrangeres depliables {nom: (ressource, chemin)} ; `enfants` : relations
+    inverses depliables {nom: (ressource, cle etrangere de l'enfant)}.
+    `tri` est la date de la pagination, ou 'id'. `version()` donne, si
+    elle est definie, une version des donnees qui suffit a l'ETag.
+    """
+
+    def __init__(self, modele, champs, tri='id', relations=None, enfants=None,
+                 filtres=None, version=None):
+        self.modele = modele
+        self.champs = champs
+        self.tri = tri
+        self.relations = relations or {}
+        self.enfants = enfants or {}
+        self.filtres = filtres or {}
+        self.version = version
+
+
+RESSOURCES = {
+    'categories': Ressource(Categorie, {
+        'id': ('id', None),
+        'nom': ('nom', None),
+        'description': ('description', None),
+    }, version=cache_menu.version_menu),
+    'plats': Ressource(Plat, {
+        'id': ('id', None),
+        'nom': ('nom', None),
+        'description': ('description', None),
+        'prix': ('prix', _texte),
+        'categorie': ('categorie_id', None),
+        'disponible': ('disponible', None),
+        'image': ('image', _image),
+    }, relations={
+        'categorie': ('categories', 'categorie'),
+    }, filtres={
+        'categorie': _egal('categorie_id', int),
+        'disponible': _booleen('disponible'),
+    }, version=cache_menu.version_menu),
+    'tables': Ressource(Table, {
+        'id': ('id', None),
+        'numero': ('numero', None),
+        'capacite': ('capacite', None),
+        'disponible': ('disponible', None),
+    }, filtres={
+        'disponible': _booleen('disponible'),
+    }),
+    'commandes': Ressource(Commande, {
+        'id': ('id', None),
+        'table': ('table_id', None),
+        'serveur': ('serveur_id', None),
+        'statut': ('statut', None),
+        'couverts': ('couverts', None),
+        'notes': ('notes', None),
+        'total': ('montant_total', _texte),
+        'nombre_items': ('nombre_items', None),
+        'date_creation': ('date_creation', _date),
+        'date_modification': ('date_modification', _date),
+    }, tri='date_creation', relations={
+        'table': ('tables', 'table'),
+    }, enfants={
+        'items': ('items', 'commande_id'),
+    }, filtres={
+        'statut': _egal('statut'),
+        'table': _egal('table_id', int),
+        'serveur': _egal('serveur_id', int),
+        'date': _jour('date_creation'),
+    }),
+    'items': Ressource(ItemCommande, {
+        'id': ('id', None),
+        'commande': ('commande_id', None),
+        'plat': ('plat_id', None),
+        'quantite': ('quantite', None),
+        'prix_unitaire': ('prix_unitaire', _texte),
+        'notes': ('notes', None),
+    }, relations={
+        'plat': ('plats', 'plat'),
+        'commande': ('commandes', 'commande'),
+    }, filtres={
+        'commande': _egal('commande_id', int),
+    }),
+    'reservations': Ressource(Reservation, {
+        'id': ('id', None),
+        'client_nom': ('client_nom', None),
+        'client_telephone': ('client_telephone', None),
+        'client_email': ('client_email', None),
+        'table': ('table_id', None),
+        'nombre_personnes': ('nombre_personnes', None),
+        'date_reservation': ('date_reservation', _date),
+        'date_fin': ('date_fin', _date),
+        'statut': ('statut', None),
+        'notes': ('notes', None),
+    }, tri='date_reservation', relations={
+        'table': ('tables', 'table'),
+    }, filtres={
+        'statut': _egal('statut'),
+        'table': _egal('table_id', int),
+        'date': _jour('date_reservation'),
+    }),
+    'factures': Ressource(Facture, {
+        'id': ('id', None),
+        'numero': ('numero_facture', None),
+        'commande': ('commande_id', None),
+        'montant_ht': ('montant_total', _texte),
+        'tva': ('tva', _texte),
+        'montant_ttc': ('montant_ttc', _texte),
+        'methode_paiement': ('methode_paiement', None),
+        'payee': ('payee', None),
+        'date_emission': ('date_emission', _date),
+    }, tri='date_emission', relations={
+        'commande': ('commandes', 'commande'),
+    }, filtres={
+        'payee': _booleen('payee'),
+        'methode_paiement': _egal('methode_paiement'),
+        'date': _jour('date_emission'),
+    }),
+}
+
+
+def analyser_expand(texte):
+    """'table,items.plat' -> {'table': {}, 'items': {'plat': {}}}"""
+    arbre = {}
+    for chemin in filter(None, (texte or '').split(',')):
+        noeud = arbre
+        for nom in chemin.strip().split('.'):
+            noeud = noeud.setdefault(nom, {})
+    return arbre
+
+
+def _plan(ressource, champs, expand, prefixe=''):
+    """Colonnes [(cles de sortie, chemin ORM, conversion)] et relations
+    inverses [(nom, ressource, cle etrangere, expand)] a lire"""
+    colonnes, enfants = [], []
+    for nom in champs:
+        if nom in expand:
+            continue
+        chemin, conversion = ressource.champs[nom]
+        colonnes.append(((nom,), prefixe + chemin, conversion))
+    for nom, sous_expand in expand.items():
+        if nom in ressource.relations:
+            cible, chemin = ressource.relations[nom]
+            cible = RESSOURCES[cible]
+            sous_colonnes, _ = _plan(
+                cible, list(cible.champs), sous_expand, f'{prefixe}{chemin}__'
+            )
+            colonnes += [((nom,) + cles, orm, conversion) for cles, orm, conversion in sous_colonnes]
+        elif nom in ressource.enfants:
+            if prefixe:
+                raise ErreurApi(f"'{nom}' ne peut etre deplie que sur la ressource demandee")
+            cible, cle = ressource.enfants[nom]
+            enfants.append((nom, RESSOURCES[cible], cle, sous_expand))
+        else:
+            raise ErreurApi(f"Relation inconnue : {nom}")
+    return colonnes, enfants
+
+
+def _construire(ligne, colonnes):
+    objet = {}
+    for cles, chemin, conversion in colonnes:
+        valeur = ligne[chemin]
+        if conversion is not None and valeur is not None:
+            valeur = conversion(valeur)
+        cible = objet
+        for cle in cles[:-1]:
+            cible = cible.setdefault(cle, {})
+        cible[cles[-1]] = valeur
+    return objet
+
+
+def _vider_relations_nulles(objet, expand):
+    # Cle etrangere nulle : l'objet deplie est null, pas un objet de null
+    for nom, sous_expand in expand.items():
+        valeur = objet.get(nom)
+        if isinstance(valeur, dict):
+            if valeur.get('id', True) is None:
+                objet[nom] = None
+            else:
+                _vider_relations_nulles(valeur, sous_expand)
+
+
+def _serialiser(ressource, lignes, colonnes, enfants, expand):
+    objets = [_construire(ligne, colonnes) for ligne in lignes]
+    for objet in objets:
+        _vider_relations_nulles(objet, expand)
+    for nom, cible, cle, sous_expand in enfants:
+        ids = [ligne['id'] for ligne in lignes]
+        par_parent = {}
+        for enfant in lire(cible, cible.modele.objects.filter(**{f'{cle}__in': ids}),
+                           list(cible.champs), sous_expand, cle_parent=cle):
+            par_parent.setdefault(enfant.pop('_parent'), []).append(enfant)
+        for objet, ligne in zip(objets, lignes):
+            objet[nom] = par_parent.get(ligne['id'], [])
+    return objets
+
+
+def lire(ressource, queryset, champs, expand, cle_parent=None):
+    """Objets serialises de tout le queryset (relations inverses depliees)"""
+    colonnes, enfants = _plan(ressource, champs, expand)
+    chemins = {orm for _, orm, _ in colonnes} | {'id'}
+    if cle_parent:
+        colonnes.append((('_parent',), cle_parent, None))
+        chemins.add(cle_parent)
+    lignes = list(queryset.order_by('id').values(*chemins))
+    return _serialiser(ressource, lignes, colonnes, enfants, expand)
+
+
+def _champs_demandes(ressource, texte):
+    if not texte:
+        return list(ressource.champs)
+    champs = [nom.strip() for nom in texte.split(',') if nom.strip()]
+    inconnus = [nom for nom in champs if nom not in ressource.champs]
+    if inconnus:
+        raise ErreurApi(f"Champ(s) inconnu(s) : {', '.join(inconnus)}")
+    return champs
+
+
+def _filtrer(ressource, queryset, parametres):
+    for parametre, filtre in ressource.filtres.items():
+        valeur = parametres.get(parametre)
+        if valeur:
+            queryset = queryset.filter(**filtre(valeur))
+    return queryset
+
+
+def donnees(nom, parametres, pk=None):
+    """Contenu de la reponse : un objet (pk) ou une page de la liste"""
+    ressource = RESSOURCES.get(nom)
+    if ressource is None:
+        raise ErreurApi(f"Ressource inconnue : {nom}", 404)
+    champs = _champs_demandes(ressource, parametres.get('fields'))
+    expand = analyser_expand(parametres.get('expand'))
+    colonnes, enfants = _plan(ressource, champs, expand)
+    chemins = {orm for _, orm, _ in colonnes} | {'id', ressource.tri}
+    queryset = ressource.modele.objects.all()
+
+    if pk is not None:
+        lignes = list(queryset.filter(pk=pk).values(*chemins))
+        if not lignes:
+            raise ErreurApi("Objet introuvable", 404)
+        return _serialiser(ressource, lignes, colonnes, enfants, expand)[0]
+
+    try:
+        limite = min(int(parametres.get('limite', LIMITE)), LIMITE_MAX)
+    except ValueError:
+        raise ErreurApi("limite doit etre un entier")
+    if limite < 1:
+        raise ErreurApi("limite doit etre positive")
+    page = paginer(
+        _filtrer(ressource, queryset, parametres).values(*chemins),
+        ressource.tri, parametres.get('curseur'), limite
+    )
+    return {
+        'resultats': _serialiser(ressource, page.object_list, colonnes, enfants, expand),
+        'curseur_suivant': page.curseur_suivant or None,
+        'curseur_precedent': page.curseur_precedent or None,
+    }
+
+
+def _etag(contenu):
+    return 'W/"%s"' % hashlib.md5(contenu, usedforsecurity=False).hexdigest()
+
+
+def compresser(request, response):
+    """Compresse le corps selon Accept-Encoding : brotli, sinon gzip"""
+    if len(response.content) < TAILLE_MIN_COMPRESSION or response.has_header('Content-Encoding'):
+        return response
+    patch_vary_headers(response, ('Accept-Encoding',))
+    accepte = request.headers.get('Accept-Encoding', '')
+    if brotli is not None and _ACCEPTE_BROTLI.search(accepte):
+        # Qualite moyenne : l'essentiel du gain pour une fraction du temps
+        contenu, encodage = brotli.compress(response.content, quality=5), 'br'
+    elif _ACCEPTE_GZIP.search(accepte):
+        contenu, encodage = compress_string(response.content), 'gzip'
+    else:
+        return response
+    if len(contenu) < len(response.content):
+        response.content = contenu
+        response['Content-Encoding'] = encodage
+        response['Content-Length'] = str(len(contenu))
+    return response
+
+
+def repondre(request, nom, pk=None):
+    """Reponse HTTP complete de l'API : authentification, ETag, compression"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'erreur': "Authentification requise"}, status=401)
+
+    ressource = RESSOURCES.get(nom)
+    etag = None
+    if ressource is not None and ressource.version is not None:
+        # Donnees du menu : la version du cache et l'URL suffisent
+        etag = 'W/"menu-%s-%s"' % (ressource.version(), hashlib.md5(
+            request.get_full_path().encode(), usedforsecurity=False
+        ).hexdigest())
+        reponse_conditionnelle = get_conditional_response(request, etag=etag)
+        if reponse_conditionnelle is not None:
+            reponse_conditionnelle['ETag'] = etag
+            return reponse_conditionnelle
+
+    try:
+        contenu = donnees(nom, request.GET, pk)
+    except ErreurApi as e:
+        return JsonResponse({'erreur': str(e)}, status=e.statut)
+
+    corps = json.dumps(contenu, ensure_ascii=False, separators=(',', ':')).encode()
+    etag = etag or _etag(corps)
+    reponse_conditionnelle = get_conditional_response(request, etag=etag)
+    if reponse_conditionnelle is not None:
+        reponse_conditionnelle['ETag'] = etag
+        return reponse_conditionnelle
+
+    response = HttpResponse(corps, content_type='application/json')
+    response['ETag'] = etag
+    # Toujours revalider : les commandes changent d'une seconde a l'autre
+    patch_cache_control(response, private=True, no_cache=True)
+    return compresser(request, response)
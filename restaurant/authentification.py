@@ -0,0 +1,35 @@
+"""
+Utilisateur connecte lu dans le cache.
+
+A chaque requete authentifiee, AuthenticationMiddleware recharge
+l'utilisateur de la session : une requete sur auth_user. Avec un cache
+partage entre workers (setting CACHE_PARTAGE), UtilisateurCacheBackend le
+garde en cache UTILISATEUR_CACHE_DUREE secondes ; les signaux de User
+suppriment l'entree a chaque save() ou delete().
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+
+def cle_utilisateur(user_id):
+    return f'auth:utilisateur:{user_id}'
+
+
+def oublier_utilisateur(user_id):
+    cache.delete(cle_utilisateur(user_id))
+
+
+class UtilisateurCacheBackend(ModelBackend):
+    def get_user(self, user_id):
+        cle = cle_utilisateur(user_id)
+        user = cache.get(cle)
+        if user is None:
+            UserModel = get_user_model()
+            try:
+                user = UserModel._default_manager.get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            cache.set(cle, user, getattr(settings, 'UTILISATEUR_CACHE_DUREE', 300))
+        return user if self.user_can_authenticate(user) else None
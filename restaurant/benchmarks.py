@@ -0,0 +1,124 @@
+"""
+Outils communs aux commandes de benchmark (bench_*).
+
+Les benchmarks tournent sur une base temporaire creee comme celle de
+`manage.py test`, jamais sur la base configuree.
+"""
+import gc
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.db import connection
+
+from .instrumentation import ChronoSQL
+
+
+@contextmanager
+def base_temporaire(verbosity=0):
+    """Cree la base de test, migree et vide ; la detruit a la sortie"""
+    nom_original = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, serialize=False
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(nom_original, verbosity)
+
+
+def percentile(valeurs, p):
+    if len(valeurs) < 2:
+        return valeurs[0] if valeurs else 0.0
+    return statistics.quantiles(valeurs, n=100, method='inclusive')[p - 1]
+
+
+def resume_latences(latences):
+    """Texte 'p50 / p95 / max' en millisecondes"""
+    return (
+        f"p50 {percentile(latences, 50) * 1000:.1f} ms, "
+        f"p95 {percentile(latences, 95) * 1000:.1f} ms, "
+        f"max {max(latences, default=0) * 1000:.1f} ms"
+    )
+
+
+def mesurer_vue(client, methode, preparer, repetitions=10, **extra):
+    """Mesure une vue appelee `repetitions` fois apres un appel de chauffe.
+
+    `preparer()` retourne (url, donnees) ; il est appele avant chaque appel,
+    hors mesure, et peut creer les objets qu'une vue modifie. Retourne le
+    code HTTP, le nombre maximal de requetes SQL, les meilleurs temps total
+    et SQL (ms ; le minimum est bien moins sensible que la moyenne a la
+    charge de la machine) et le pic de memoire allouee (Kio).
+    """
+    def appeler(url, donnees):
+        return getattr(client, methode)(url, donnees or {}, **extra)
+
+    _consommer(appeler(*preparer()))
+    requetes, temps, temps_sql = [], [], []
+    for _ in range(repetitions):
+        url, donnees = preparer()
+        chrono = ChronoSQL()
+        gc.collect()
+        gc.disable()
+        try:
+            with connection.execute_wrapper(chrono):
+                debut = time.perf_counter()
+                reponse = appeler(url, donnees)
+                _consommer(reponse)
+                temps.append(time.perf_counter() - debut)
+        finally:
+            gc.enable()
+        requetes.append(chrono.requetes)
+        temps_sql.append(chrono.duree)
+
+    # Passe separee : tracemalloc ralentit fortement l'execution
+    url, donnees = preparer()
+    tracemalloc.start()
+    try:
+        _consommer(appeler(url, donnees))
+        _, pic = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'statut': reponse.status_code,
+        'requetes': max(requetes),
+        'temps_ms': round(min(temps) * 1000, 2),
+        'sql_ms': round(min(temps_sql) * 1000, 2),
+        'memoire_kio': round(pic / 1024, 1),
+    }
+
+
+def _consommer(reponse):
+    # Le contenu d'une reponse en flux est produit pendant sa lecture
+    if getattr(reponse, 'streaming', False):
+        for _ in reponse.streaming_content:
+            pass
+
+
+def comparer(mesures, reference, seuil=0.5, marge_ms=5.0):
+    """Ecarts des mesures par rapport a la reference, en texte.
+
+    Une vue echoue si elle depasse son budget de requetes (`budget_requetes`
+    de la reference, a defaut le nombre de requetes enregistre), ou si son
+    temps total, son temps SQL ou sa memoire depassent la reference de plus
+    de `seuil` (plus `marge_ms` pour les temps, contre le bruit de mesure).
+    Les temps et la memoire absents de la reference ne sont pas compares.
+    """
+    echecs = []
+    for nom, mesure in sorted(mesures.items()):
+        attendu = reference.get(nom)
+        if attendu is None:
+            continue
+        budget = attendu.get('budget_requetes', attendu['requetes'])
+        if mesure['requetes'] > budget:
+            echecs.append(f"{nom} : {mesure['requetes']} requetes (budget {budget})")
+        for cle, marge in (('temps_ms', marge_ms), ('sql_ms', marge_ms), ('memoire_kio', 64)):
+            if cle not in attendu:
+                continue
+            limite = attendu[cle] * (1 + seuil) + marge
+            if mesure[cle] > limite:
+                echecs.append(f"{nom} : {cle} {mesure[cle]} > {limite:.1f} (reference {attendu[cle]})")
+    return echecs
@@ -0,0 +1,108 @@
+"""
+Cache du menu public.
+
+Toutes les entrees sont prefixees par un numero de version du menu,
+incremente (par les signaux de Plat et Categorie) a chaque modification :
+une modification invalide d'un coup les resultats de requetes et les
+fragments HTML, sans avoir a connaitre les cles a supprimer.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+
+from . import recherche
+from .models import Categorie, Plat
+
+CLE_VERSION = 'menu:version'
+CLE_MODIFICATION = 'menu:modification'
+
+
+def duree_cache():
+    return getattr(settings, 'MENU_CACHE_DUREE', 300)
+
+
+def etat_menu():
+    """Retourne (version, timestamp de derniere modification)"""
+    etat = cache.get_many([CLE_VERSION, CLE_MODIFICATION])
+    if CLE_VERSION not in etat or CLE_MODIFICATION not in etat:
+        return _initialiser()
+    return etat[CLE_VERSION], etat[CLE_MODIFICATION]
+
+
+def version_menu():
+    return etat_menu()[0]
+
+
+def derniere_modification():
+    return datetime.fromtimestamp(etat_menu()[1], tz=dt_timezone.utc)
+
+
+def incrementer_version():
+    """Invalide tout le cache du menu"""
+    try:
+        cache.incr(CLE_VERSION)
+    except ValueError:
+        _initialiser()
+    else:
+        cache.set(CLE_MODIFICATION, int(time.time()), duree_cache())
+
+
+def _initialiser():
+    # Une version derivee de l'heure ne reprend jamais une valeur deja
+    # servie (et donc un ETag deja connu des navigateurs) apres expiration
+    maintenant = int(time.time())
+    cache.add(CLE_VERSION, maintenant, duree_cache())
+    cache.add(CLE_MODIFICATION, maintenant, duree_cache())
+    return cache.get(CLE_VERSION, maintenant), cache.get(CLE_MODIFICATION, maintenant)
+
+
+def _en_cache(nom, calcul):
+    cle = f'menu:{version_menu()}:{nom}'
+    valeur = cache.get(cle)
+    if valeur is None:
+        valeur = calcul()
+        cache.set(cle, valeur, duree_cache())
+    return valeur
+
+
+def categories():
+    return _en_cache('categories', lambda: list(Categorie.objects.all()))
+
+
+def plats_disponibles(categorie_id=None):
+    def calcul():
+        plats = Plat.objects.select_related('categorie').filter(disponible=True)
+        if categorie_id:
+            plats = plats.filter(categorie_id=categorie_id)
+        return list(plats)
+    return _en_cache(f'plats:{categorie_id or "tous"}', calcul)
+
+
+def rechercher(texte, categorie_id=None):
+    """Plats disponibles correspondant a `texte`, par pertinence"""
+    cle = 'recherche:' + hashlib.md5(
+        ' '.join(recherche.mots(texte)).encode(), usedforsecurity=False
+    ).hexdigest()
+    ids = _en_cache(cle, lambda: recherche.rechercher_ids(texte))
+    plats = {plat.id: plat for plat in plats_disponibles(categorie_id)}
+    return [plats[pk] for pk in ids if pk in plats]
+
+
+def menu_etag(request, *args, **kwargs):
+    """ETag des pages publiques du menu (visiteurs anonymes seulement)"""
+    if request.user.is_authenticated or len(messages.get_messages(request)):
+        return None
+    requete = hashlib.md5(
+        request.get_full_path().encode(), usedforsecurity=False
+    ).hexdigest()[:12]
+    return f'menu-{version_menu()}-{requete}'
+
+
+def menu_last_modified(request, *args, **kwargs):
+    if request.user.is_authenticated or len(messages.get_messages(request)):
+        return None
+    return derniere_modification()
@@ -0,0 +1,63 @@
+"""
+Encaissement d'une commande : facture, statut PAYEE et liberation de la
+table, en une seule transaction. Le recu PDF est mis en file (recus.py).
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from . import evenements, occupation, recus, taches
+from .models import Commande, Facture
+
+
+class EncaissementImpossible(Exception):
+    pass
+
+
+def encaisser(commande_id, methode_paiement, cle_idempotence=None):
+    """Encaisse la commande et retourne (facture, creee).
+
+    Un POST rejoue (double clic, reseau instable) avec la meme
+    `cle_idempotence`, ou visant une commande deja payee, retourne la
+    facture existante avec creee=False au lieu d'echouer.
+    """
+    if methode_paiement not in dict(Facture.METHODE_PAIEMENT_CHOICES):
+        raise EncaissementImpossible("Methode de paiement invalide")
+
+    if cle_idempotence:
+        facture = Facture.objects.filter(cle_idempotence=cle_idempotence).first()
+        if facture is not None:
+            return facture, False
+
+    with transaction.atomic():
+        # Passage a PAYEE conditionnel : cet UPDATE verrouille la ligne de
+        # la commande, et un seul encaissement concurrent peut le reussir
+        verrou = Commande.objects.filter(pk=commande_id).exclude(
+            statut='PAYEE'
+        ).update(statut='PAYEE', date_modification=timezone.now())
+
+        if not verrou:
+            facture = Facture.objects.filter(commande_id=commande_id).first()
+            if facture is None:
+                raise EncaissementImpossible("Commande introuvable ou deja payee")
+            return facture, False
+
+        commande = Commande.objects.get(pk=commande_id)
+        if not commande.nombre_items:
+            raise EncaissementImpossible("La commande ne contient aucun plat")
+
+        # Total deja tenu a jour par les items : pas de recalcul
+        facture = Facture(
+            commande=commande,
+            montant_total=commande.montant_total,
+            methode_paiement=methode_paiement,
+            payee=True,
+            cle_idempotence=cle_idempotence or None
+        )
+        facture.save()
+
+        occupation.liberer(commande.table_id, quand=facture.date_emission)
+        evenements.publier_commande(commande)
+        # Recu PDF rendu hors requete, pret pour la premiere impression
+        taches.enfiler(recus.generer_recu, cle=f'recu:{facture.pk}', facture_id=facture.pk)
+
+    return facture, True
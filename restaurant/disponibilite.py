@@ -0,0 +1,120 @@
+"""
+Disponibilite des tables pour les reservations.
+
+Une reservation occupe sa table sur l'intervalle semi-ouvert
+[date_reservation, date_fin), ou date_fin = date_reservation + duree du
+service (setting RESERVATION_DUREE, en minutes). Deux reservations actives
+d'une meme table ne doivent pas se chevaucher.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import notifications, taches
+from .models import Reservation, Table
+
+PAS_CRENEAUX = timedelta(minutes=30)
+
+
+class CreneauIndisponible(Exception):
+    pass
+
+
+def service_du_soir():
+    """(premiere, derniere) heure de debut de reservation proposees"""
+    return getattr(settings, 'RESERVATION_SERVICE', (time(18, 0), time(22, 0)))
+
+
+def reservations_en_conflit(debut, fin):
+    """Reservations actives qui chevauchent [debut, fin)"""
+    return Reservation.objects.filter(
+        statut__in=Reservation.STATUTS_ACTIFS,
+        date_reservation__lt=fin,
+        date_fin__gt=debut
+    )
+
+
+def tables_libres(debut, fin, personnes=1):
+    """Tables d'au moins `personnes` places libres sur [debut, fin), en une requete"""
+    return Table.objects.filter(capacite__gte=personnes).exclude(
+        Exists(reservations_en_conflit(debut, fin).filter(table=OuterRef('pk')))
+    ).order_by('capacite', 'numero')
+
+
+def verifier(reservation):
+    """Leve CreneauIndisponible si la reservation ne peut pas etre acceptee"""
+    debut = reservation.date_reservation
+    fin = debut + Reservation.duree_service()
+
+    if reservation.table.capacite < reservation.nombre_personnes:
+        raise CreneauIndisponible(
+            f"La table {reservation.table.numero} n'a que "
+            f"{reservation.table.capacite} places"
+        )
+
+    conflits = reservations_en_conflit(debut, fin).filter(table=reservation.table)
+    if reservation.pk:
+        conflits = conflits.exclude(pk=reservation.pk)
+    if conflits.exists():
+        raise CreneauIndisponible(
+            f"La table {reservation.table.numero} est deja reservee sur ce creneau"
+        )
+
+
+def reserver(reservation):
+    """Enregistre la reservation si la table est libre, de facon atomique.
+
+    La ligne de la table est verrouillee pendant la verification : deux
+    reservations concurrentes de la meme table sont serialisees. L'e-mail
+    de confirmation est mis en file dans la meme transaction.
+    """
+    with transaction.atomic():
+        reservation.table = Table.objects.select_for_update().get(
+            pk=reservation.table_id
+        )
+        verifier(reservation)
+        reservation.save()
+        if reservation.client_email:
+            taches.enfiler(
+                notifications.confirmer_reservation,
+                cle=f'confirmation-reservation:{reservation.pk}',
+                reservation_id=reservation.pk,
+            )
+    return reservation
+
+
+def creneaux_libres(jour, personnes=1):
+    """Tables libres pour chaque creneau de la soiree `jour`.
+
+    Retourne une liste de (debut, [tables]) ; deux requetes au total,
+    quelle que soit la taille de la salle.
+    """
+    premiere, derniere = service_du_soir()
+    debut = timezone.make_aware(datetime.combine(jour, premiere))
+    fin = timezone.make_aware(datetime.combine(jour, derniere))
+    duree = Reservation.duree_service()
+
+    tables = list(Table.objects.filter(capacite__gte=personnes).order_by('capacite', 'numero'))
+    occupations = defaultdict(list)
+    for table_id, date_reservation, date_fin in reservations_en_conflit(
+        debut, fin + duree
+    ).filter(table__in=tables).values_list('table_id', 'date_reservation', 'date_fin'):
+        occupations[table_id].append((date_reservation, date_fin))
+
+    creneaux = []
+    creneau = debut
+    while creneau <= fin:
+        fin_creneau = creneau + duree
+        creneaux.append((creneau, [
+            table for table in tables
+            if not any(
+                reserve < fin_creneau and libere > creneau
+                for reserve, libere in occupations[table.id]
+            )
+        ]))
+        creneau += PAS_CRENEAUX
+    return creneaux
@@ -0,0 +1,125 @@
+"""
+Diffusion des evenements de commande vers l'ecran cuisine.
+
+Les signaux (code synchrone, threads des vues) publient sur un bus ; chaque
+connexion Server-Sent Events est un abonne asynchrone avec sa propre file.
+Une connexion inactive ne coute qu'une coroutine en attente, pas un thread.
+
+Le bus par defaut vit dans le processus : chaque worker ne voit que les
+evenements publies chez lui. Pour plusieurs workers, le setting
+RESTAURANT_BUS_EVENEMENTS designe une autre classe de meme interface
+(publier / abonner), par exemple adossee a Redis pub/sub.
+"""
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from . import prix
+
+TAILLE_FILE = 100
+
+
+class BusMemoire:
+    """Pub/sub en memoire, utilisable depuis n'importe quel thread"""
+
+    def __init__(self):
+        self._abonnes = set()
+        self._verrou = threading.Lock()
+
+    def publier(self, evenement):
+        with self._verrou:
+            abonnes = list(self._abonnes)
+        for boucle, file in abonnes:
+            try:
+                boucle.call_soon_threadsafe(self._deposer, file, evenement)
+            except RuntimeError:
+                # Boucle fermee : l'abonne sera retire par son generateur
+                pass
+
+    @staticmethod
+    def _deposer(file, evenement):
+        # Un ecran trop lent perd les evenements les plus anciens
+        if file.full():
+            file.get_nowait()
+        file.put_nowait(evenement)
+
+    async def abonner(self, battement=None):
+        """Generateur asynchrone des evenements publies.
+
+        Produit None toutes les `battement` secondes sans evenement, pour
+        permettre d'entretenir la connexion.
+        """
+        file = asyncio.Queue(maxsize=TAILLE_FILE)
+        abonne = (asyncio.get_running_loop(), file)
+        with self._verrou:
+            self._abonnes.add(abonne)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(file.get(), timeout=battement)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._verrou:
+                self._abonnes.discard(abonne)
+
+    def nombre_abonnes(self):
+        return len(self._abonnes)
+
+
+_bus = None
+_verrou_bus = threading.Lock()
+
+
+def get_bus():
+    global _bus
+    if _bus is None:
+        with _verrou_bus:
+            if _bus is None:
+                classe = getattr(
+                    settings, 'RESTAURANT_BUS_EVENEMENTS',
+                    'restaurant.evenements.BusMemoire'
+                )
+                _bus = import_string(classe)()
+    return _bus
+
+
+def publier(type_evenement, **donnees):
+    """Publie l'evenement apres le commit de la transaction en cours"""
+    evenement = {'type': type_evenement, **donnees}
+    transaction.on_commit(lambda: get_bus().publier(evenement))
+
+
+def publier_commande(commande):
+    publier(
+        'commande',
+        id=commande.pk,
+        statut=commande.statut,
+        statut_libelle=commande.get_statut_display(),
+        table=commande.table_id,
+    )
+
+
+def publier_item(item):
+    tarif = None
+    if not item._meta.get_field('plat').is_cached(item):
+        # Plat non charge : nom lu dans la carte des prix, sans requete
+        tarif = prix.tarif(item.plat_id)
+    publier(
+        'item',
+        id=item.pk,
+        commande=item.commande_id,
+        plat=tarif.nom if tarif is not None else item.plat.nom,
+        quantite=item.quantite,
+        notes=item.notes,
+    )
+
+
+def format_sse(evenement):
+    if evenement is None:
+        return ': ping\n\n'
+    return f"event: {evenement['type']}\ndata: {json.dumps(evenement)}\n\n"
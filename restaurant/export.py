@@ -0,0 +1,150 @@
+"""
+Exports comptables (factures, commandes detaillees, reservations, ventes
+par plat et periode de prix).
+
+Les lignes sont lues par paquets (`.iterator(chunk_size=...)`, curseur
+serveur sous PostgreSQL) et ecrites au fil de l'eau : un an de donnees
+s'exporte en memoire constante, et le telechargement commence des le
+premier paquet.
+
+Deux formats :
+- `csv` : UTF-8, virgules, point decimal ;
+- `excel` : CSV que Excel en francais ouvre directement (BOM UTF-8,
+  points-virgules, virgule decimale).
+
+Dans les deux formats, un texte qui commence comme une formule (=, +, -,
+@, tabulation, retour chariot) est precede d'une apostrophe : un tableur
+l'affiche tel quel au lieu de l'evaluer.
+"""
+import csv
+from datetime import timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+
+from . import prix
+from .models import Facture, ItemCommande, Reservation
+from .utils import bornes_jour
+
+TAILLE_PAQUET = 2000
+FORMATS = ('csv', 'excel')
+DEBUTS_FORMULE = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _factures(debut, fin):
+    return Facture.objects.filter(
+        date_emission__gte=debut, date_emission__lt=fin
+    ).order_by('date_emission', 'id').values_list(
+        'numero_facture', 'date_emission', 'commande_id', 'commande__table__numero',
+        'methode_paiement', 'montant_total', 'tva', 'montant_ttc', 'payee'
+    )
+
+
+def _commandes(debut, fin):
+    # Une ligne par plat commande ; les commandes sans plat n'apparaissent pas
+    return ItemCommande.objects.filter(
+        commande__date_creation__gte=debut, commande__date_creation__lt=fin
+    ).order_by('commande__date_creation', 'commande_id', 'id').values_list(
+        'commande_id', 'commande__date_creation', 'commande__table__numero',
+        'commande__serveur__username', 'commande__statut', 'commande__couverts',
+        'plat__nom', 'quantite', 'prix_unitaire', 'commande__facture__numero_facture'
+    )
+
+
+def _reservations(debut, fin):
+    return Reservation.objects.filter(
+        date_reservation__gte=debut, date_reservation__lt=fin
+    ).order_by('date_reservation', 'id').values_list(
+        'id', 'date_reservation', 'table__numero', 'nombre_personnes', 'client_nom',
+        'client_telephone', 'client_email', 'statut', 'date_creation'
+    )
+
+
+def _tarifs(debut, fin):
+    return prix.ventes_par_tarif(debut, fin).values_list(
+        'plat__nom', 'tarif__version', 'tarif__prix', 'tarif__valide_du', 'tarif__valide_au',
+        'quantite_vendue', 'montant', 'montant_tarif'
+    )
+
+
+JEUX = {
+    'factures': (
+        ['numero', 'date', 'commande', 'table', 'methode_paiement',
+         'montant_ht', 'tva', 'montant_ttc', 'payee'],
+        _factures,
+    ),
+    'commandes': (
+        ['commande', 'date', 'table', 'serveur', 'statut', 'couverts',
+         'plat', 'quantite', 'prix_unitaire', 'facture'],
+        _commandes,
+    ),
+    'reservations': (
+        ['reservation', 'date', 'table', 'personnes', 'client', 'telephone',
+         'email', 'statut', 'date_creation'],
+        _reservations,
+    ),
+    'tarifs': (
+        ['plat', 'version_prix', 'prix_carte', 'valide_du', 'valide_au',
+         'quantite', 'montant_facture', 'montant_prix_carte'],
+        _tarifs,
+    ),
+}
+
+
+def periode_par_defaut():
+    """Du premier jour du mois courant a aujourd'hui"""
+    aujourd_hui = timezone.localdate()
+    return aujourd_hui.replace(day=1), aujourd_hui
+
+
+def nom_fichier(jeu, du, au):
+    return f"{jeu}_{du.isoformat()}_{au.isoformat()}.csv"
+
+
+def bornes(du, au):
+    """Intervalle [debut, fin) des jours `du` a `au` inclus ; OverflowError
+    en fin de calendrier"""
+    return bornes_jour(du)[0], bornes_jour(au + timedelta(days=1))[0]
+
+
+def lignes(jeu, du, au, taille_paquet=TAILLE_PAQUET):
+    """En-tete puis lignes du jeu, jours `du` a `au` inclus"""
+    entete, requete = JEUX[jeu]
+    debut, fin = bornes(du, au)
+    yield entete
+    yield from requete(debut, fin).iterator(chunk_size=taille_paquet)
+
+
+class _Tampon:
+    """Pseudo-fichier : csv.writer ecrit, on recupere la ligne formatee"""
+
+    def write(self, valeur):
+        return valeur
+
+
+def _cellule(valeur, excel):
+    if valeur is None:
+        return ''
+    if isinstance(valeur, bool):
+        return 'oui' if valeur else 'non'
+    if hasattr(valeur, 'tzinfo'):
+        return timezone.localtime(valeur).strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(valeur, Decimal) and excel:
+        return str(valeur).replace('.', ',')
+    if isinstance(valeur, str) and valeur.startswith(DEBUTS_FORMULE):
+        return "'" + valeur
+    return valeur
+
+
+def flux(jeu, du, au, format_export='csv', taille_paquet=TAILLE_PAQUET):
+    """Texte du fichier, par blocs d'environ `taille_paquet` lignes"""
+    excel = format_export == 'excel'
+    ecrivain = csv.writer(_Tampon(), delimiter=';' if excel else ',')
+    bloc = ['\ufeff'] if excel else []
+    for ligne in lignes(jeu, du, au, taille_paquet):
+        bloc.append(ecrivain.writerow([_cellule(valeur, excel) for valeur in ligne]))
+        if len(bloc) >= taille_paquet:
+            yield ''.join(bloc)
+            bloc = []
+    if bloc:
+        yield ''.join(bloc)
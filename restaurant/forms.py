@@ -1,5 +1,6 @@
 from django import forms
 from .models import *
+from .disponibilite import CreneauIndisponible, verifier
 
 class ReservationForm(forms.ModelForm):
     class Meta:
@@ -19,12 +20,31 @@ class ReservationForm(forms.ModelForm):
             ),
             'notes': forms.Textarea(attrs={'rows': 3}),
         }
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        table = cleaned_data.get('table')
+        nombre_personnes = cleaned_data.get('nombre_personnes')
+        date_reservation = cleaned_data.get('date_reservation')
+        
+        if table and nombre_personnes and date_reservation:
+            try:
+                verifier(Reservation(
+                    pk=self.instance.pk,
+                    table=table,
+                    nombre_personnes=nombre_personnes,
+                    date_reservation=date_reservation
+                ))
+            except CreneauIndisponible as e:
+                raise forms.ValidationError(str(e))
+        return cleaned_data
 
 class CommandeForm(forms.ModelForm):
     class Meta:
         model = Commande
-        fields = ['notes']
+        fields = ['couverts', 'notes']
         widgets = {
+            'couverts': forms.NumberInput(attrs={'min': 1}),
             'notes': forms.Textarea(attrs={'rows': 3}),
         }
 
@@ -36,6 +56,28 @@ class ItemCommandeForm(forms.ModelForm):
             'notes': forms.Textarea(attrs={'rows': 2}),
         }
 
+class LignePanierForm(forms.Form):
+    """Ligne du panier ; les plats sont verifies ensemble par panier.ajouter"""
+    plat = forms.TypedChoiceField(coerce=int, required=False)
+    quantite = forms.IntegerField(min_value=1, max_value=99, initial=1)
+    notes = forms.CharField(
+        required=False,
+        widget=forms.TextInput(attrs={'placeholder': 'Notes'})
+    )
+    
+    def __init__(self, *args, plats=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        # Choix fournis par la vue : pas de requete par ligne
+        self.fields['plat'].choices = [('', '---------')] + list(plats)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.has_changed() and cleaned_data.get('plat') in (None, ''):
+            self.add_error('plat', "Choisissez un plat")
+        return cleaned_data
+
+PanierFormSet = forms.formset_factory(LignePanierForm, extra=6, max_num=50)
+
 class PlatForm(forms.ModelForm):
     class Meta:
         model = Plat
@@ -0,0 +1,179 @@
+"""
+Variantes responsives des photos de plats.
+
+A chaque nouvelle image, une tache de la file 'lente' (taches.py) produit
+des versions AVIF, WebP et JPEG a plusieurs largeurs (setting
+PLAT_IMAGE_LARGEURS), orientees selon l'EXIF puis debarrassees de toute
+metadonnee. Les fichiers
+sont nommes d'apres le hash du contenu source
+(plats/variantes/<hash>-<largeur>.<ext>) : ils peuvent etre servis avec un
+cache navigateur illimite, et deux plats partageant une photo partagent
+les fichiers.
+
+La liste des variantes est enregistree dans Plat.variantes_image ; le tag
+{% image_plat %} en tire un <picture> avec srcset, et se replie sur
+l'image d'origine tant que les variantes ne sont pas pretes.
+"""
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from . import cache_menu, taches
+from .models import Plat
+
+DOSSIER = 'plats/variantes'
+LARGEURS = (320, 640, 960, 1280)
+# Du plus compact au plus compatible : ordre des <source> dans <picture>
+FORMATS = (
+    ('avif', 'AVIF', {'quality': 50}),
+    ('webp', 'WEBP', {'quality': 75, 'method': 6}),
+    ('jpeg', 'JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+)
+TYPES_MIME = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+
+def largeurs():
+    return tuple(sorted(getattr(settings, 'PLAT_IMAGE_LARGEURS', LARGEURS)))
+
+
+def planifier(plat_id):
+    """Genere les variantes par la file de taches, apres le commit de l'upload"""
+    taches.enfiler(generer_variantes, plat_id=plat_id)
+
+
+def a_jour(plat):
+    return bool(plat.image) and plat.variantes_image.get('source') == plat.image.name
+
+
+@taches.tache(file='lente', tentatives=3)
+def generer_variantes(plat_id, forcer=False):
+    """Produit les variantes de l'image du plat ; retourne False si rien a faire"""
+    plat = Plat.objects.filter(pk=plat_id).first()
+    if plat is None:
+        return False
+    if not plat.image:
+        if plat.variantes_image:
+            Plat.objects.filter(pk=plat_id).update(variantes_image={})
+            cache_menu.incrementer_version()
+        return False
+    if a_jour(plat) and not forcer:
+        return False
+
+    with plat.image.open('rb') as fichier:
+        contenu = fichier.read()
+    empreinte = hashlib.sha256(contenu).hexdigest()[:16]
+
+    with Image.open(io.BytesIO(contenu)) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        image.load()
+
+    # Pas d'agrandissement : une image etroite n'a que sa largeur d'origine
+    cibles = sorted(
+        {largeur for largeur in largeurs() if largeur < image.width}
+        | {min(image.width, largeurs()[-1])}
+    )
+
+    variantes = {}
+    for extension, format_pil, options in FORMATS:
+        variantes[extension] = {}
+        for largeur in cibles:
+            chemin = f"{DOSSIER}/{empreinte}-{largeur}.{extension}"
+            if forcer and default_storage.exists(chemin):
+                default_storage.delete(chemin)
+            if not default_storage.exists(chemin):
+                donnees = _encoder(image, largeur, format_pil, options)
+                chemin = default_storage.save(chemin, ContentFile(donnees))
+            variantes[extension][str(largeur)] = chemin
+
+    resultat = {
+        'source': plat.image.name,
+        'empreinte': empreinte,
+        'largeur': image.width,
+        'hauteur': image.height,
+        'formats': variantes,
+    }
+    # Ecriture ciblee : un save() relancerait les signaux du plat. La
+    # condition sur l'image ignore un resultat devenu perime entre-temps.
+    if Plat.objects.filter(pk=plat_id, image=plat.image.name).update(
+        variantes_image=resultat
+    ):
+        cache_menu.incrementer_version()
+    return True
+
+
+def _encoder(image, largeur, format_pil, options):
+    hauteur = round(image.height * largeur / image.width)
+    variante = image.resize((largeur, hauteur), Image.Resampling.LANCZOS)
+    if format_pil == 'JPEG' and variante.mode == 'RGBA':
+        fond = Image.new('RGB', variante.size, (255, 255, 255))
+        fond.paste(variante, mask=variante.getchannel('A'))
+        variante = fond
+    # Sans EXIF, XMP ni profil ICC herites de la source
+    variante.info = {}
+    tampon = io.BytesIO()
+    variante.save(tampon, format_pil, **options)
+    return tampon.getvalue()
+
+
+def srcset(plat, extension):
+    """Valeur de l'attribut srcset pour un format, ou '' sans variantes"""
+    if not a_jour(plat):
+        return ''
+    return ', '.join(
+        f"{default_storage.url(chemin)} {largeur}w"
+        for largeur, chemin in sorted(
+            plat.variantes_image['formats'].get(extension, {}).items(),
+            key=lambda element: int(element[0])
+        )
+    )
+
+
+def url(plat, extension='jpeg', largeur=640):
+    """URL de la plus grande variante ne depassant pas `largeur`"""
+    if not a_jour(plat):
+        return plat.image.url if plat.image else ''
+    par_largeur = sorted(
+        (int(cle), chemin)
+        for cle, chemin in plat.variantes_image['formats'].get(extension, {}).items()
+    )
+    retenue = [chemin for cle, chemin in par_largeur if cle <= largeur] or [par_largeur[0][1]]
+    return default_storage.url(retenue[-1])
+
+
+def sources(plat):
+    """[(type MIME, srcset)] des <source> d'un <picture> ; le JPEG va dans <img>"""
+    resultat = []
+    for extension, _, _ in FORMATS[:-1]:
+        valeur = srcset(plat, extension)
+        if valeur:
+            resultat.append((TYPES_MIME[extension], valeur))
+    return resultat
+
+
+def fichiers_references():
+    chemins = set()
+    for variantes in Plat.objects.exclude(variantes_image={}).values_list(
+        'variantes_image', flat=True
+    ):
+        for par_largeur in variantes.get('formats', {}).values():
+            chemins.update(par_largeur.values())
+    return chemins
+
+
+def purger():
+    """Supprime les variantes qu'aucun plat ne reference plus"""
+    try:
+        _, fichiers = default_storage.listdir(DOSSIER)
+    except FileNotFoundError:
+        return 0
+    references = fichiers_references()
+    orphelins = [f"{DOSSIER}/{nom}" for nom in fichiers if f"{DOSSIER}/{nom}" not in references]
+    for chemin in orphelins:
+        default_storage.delete(chemin)
+    return len(orphelins)
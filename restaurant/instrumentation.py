@@ -0,0 +1,229 @@
+"""
+Mesure des performances par requete.
+
+InstrumentationMiddleware mesure une fraction des requetes (setting
+INSTRUMENTATION_ECHANTILLON, entre 0 et 1 ; 0 par defaut) : duree totale,
+requetes SQL (nombre, duree, requetes repetees), rendu des templates. Une
+requete non echantillonnee ne coute qu'un tirage aleatoire.
+
+Pour une requete mesuree :
+- en-tete Server-Timing (lisible dans l'onglet reseau du navigateur) ;
+- une ligne JSON sur le logger `restaurant.instrumentation` ;
+- les plus lentes sont gardees en memoire (INSTRUMENTATION_TAILLE) et
+  affichees sur /instrumentation/ pour le staff. Chaque processus a sa
+  propre liste.
+
+La duree de rendu des templates est mesuree par le moteur
+DjangoTemplatesMesures, a declarer dans TEMPLATES['BACKEND'] ; hors d'une
+requete mesuree, il se comporte comme le moteur Django.
+
+Une requete SQL est identifiee par son texte avant substitution des
+parametres, listes IN (%s, %s, ...) ramenees a une seule forme : la meme
+empreinte repetee dans une requete HTTP signale un N+1.
+"""
+import heapq
+import itertools
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_LISTE_IN = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+
+# Mesure de la requete HTTP en cours, lue par le rendu des templates et
+# par les connexions. Une variable de contexte suit la requete jusque dans
+# le thread ou sync_to_async execute une vue synchrone (ASGI).
+_mesure = ContextVar('mesure_instrumentation', default=None)
+
+
+def empreinte(sql):
+    return _LISTE_IN.sub('(%s, ...)', sql)
+
+
+class ChronoSQL:
+    """execute_wrapper qui compte les requetes et cumule leur duree"""
+
+    def __init__(self, empreintes=False):
+        self.requetes = 0
+        self.duree = 0.0
+        self.empreintes = Counter() if empreintes else None
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duree += time.perf_counter() - debut
+            self.requetes += 1
+            if self.empreintes is not None:
+                self.empreintes[empreinte(sql)] += 1
+
+    def doublons(self, minimum=2):
+        """[(nombre, sql)] des requetes executees au moins `minimum` fois"""
+        return [
+            (nombre, sql) for sql, nombre in self.empreintes.most_common()
+            if nombre >= minimum
+        ]
+
+
+class PlusLentes:
+    """Les `taille` mesures les plus longues, partagees entre threads"""
+
+    def __init__(self, taille):
+        self.taille = taille
+        self._tas = []
+        self._compteur = itertools.count()
+        self._verrou = threading.Lock()
+
+    def ajouter(self, mesure):
+        element = (mesure['duree_ms'], next(self._compteur), mesure)
+        with self._verrou:
+            if len(self._tas) < self.taille:
+                heapq.heappush(self._tas, element)
+            elif element[0] > self._tas[0][0]:
+                heapq.heapreplace(self._tas, element)
+
+    def lister(self):
+        with self._verrou:
+            return [mesure for _, _, mesure in sorted(self._tas, reverse=True)]
+
+    def vider(self):
+        with self._verrou:
+            self._tas.clear()
+
+
+plus_lentes = PlusLentes(getattr(settings, 'INSTRUMENTATION_TAILLE', 50))
+
+
+def _chronometrer(execute, sql, params, many, context):
+    mesure = _mesure.get()
+    if mesure is None:
+        return execute(sql, params, many, context)
+    chrono = mesure['chronos'].get(context['connection'].alias)
+    if chrono is None:
+        chrono = mesure['chronos'][context['connection'].alias] = ChronoSQL(empreintes=True)
+    return chrono(execute, sql, params, many, context)
+
+
+def instrumenter_connexion(connexion):
+    """Installe le chronometre sur la connexion (signal connection_created).
+
+    La connexion est ouverte dans le thread qui l'utilise : les requetes
+    d'une vue synchrone servie par ASGI sont comptees elles aussi. Hors
+    d'une requete mesuree, le chronometre ne fait rien.
+    """
+    if _chronometrer not in connexion.execute_wrappers:
+        connexion.execute_wrappers.append(_chronometrer)
+
+
+class TemplateMesure(Template):
+    """Template dont le rendu est compte dans la mesure en cours, s'il y en a une"""
+
+    def render(self, context=None, request=None):
+        mesure = _mesure.get()
+        if mesure is None:
+            return super().render(context, request)
+        debut = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            mesure['templates'] += time.perf_counter() - debut
+
+
+class DjangoTemplatesMesures(DjangoTemplates):
+    """Moteur de templates Django (TEMPLATES['BACKEND']) dont les templates
+    sont des TemplateMesure"""
+
+    def from_string(self, template_code):
+        return TemplateMesure(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TemplateMesure(super().get_template(template_name).template, self)
+
+
+def echantillonner():
+    taux = getattr(settings, 'INSTRUMENTATION_ECHANTILLON', 0)
+    return bool(taux) and random.random() < taux
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asynchrone = iscoroutinefunction(get_response)
+        if self.asynchrone:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asynchrone:
+            return self.appeler_async(request)
+        if not echantillonner():
+            return self.get_response(request)
+        with self.mesurer(request) as mesure:
+            mesure['response'] = self.get_response(request)
+        return mesure['response']
+
+    async def appeler_async(self, request):
+        if not echantillonner():
+            return await self.get_response(request)
+        with self.mesurer(request) as mesure:
+            mesure['response'] = await self.get_response(request)
+        return mesure['response']
+
+    @contextmanager
+    def mesurer(self, request):
+        """Mesure le bloc, qui range sa reponse dans mesure['response']"""
+        seuil = getattr(settings, 'INSTRUMENTATION_SEUIL_DOUBLONS', 5)
+        mesure = {'templates': 0.0, 'chronos': {}, 'response': None}
+        jeton = _mesure.set(mesure)
+        debut = time.perf_counter()
+        try:
+            yield mesure
+        finally:
+            _mesure.reset(jeton)
+        duree = time.perf_counter() - debut
+        response = mesure['response']
+        chronos = mesure['chronos']
+
+        requetes = sum(chrono.requetes for chrono in chronos.values())
+        duree_sql = sum(chrono.duree for chrono in chronos.values())
+        doublons = [
+            doublon for chrono in chronos.values() for doublon in chrono.doublons(seuil)
+        ]
+        resolution = getattr(request, 'resolver_match', None)
+        resultat = {
+            'date': timezone.now().isoformat(timespec='seconds'),
+            'methode': request.method,
+            'chemin': request.path,
+            'vue': resolution.view_name if resolution else None,
+            'statut': response.status_code,
+            'duree_ms': round(duree * 1000, 2),
+            'requetes': requetes,
+            'sql_ms': round(duree_sql * 1000, 2),
+            'templates_ms': round(mesure['templates'] * 1000, 2),
+            'doublons': [{'nombre': nombre, 'sql': sql[:300]} for nombre, sql in doublons[:5]],
+        }
+
+        response['Server-Timing'] = ', '.join(filter(None, [
+            f'sql;dur={resultat["sql_ms"]};desc="{requetes} requetes"',
+            f'tpl;dur={resultat["templates_ms"]}',
+            f'n1;desc="{doublons[0][0]}x la meme requete"' if doublons else None,
+            f'total;dur={resultat["duree_ms"]}',
+        ]))
+        logger.info(json.dumps(resultat, ensure_ascii=False))
+        plus_lentes.ajouter(resultat)
+
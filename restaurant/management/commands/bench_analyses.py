@@ -0,0 +1,66 @@
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from restaurant import analyses
+from restaurant.benchmarks import base_temporaire
+from restaurant.instrumentation import ChronoSQL
+
+# Cache propre au benchmark : ni le cache configure ni sa limite d'entrees
+CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bench-analyses',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Analyses des ventes sur --jours jours de donnees generees : rapport "
+        "a froid (cache vide) puis a chaud"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=365)
+        parser.add_argument('--commandes-par-jour', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with base_temporaire(), override_settings(CACHES=CACHE):
+            self.stdout.write(
+                f"Generation de {options['jours']} jours x "
+                f"{options['commandes_par_jour']} commandes..."
+            )
+            call_command(
+                'seed', graine=1, jours=options['jours'],
+                commandes_par_jour=options['commandes_par_jour'], stdout=StringIO()
+            )
+            au = timezone.localdate()
+            du = au - timedelta(days=options['jours'])
+            cache.clear()
+            for libelle, periode in (
+                ("Annee, cache vide", (du, au)),
+                ("Annee, a chaud", (du, au)),
+                ("30 jours, a chaud", (au - timedelta(days=29), au)),
+            ):
+                self.mesurer(libelle, *periode)
+
+    def mesurer(self, libelle, du, au):
+        chrono_sql = ChronoSQL()
+        with connection.execute_wrapper(chrono_sql):
+            debut = time.perf_counter()
+            rapport = analyses.rapport(du, au)
+            duree = time.perf_counter() - debut
+        self.stdout.write(
+            f"  {libelle:<20} {duree * 1000:>7.0f} ms "
+            f"(SQL {chrono_sql.duree * 1000:.0f} ms, {chrono_sql.requetes} requetes) : "
+            f"{rapport['totaux']['factures']} factures, {len(rapport['plats'])} plats"
+        )
@@ -0,0 +1,109 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from restaurant.benchmarks import base_temporaire, mesurer_vue
+
+VUES = ['dashboard', 'liste_commandes', 'cuisine', 'gestion_tables', 'liste_factures']
+
+SANS_CACHE = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+    'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+}
+AVEC_CACHE = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+    'AUTHENTICATION_BACKENDS': ['restaurant.authentification.UtilisateurCacheBackend'],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requetes SQL et temps des vues authentifiees avec sessions "
+        "et utilisateur en base, puis en cache"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--caches',
+            default='locmem,file',
+            help="Backends a mesurer, separes par des virgules (locmem, file, redis)"
+        )
+        parser.add_argument('--redis-url', default='redis://127.0.0.1:6379/15')
+        parser.add_argument('--jours', type=int, default=3)
+        parser.add_argument('--repetitions', type=int, default=20)
+
+    def handle(self, *args, **options):
+        backends = [nom.strip() for nom in options['caches'].split(',') if nom.strip()]
+        inconnus = set(backends) - {'locmem', 'file', 'redis'}
+        if inconnus:
+            raise CommandError(f"Backend(s) inconnu(s) : {', '.join(sorted(inconnus))}")
+
+        dossier = tempfile.mkdtemp(prefix='bench-cache-')
+        configurations = {'db': dict(SANS_CACHE, CACHES=self.caches('locmem', dossier, options))}
+        for backend in backends:
+            configurations[f'cached_db+{backend}'] = dict(
+                AVEC_CACHE, CACHES=self.caches(backend, dossier, options)
+            )
+
+        setup_test_environment()
+        try:
+            with base_temporaire():
+                call_command('seed', graine=1, jours=options['jours'], stdout=StringIO())
+                utilisateur = User.objects.create_user('bench', password='bench', is_staff=True)
+                mesures = {
+                    nom: self.mesurer(utilisateur, reglages, options['repetitions'])
+                    for nom, reglages in configurations.items()
+                }
+        finally:
+            teardown_test_environment()
+            shutil.rmtree(dossier, ignore_errors=True)
+
+        reference = mesures['db']
+        for nom, par_vue in mesures.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(nom))
+            for vue, mesure in par_vue.items():
+                economie = reference[vue]['requetes'] - mesure['requetes']
+                self.stdout.write(
+                    f"  {vue:<18} {mesure['statut']} {mesure['requetes']:>3} req "
+                    f"({economie:+d} evitees) {mesure['temps_ms']:>7.1f} ms "
+                    f"(db : {reference[vue]['temps_ms']:.1f} ms)"
+                )
+
+    def caches(self, backend, dossier, options):
+        if backend == 'redis':
+            configuration = {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': options['redis_url'],
+            }
+        elif backend == 'file':
+            configuration = {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': dossier,
+            }
+        else:
+            configuration = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        return {'default': dict(configuration, KEY_PREFIX='bench-cache')}
+
+    def mesurer(self, utilisateur, reglages, repetitions):
+        with override_settings(**reglages):
+            # Client cree sous les reglages : SessionMiddleware lit
+            # SESSION_ENGINE a son initialisation
+            client = Client()
+            client.force_login(utilisateur)
+            try:
+                return {
+                    vue: mesurer_vue(
+                        client, 'get', lambda url=reverse(vue): (url, None),
+                        repetitions, secure=True
+                    )
+                    for vue in VUES
+                }
+            finally:
+                client.logout()
@@ -0,0 +1,77 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from restaurant.benchmarks import base_temporaire, resume_latences
+from restaurant.caisse import encaisser
+from restaurant.models import Categorie, Commande, Facture, ItemCommande, Plat, Table
+
+
+class Command(BaseCommand):
+    help = "Mesure le debit d'encaissements paralleles sur des tables differentes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tables', type=int, default=200)
+        parser.add_argument('--items', type=int, default=5)
+        parser.add_argument('--threads', type=int, default=8)
+
+    def handle(self, *args, **options):
+        with base_temporaire():
+            commandes = self.preparer(options['tables'], options['items'])
+            duree, latences = self.encaisser(commandes, options['threads'])
+            self.verifier(commandes)
+
+        self.stdout.write(
+            f"{len(commandes)} encaissements, {options['threads']} threads : "
+            f"{duree:.2f} s, {len(commandes) / duree:.0f} encaissements/s"
+        )
+        self.stdout.write(f"Latence : {resume_latences(latences)}")
+
+    def preparer(self, nombre_tables, nombre_items):
+        categorie = Categorie.objects.create(nom="Benchmark")
+        plats = Plat.objects.bulk_create([
+            Plat(nom=f"Plat {i}", description="", prix=Decimal(1000 + i * 100), categorie=categorie)
+            for i in range(nombre_items)
+        ])
+        tables = Table.objects.bulk_create([
+            Table(numero=i, capacite=4, disponible=False)
+            for i in range(1, nombre_tables + 1)
+        ])
+        commandes = Commande.objects.bulk_create([Commande(table=table) for table in tables])
+        ItemCommande.objects.bulk_create([
+            ItemCommande(commande=commande, plat=plat, quantite=2)
+            for commande in commandes
+            for plat in plats
+        ])
+        return [commande.pk for commande in commandes]
+
+    def encaisser(self, commandes, threads):
+        latences = []
+
+        def caissier(lot):
+            try:
+                for commande_id in lot:
+                    debut = time.perf_counter()
+                    encaisser(commande_id, 'CARTE', f'bench-{commande_id}')
+                    latences.append(time.perf_counter() - debut)
+            finally:
+                connections.close_all()
+
+        debut = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executeur:
+            for resultat in [
+                executeur.submit(caissier, commandes[i::threads]) for i in range(threads)
+            ]:
+                resultat.result()
+        return time.perf_counter() - debut, latences
+
+    def verifier(self, commandes):
+        if Facture.objects.count() != len(commandes):
+            raise CommandError("Nombre de factures incorrect")
+        if Table.objects.filter(disponible=False).exists():
+            raise CommandError("Des tables n'ont pas ete liberees")
+        if Commande.objects.exclude(statut='PAYEE').exists():
+            raise CommandError("Des commandes ne sont pas payees")
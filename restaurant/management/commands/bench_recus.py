@@ -0,0 +1,91 @@
+import random
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from restaurant import recus
+from restaurant.benchmarks import base_temporaire
+from restaurant.models import Categorie, Commande, Facture, ItemCommande, Plat, Table
+
+
+class Command(BaseCommand):
+    help = (
+        "Impression de fin de journee : lecture et rendu PDF des recus de "
+        "--factures factures, sur un processus puis sur --processus"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--factures', type=int, default=2000)
+        parser.add_argument('--processus', type=int, default=recus.nombre_processus())
+
+    def handle(self, *args, **options):
+        media = tempfile.mkdtemp()
+        try:
+            with base_temporaire(), override_settings(MEDIA_ROOT=media):
+                self.preparer(options['factures'])
+                self.mesurer(options['processus'])
+        finally:
+            shutil.rmtree(media)
+
+    def preparer(self, nombre):
+        aleatoire = random.Random(0)
+        categorie = Categorie.objects.create(nom="Benchmark")
+        plats = Plat.objects.bulk_create([
+            Plat(nom=f"Plat du jour numero {i}", prix=Decimal(1000 + i * 250), categorie=categorie)
+            for i in range(20)
+        ])
+        tables = Table.objects.bulk_create([Table(numero=i, capacite=4) for i in range(1, 41)])
+        commandes = Commande.objects.bulk_create([
+            Commande(table=tables[i % len(tables)], statut='PAYEE') for i in range(nombre)
+        ])
+        ItemCommande.objects.bulk_create([
+            ItemCommande(commande=commande, plat=plat, quantite=aleatoire.randint(1, 3))
+            for commande in commandes
+            for plat in aleatoire.sample(plats, aleatoire.randint(2, 8))
+        ])
+        periode = timezone.localdate().strftime('%Y%m%d')
+        Facture.objects.bulk_create([
+            Facture(
+                commande_id=commande_id,
+                numero_facture=f"B{periode}-{numero:05d}",
+                montant_total=montant,
+                tva=montant * Facture.TAUX_TVA,
+                montant_ttc=montant * (1 + Facture.TAUX_TVA),
+                methode_paiement='CARTE',
+                payee=True
+            )
+            for numero, (commande_id, montant) in enumerate(
+                Commande.objects.values_list('pk', 'montant_total'), 1
+            )
+        ])
+
+    def mesurer(self, processus):
+        debut, fin = timezone.now() - timedelta(days=1), timezone.now()
+        chrono = time.perf_counter()
+        donnees = recus.lire(date_emission__gte=debut, date_emission__lt=fin)
+        lecture = time.perf_counter() - chrono
+        lignes = sum(len(recu['lignes']) for recu in donnees)
+        self.stdout.write(f"{len(donnees)} factures, {lignes} lignes : lecture {lecture:.2f} s")
+
+        for nombre in sorted({1, processus}):
+            chrono = time.perf_counter()
+            contenu = recus.rendre(donnees, nombre)
+            duree = time.perf_counter() - chrono
+            self.stdout.write(
+                f"  Rendu, {nombre} processus : {duree:.2f} s, "
+                f"{len(donnees) / duree:.0f} recus/s, {len(contenu) / 1024:.0f} Kio"
+            )
+
+        recus.enregistrer(donnees, processus)
+        chrono = time.perf_counter()
+        _, rendu = recus.enregistrer(recus.lire(date_emission__gte=debut, date_emission__lt=fin))
+        self.stdout.write(
+            f"  Reimpression (lecture + fichier existant) : "
+            f"{time.perf_counter() - chrono:.2f} s, rendu={rendu}"
+        )
@@ -0,0 +1,141 @@
+import multiprocessing
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+
+from restaurant import sqlite
+from restaurant.benchmarks import base_temporaire, resume_latences
+from restaurant.models import Categorie, Commande, ItemCommande, Plat, Table
+
+# Reglages SQLite de Django sans OPTIONS : journal DELETE, transactions
+# DEFERRED, attente de verrou de 5 s (defaut du module sqlite3)
+DEFAUT = {'init_command': 'PRAGMA journal_mode=DELETE'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Ajouts d'items concurrents depuis plusieurs processus (comme des "
+        "workers gunicorn) sur SQLite : reglages par defaut contre reglages "
+        "de production (settings.DATABASES)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processus', type=int, default=8)
+        parser.add_argument('--ecritures', type=int, default=100, help="Par processus")
+        parser.add_argument('--commandes', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if not sqlite.est_sqlite():
+            raise CommandError("La base configuree n'est pas une base SQLite")
+
+        modes = {'defaut': DEFAUT, 'production': dict(connection.settings_dict['OPTIONS'])}
+        resultats = {}
+        with base_temporaire():
+            try:
+                for nom, reglages in modes.items():
+                    connection.settings_dict['OPTIONS'] = reglages
+                    connections.close_all()
+                    commandes, plats = self.preparer(options['commandes'])
+                    resultats[nom] = self.executer(
+                        commandes, plats, options['processus'], options['ecritures']
+                    )
+                    resultats[nom]['incoherentes'] = self.verifier(commandes)
+            finally:
+                connection.settings_dict['OPTIONS'] = modes['production']
+                connections.close_all()
+
+        total = options['processus'] * options['ecritures']
+        for nom, resultat in resultats.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{nom} ({options['processus']} processus)"
+            ))
+            self.stdout.write(
+                f"  {len(resultat['latences'])}/{total} ecritures, "
+                f"{resultat['erreurs']} 'database is locked', "
+                f"{resultat['duree']:.2f} s, "
+                f"{len(resultat['latences']) / resultat['duree']:.0f} ecritures/s"
+            )
+            self.stdout.write(f"  Latence : {resume_latences(resultat['latences'])}")
+            if resultat['incoherentes']:
+                self.stderr.write(f"  {resultat['incoherentes']} total(aux) de commande faux")
+
+    def preparer(self, nombre_commandes):
+        Commande.objects.all().delete()
+        Table.objects.all().delete()
+        categorie, _ = Categorie.objects.get_or_create(nom="Benchmark")
+        plats = Plat.objects.filter(categorie=categorie)
+        if not plats.exists():
+            Plat.objects.bulk_create([
+                Plat(nom=f"Plat {i}", description="", prix=Decimal(1000 + i * 250), categorie=categorie)
+                for i in range(10)
+            ])
+        tables = Table.objects.bulk_create([
+            Table(numero=i, capacite=4, disponible=False)
+            for i in range(1, nombre_commandes + 1)
+        ])
+        commandes = Commande.objects.bulk_create([Commande(table=table) for table in tables])
+        return [commande.pk for commande in commandes], list(plats.values_list('pk', flat=True))
+
+    def executer(self, commandes, plats, nombre_processus, ecritures):
+        # fork : les processus heritent des settings modifies ; aucune
+        # connexion ouverte ne doit etre partagee avec eux
+        connections.close_all()
+        contexte = multiprocessing.get_context('fork')
+        depart = contexte.Event()
+        file = contexte.Queue()
+        processus = [
+            contexte.Process(
+                target=_ecrivain, args=(numero, commandes, plats, ecritures, depart, file)
+            )
+            for numero in range(nombre_processus)
+        ]
+        for p in processus:
+            p.start()
+        debut = time.perf_counter()
+        depart.set()
+        latences, erreurs = [], 0
+        for _ in processus:
+            latences_processus, erreurs_processus = file.get()
+            latences += latences_processus
+            erreurs += erreurs_processus
+        duree = time.perf_counter() - debut
+        for p in processus:
+            p.join()
+        return {'latences': latences, 'erreurs': erreurs, 'duree': duree}
+
+    def verifier(self, commandes):
+        return sum(
+            1 for commande in Commande.objects.filter(pk__in=commandes).avec_totaux_calcules()
+            if commande.montant_total != commande.total_calcule
+        )
+
+
+def _ecrivain(numero, commandes, plats, ecritures, depart, file):
+    """Processus enfant : le parcours de la vue ajouter_items, en boucle"""
+    aleatoire = random.Random(numero)
+    latences, erreurs = [], 0
+    depart.wait()
+    try:
+        for _ in range(ecritures):
+            debut = time.perf_counter()
+            try:
+                # Lecture puis ecriture dans une meme transaction, comme une
+                # vue sous transaction.atomic (ou ATOMIC_REQUESTS)
+                with transaction.atomic():
+                    commande = Commande.objects.avec_table_serveur().get(pk=aleatoire.choice(commandes))
+                    ItemCommande(
+                        commande=commande, plat_id=aleatoire.choice(plats), quantite=1
+                    ).save()
+                list(commande.items.avec_sous_totaux())
+            except OperationalError as exc:
+                if 'locked' not in str(exc):
+                    raise
+                erreurs += 1
+            else:
+                latences.append(time.perf_counter() - debut)
+    finally:
+        connections.close_all()
+        file.put((latences, erreurs))
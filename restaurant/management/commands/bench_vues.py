@@ -0,0 +1,247 @@
+import json
+import os
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+import restaurant
+from restaurant import urls
+from restaurant.benchmarks import base_temporaire, comparer, mesurer_vue
+from restaurant.models import Commande, Facture, ItemCommande, Plat, Reservation, Table
+
+# Budgets de requetes, versionnes : ils ne dependent pas de la machine
+REFERENCE = os.path.join(os.path.dirname(restaurant.__file__), 'bench_vues.json')
+# Temps et memoire, propres a la machine qui les a mesures : hors du depot
+REFERENCE_TEMPS = os.path.join(os.path.dirname(restaurant.__file__), 'bench_vues.local.json')
+MESURES_TEMPS = ('temps_ms', 'sql_ms', 'memoire_kio')
+
+# Routes non mesurees, avec la raison
+EXCLUES = {
+    'flux_cuisine': "flux Server-Sent Events sans fin",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure requetes SQL, temps et memoire de chaque vue sur un jeu de "
+        "donnees volumineux, et compare a la reference enregistree"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=30)
+        parser.add_argument('--tables', type=int, default=50)
+        parser.add_argument('--commandes-par-jour', type=int, default=300)
+        parser.add_argument('--repetitions', type=int, default=10)
+        parser.add_argument('--reference', default=REFERENCE)
+        parser.add_argument('--reference-temps', default=REFERENCE_TEMPS)
+        parser.add_argument(
+            '--seuil',
+            type=float,
+            default=0.5,
+            help="Regression toleree sur les temps et la memoire (0.5 = +50 %%)"
+        )
+        parser.add_argument(
+            '--enregistrer',
+            action='store_true',
+            help="Remplace la reference par les mesures au lieu de comparer"
+        )
+
+    def handle(self, *args, **options):
+        parametres = {
+            'jours': options['jours'],
+            'tables': options['tables'],
+            'commandes_par_jour': options['commandes_par_jour'],
+        }
+
+        setup_test_environment()
+        try:
+            with base_temporaire():
+                call_command('seed', graine=1, stdout=StringIO(), **parametres)
+                mesures = self.mesurer(options['repetitions'])
+        finally:
+            teardown_test_environment()
+
+        for nom, mesure in mesures.items():
+            self.stdout.write(
+                f"{nom:<26} {mesure['statut']} {mesure['requetes']:>4} req "
+                f"{mesure['sql_ms']:>8.1f} ms SQL {mesure['temps_ms']:>8.1f} ms "
+                f"{mesure['memoire_kio']:>8.0f} Kio"
+            )
+
+        if options['enregistrer']:
+            self.enregistrer(options['reference'], options['reference_temps'], parametres, mesures)
+            return
+
+        if not os.path.exists(options['reference']):
+            raise CommandError(
+                f"Pas de reference ({options['reference']}) : lancer avec --enregistrer"
+            )
+        reference = lire(options['reference'])['vues']
+        temps = lire(options['reference_temps'])
+        if not temps:
+            self.stdout.write(self.style.WARNING(
+                f"Pas de reference de temps locale ({options['reference_temps']}) : "
+                "seuls les budgets de requetes sont compares"
+            ))
+        elif temps.get('parametres') != parametres:
+            self.stdout.write(self.style.WARNING(
+                f"Temps de reference mesures avec {temps.get('parametres')} : "
+                "seuls les budgets de requetes sont compares"
+            ))
+        else:
+            for nom, mesure in temps['vues'].items():
+                if nom in reference:
+                    reference[nom].update(
+                        (cle, mesure[cle]) for cle in MESURES_TEMPS if cle in mesure
+                    )
+
+        echecs = comparer(mesures, reference, options['seuil'])
+        echecs += [
+            f"{nom} : HTTP {mesure['statut']}"
+            for nom, mesure in mesures.items() if mesure['statut'] >= 400
+        ]
+        if echecs:
+            for echec in echecs:
+                self.stderr.write(echec)
+            raise CommandError(f"{len(echecs)} regression(s)")
+        self.stdout.write(self.style.SUCCESS("Aucune regression."))
+
+    def enregistrer(self, chemin, chemin_temps, parametres, mesures):
+        anciennes = lire(chemin).get('vues', {})
+        requetes = {}
+        for nom, mesure in mesures.items():
+            requetes[nom] = {'requetes': mesure['requetes']}
+            # Les budgets fixes a la main survivent a un nouvel enregistrement
+            if 'budget_requetes' in anciennes.get(nom, {}):
+                requetes[nom]['budget_requetes'] = anciennes[nom]['budget_requetes']
+        ecrire(chemin, {'parametres': parametres, 'vues': requetes})
+        ecrire(chemin_temps, {'parametres': parametres, 'vues': mesures})
+        self.stdout.write(self.style.SUCCESS(
+            f"Reference enregistree dans {chemin} (requetes) et {chemin_temps} (temps)"
+        ))
+
+    def mesurer(self, repetitions):
+        scenarios = self.scenarios()
+        routes = {motif.name for motif in urls.urlpatterns}
+        manquantes = routes - set(scenarios) - set(EXCLUES)
+        if manquantes:
+            raise CommandError(f"Routes sans scenario : {', '.join(sorted(manquantes))}")
+
+        client = Client()
+        client.force_login(self.utilisateur)
+        return {
+            nom: mesure_vue
+            for nom, (methode, preparer) in scenarios.items()
+            # HTTPS : sans DEBUG, SECURE_SSL_REDIRECT renverrait des 301
+            for mesure_vue in [
+                mesurer_vue(client, methode, preparer(client), repetitions, secure=True)
+            ]
+        }
+
+    def scenarios(self):
+        """{nom de route: (methode, fabrique)} ; fabrique(client) -> preparer"""
+        self.utilisateur = User.objects.create_user('bench', password='bench', is_staff=True)
+        plats = list(Plat.objects.filter(disponible=True)[:3])
+        tables = list(Table.objects.all())
+        for table in tables[:len(tables) // 3]:
+            self.commande_ouverte(table, plats)
+        commande = self.commande_ouverte(tables[-1], plats)
+        reservation = Reservation.objects.filter(statut='TERMINEE').first()
+        facture = Facture.objects.first()
+        demain = (timezone.localdate() + timedelta(days=1)).isoformat()
+        debut_export = (timezone.localdate() - timedelta(days=7)).isoformat()
+
+        def fixe(nom, *args, donnees=None, requete=''):
+            url = reverse(nom, args=args) + requete
+            return lambda client: lambda: (url, donnees)
+
+        def avancer(client):
+            return lambda: (
+                reverse('avancer_statut', args=[self.commande_ouverte(tables[0], plats).pk]),
+                {'suivant': reverse('cuisine')}
+            )
+
+        def ajouter_panier(client):
+            donnees = {'panier-TOTAL_FORMS': len(plats), 'panier-INITIAL_FORMS': 0}
+            for numero, plat in enumerate(plats):
+                donnees[f'panier-{numero}-plat'] = plat.pk
+                donnees[f'panier-{numero}-quantite'] = 2
+            return lambda: (
+                reverse('ajouter_panier', args=[self.commande_ouverte(tables[0], []).pk]),
+                donnees
+            )
+
+        def deconnecter(client):
+            def preparer():
+                client.force_login(self.utilisateur)
+                return reverse('logout'), None
+            return preparer
+
+        scenarios = {
+            'index': ('get', fixe('index')),
+            'menu': ('get', fixe('menu')),
+            'recherche_plats': ('get', fixe('recherche_plats', requete='?q=pou')),
+            'reservation': ('get', fixe('reservation')),
+            'creneaux_reservation': ('get', fixe(
+                'creneaux_reservation', requete=f'?date={demain}&personnes=2'
+            )),
+            'confirmation_reservation': ('get', fixe('confirmation_reservation', reservation.pk)),
+            'dashboard': ('get', fixe('dashboard')),
+            'gestion_tables': ('get', fixe('gestion_tables')),
+            'chronologie_tables': ('get', fixe('chronologie_tables')),
+            'toggle_table': ('get', fixe('toggle_table', tables[1].pk)),
+            'liste_reservations': ('get', fixe('liste_reservations')),
+            'liste_commandes': ('get', fixe('liste_commandes')),
+            'detail_commande': ('get', fixe('detail_commande', commande.pk)),
+            'creer_commande': ('get', fixe('creer_commande', tables[-1].pk)),
+            'avancer_statut': ('post', avancer),
+            'ajouter_items': ('get', fixe('ajouter_items', commande.pk)),
+            'ajouter_panier': ('post', ajouter_panier),
+            'cuisine': ('get', fixe('cuisine')),
+            'liste_factures': ('get', fixe('liste_factures')),
+            'detail_facture': ('get', fixe('detail_facture', facture.pk)),
+            'recu_facture': ('get', fixe('recu_facture', facture.pk)),
+            'generer_facture': ('get', fixe('generer_facture', commande.pk)),
+            'exporter': ('get', fixe(
+                'exporter', 'commandes', requete=f'?du={debut_export}&format=excel'
+            )),
+            'api_liste': ('get', fixe(
+                'api_liste', 'commandes', requete='?expand=table,items.plat&limite=50'
+            )),
+            'api_detail': ('get', fixe(
+                'api_detail', 'commandes', commande.pk, requete='?expand=table,items.plat'
+            )),
+            'analyses': ('get', fixe('analyses')),
+            'instrumentation': ('get', fixe('instrumentation')),
+            'sante_cache': ('get', fixe('sante_cache')),
+            # En dernier : la deconnexion invalide la session du client
+            'logout': ('get', deconnecter),
+        }
+        return scenarios
+
+    def commande_ouverte(self, table, plats):
+        commande = Commande.objects.create(table=table, serveur=self.utilisateur, couverts=2)
+        ItemCommande.objects.bulk_create(
+            ItemCommande(commande=commande, plat=plat, quantite=2) for plat in plats
+        )
+        return commande
+
+
+def lire(chemin):
+    if not os.path.exists(chemin):
+        return {}
+    with open(chemin) as fichier:
+        return json.load(fichier)
+
+
+def ecrire(chemin, contenu):
+    with open(chemin, 'w') as fichier:
+        json.dump(contenu, fichier, indent=2, sort_keys=True)
+        fichier.write('\n')
@@ -0,0 +1,61 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from restaurant import export
+
+
+class Command(BaseCommand):
+    help = "Exporte factures, commandes ou reservations d'une periode en CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('jeu', choices=sorted(export.JEUX))
+        parser.add_argument('--du', help="Premier jour (AAAA-MM-JJ), par defaut le 1er du mois")
+        parser.add_argument('--au', help="Dernier jour inclus (AAAA-MM-JJ), par defaut aujourd'hui")
+        parser.add_argument('--format', choices=export.FORMATS, default='csv')
+        parser.add_argument(
+            '--sortie',
+            help="Fichier de sortie (par defaut nomme d'apres le jeu et la periode, '-' pour stdout)"
+        )
+        parser.add_argument('--gzip', action='store_true', help="Compresse la sortie")
+
+    def handle(self, *args, **options):
+        du, au = export.periode_par_defaut()
+        for cle in ('du', 'au'):
+            if options[cle]:
+                try:
+                    valeur = parse_date(options[cle])
+                except ValueError:
+                    valeur = None
+                if valeur is None:
+                    raise CommandError(f"--{cle} : format attendu AAAA-MM-JJ")
+                if cle == 'du':
+                    du = valeur
+                else:
+                    au = valeur
+        try:
+            export.bornes(du, au)
+        except OverflowError:
+            raise CommandError("Periode hors du calendrier")
+
+        sortie = options['sortie'] or export.nom_fichier(options['jeu'], du, au)
+        compresser = options['gzip'] or sortie.endswith('.gz')
+        if compresser and sortie != '-' and not sortie.endswith('.gz'):
+            sortie += '.gz'
+
+        blocs = export.flux(options['jeu'], du, au, options['format'])
+        if sortie == '-':
+            if compresser:
+                with gzip.open(sys.stdout.buffer, 'wt', encoding='utf-8', newline='') as fichier:
+                    fichier.writelines(blocs)
+            else:
+                for bloc in blocs:
+                    self.stdout.write(bloc, ending='')
+            return
+
+        ouvrir = gzip.open if compresser else open
+        with ouvrir(sortie, 'wt', encoding='utf-8', newline='') as fichier:
+            fichier.writelines(blocs)
+        self.stderr.write(self.style.SUCCESS(f"Export ecrit dans {sortie}"))
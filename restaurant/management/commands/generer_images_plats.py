@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from restaurant import images
+from restaurant.models import Plat
+
+
+class Command(BaseCommand):
+    help = "Genere les variantes responsives des images de plats existantes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--forcer',
+            action='store_true',
+            help="Regenere aussi les images deja traitees (changement de reglages)"
+        )
+        parser.add_argument(
+            '--purger',
+            action='store_true',
+            help="Supprime ensuite les variantes qu'aucun plat ne reference"
+        )
+
+    def handle(self, *args, **options):
+        plats = Plat.objects.exclude(image='').exclude(image__isnull=True)
+        traites = erreurs = 0
+        for pk, nom in plats.values_list('pk', 'nom').iterator():
+            try:
+                if images.generer_variantes(pk, forcer=options['forcer']):
+                    traites += 1
+                    self.stdout.write(f"{nom} : variantes generees")
+            except (OSError, ValueError) as e:
+                erreurs += 1
+                self.stderr.write(f"{nom} : {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{traites} image(s) traitee(s), {erreurs} erreur(s)."
+        ))
+        if options['purger']:
+            self.stdout.write(f"{images.purger()} variante(s) orpheline(s) supprimee(s).")
@@ -0,0 +1,59 @@
+import shutil
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from restaurant import recus, taches
+from restaurant.utils import bornes_jour
+
+
+class Command(BaseCommand):
+    help = "Rend en un seul PDF les recus de toutes les factures d'une journee"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jour', help="Jour (AAAA-MM-JJ), par defaut aujourd'hui")
+        parser.add_argument(
+            '--processus',
+            type=int,
+            help="Processus de rendu (par defaut RECUS_PROCESSUS ou le nombre de coeurs)"
+        )
+        parser.add_argument('--sortie', help="Copie le PDF dans ce fichier")
+        parser.add_argument(
+            '--differe',
+            action='store_true',
+            help="Met le rendu dans la file de taches au lieu de l'executer"
+        )
+
+    def handle(self, *args, **options):
+        jour = timezone.localdate()
+        if options['jour']:
+            try:
+                jour = parse_date(options['jour'])
+                if jour is not None:
+                    bornes_jour(jour)
+            except (ValueError, OverflowError):
+                jour = None
+            if jour is None:
+                raise CommandError("--jour : format attendu AAAA-MM-JJ")
+
+        if options['differe']:
+            taches.enfiler(recus.imprimer_journee, jour=jour.isoformat())
+            self.stdout.write(f"Recus du {jour} mis en file (runworker --files lente)")
+            return
+
+        debut = time.perf_counter()
+        chemin, nombre, rendu = recus.recus_du_jour(jour, options['processus'])
+        duree = time.perf_counter() - debut
+        if not nombre:
+            self.stdout.write(f"Aucune facture le {jour}")
+            return
+
+        etat = "rendus" if rendu else "deja rendus, fichier existant"
+        self.stdout.write(f"{nombre} recus du {jour} {etat} en {duree:.2f} s : {chemin}")
+        if options['sortie']:
+            with default_storage.open(chemin, 'rb') as source, open(options['sortie'], 'wb') as cible:
+                shutil.copyfileobj(source, cible)
+            self.stdout.write(self.style.SUCCESS(f"Copie ecrite dans {options['sortie']}"))
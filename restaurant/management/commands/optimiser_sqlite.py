@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from restaurant import sqlite
+
+
+class Command(BaseCommand):
+    help = (
+        "Entretien periodique de la base SQLite (cron, toutes les heures par "
+        "exemple) : PRAGMA optimize puis point de controle du journal WAL"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--analyser',
+            action='store_true',
+            help="ANALYZE complet plutot que PRAGMA optimize"
+        )
+        parser.add_argument(
+            '--etat',
+            action='store_true',
+            help="Affiche seulement les pragmas et tailles, sans rien modifier"
+        )
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        if not sqlite.est_sqlite(alias):
+            raise CommandError(f"La base {alias!r} n'est pas une base SQLite")
+
+        avant = sqlite.etat(alias)
+        for nom, valeur in avant.items():
+            self.stdout.write(f"{nom:<18} {valeur}")
+        if options['etat']:
+            return
+
+        bloque, pages_journal, pages_reportees = sqlite.optimiser(alias, options['analyser'])
+        if bloque:
+            self.stdout.write(self.style.WARNING(
+                f"Point de controle partiel ({pages_reportees}/{pages_journal} pages) : "
+                "des lectures etaient en cours"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Base optimisee, journal WAL : {avant['taille_wal']} -> "
+            f"{sqlite.taille_wal(alias)} octets."
+        ))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from restaurant.models import Commande
+
+
+class Command(BaseCommand):
+    help = "Recalcule et verifie les totaux denormalises des commandes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verifier',
+            action='store_true',
+            help="Signale les ecarts sans les corriger (code de sortie non nul)"
+        )
+
+    def handle(self, *args, **options):
+        verifier = options['verifier']
+
+        commandes = Commande.objects.order_by().avec_totaux_calcules().values_list(
+            'pk', 'montant_total', 'nombre_items', 'total_calcule', 'nombre_calcule'
+        )
+
+        ecarts = 0
+        for pk, montant_total, nombre_items, montant, nombre in commandes.iterator():
+            if montant_total == montant and nombre_items == nombre:
+                continue
+
+            ecarts += 1
+            self.stdout.write(
+                f"Commande #{pk}: {montant_total} / {nombre_items} items "
+                f"enregistres, {montant} / {nombre} attendus"
+            )
+            if not verifier:
+                with transaction.atomic():
+                    Commande.objects.select_for_update().get(pk=pk).recalculer_totaux()
+
+        if not ecarts:
+            self.stdout.write(self.style.SUCCESS("Tous les totaux sont corrects."))
+        elif verifier:
+            raise CommandError(f"{ecarts} commande(s) avec des totaux incorrects")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{ecarts} commande(s) corrigee(s)."))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from restaurant import ventes
+from restaurant.utils import bornes_jour
+
+
+class Command(BaseCommand):
+    help = "Recalcule le cumul des ventes journalieres a partir des factures"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--depuis',
+            help="Premier jour a recalculer (AAAA-MM-JJ), par defaut tout l'historique"
+        )
+        parser.add_argument(
+            '--verifier',
+            action='store_true',
+            help="Signale les ecarts sans les corriger (code de sortie non nul)"
+        )
+
+    def handle(self, *args, **options):
+        depuis = None
+        if options['depuis']:
+            try:
+                depuis = parse_date(options['depuis'])
+                if depuis is not None:
+                    bornes_jour(depuis)
+            except (ValueError, OverflowError):
+                depuis = None
+            if depuis is None:
+                raise CommandError("Date invalide, format attendu : AAAA-MM-JJ")
+
+        if options['verifier']:
+            lignes = ventes.ecarts(depuis)
+            for (jour, methode), enregistre, attendu in lignes:
+                self.stdout.write(
+                    f"{jour} {methode}: {enregistre['montant_ttc']} FCFA / "
+                    f"{enregistre['nombre_factures']} factures enregistres, "
+                    f"{attendu['montant_ttc']} FCFA / "
+                    f"{attendu['nombre_factures']} factures attendus"
+                )
+            if lignes:
+                raise CommandError(f"{len(lignes)} ligne(s) de ventes incorrecte(s)")
+            self.stdout.write(self.style.SUCCESS("Le cumul des ventes est correct."))
+            return
+
+        nombre = ventes.reconstruire(depuis)
+        self.stdout.write(self.style.SUCCESS(f"{nombre} ligne(s) de ventes recalculee(s)."))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from restaurant import cache_menu, recherche
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche des plats"
+
+    def handle(self, *args, **options):
+        recherche.reconstruire_index()
+        cache_menu.incrementer_version()
+        self.stdout.write(self.style.SUCCESS("Index de recherche reconstruit."))
@@ -0,0 +1,103 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from restaurant import taches
+
+
+def _lancer_threads(files, threads, une_fois, arret):
+    resultats = [0] * threads
+
+    def boucle(numero):
+        resultats[numero] = taches.travailler(files, arret, une_fois)
+
+    fils = [
+        threading.Thread(target=boucle, args=(numero,), name=f'runworker-{numero}')
+        for numero in range(threads)
+    ]
+    for fil in fils:
+        fil.start()
+    for fil in fils:
+        fil.join()
+    return sum(resultats)
+
+
+def _processus(files, threads, une_fois):
+    arret = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: arret.set())
+    signal.signal(signal.SIGINT, lambda *args: arret.set())
+    _lancer_threads(files, threads, une_fois, arret)
+
+
+class Command(BaseCommand):
+    help = (
+        "Execute les taches differees (file en base). Un travailleur par "
+        "thread ; --processus N en lance N processus de --threads threads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--files',
+            default=','.join(taches.FILES),
+            help=f"Files a traiter, separees par des virgules ({', '.join(taches.FILES)})"
+        )
+        parser.add_argument('--threads', type=int, default=2)
+        parser.add_argument(
+            '--processus',
+            type=int,
+            default=0,
+            help="Processus de travailleurs (0 : tout dans ce processus)"
+        )
+        parser.add_argument(
+            '--une-fois',
+            action='store_true',
+            help="S'arrete des que plus aucune tache n'est prete"
+        )
+
+    def handle(self, *args, **options):
+        files = [nom.strip() for nom in options['files'].split(',') if nom.strip()]
+        inconnues = set(files) - set(taches.FILES)
+        if inconnues:
+            raise CommandError(f"File(s) inconnue(s) : {', '.join(sorted(inconnues))}")
+        if options['threads'] < 1:
+            raise CommandError("--threads doit etre au moins 1")
+
+        self.stdout.write(
+            f"Travailleurs : {max(options['processus'], 1)} processus x "
+            f"{options['threads']} threads, files {', '.join(files)}"
+        )
+        if options['processus']:
+            self.processus(files, options)
+            return
+
+        arret = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *args: arret.set())
+        signal.signal(signal.SIGINT, lambda *args: arret.set())
+        executees = _lancer_threads(files, options['threads'], options['une_fois'], arret)
+        self.stdout.write(self.style.SUCCESS(f"{executees} tache(s) executee(s)."))
+
+    def processus(self, files, options):
+        # Aucune connexion ouverte ne doit etre heritee par les processus
+        connections.close_all()
+        contexte = multiprocessing.get_context('fork')
+        enfants = [
+            contexte.Process(
+                target=_processus, args=(files, options['threads'], options['une_fois'])
+            )
+            for _ in range(options['processus'])
+        ]
+        for enfant in enfants:
+            enfant.start()
+
+        def transmettre(signum, frame):
+            for enfant in enfants:
+                if enfant.is_alive():
+                    enfant.terminate()
+        signal.signal(signal.SIGTERM, transmettre)
+        signal.signal(signal.SIGINT, transmettre)
+        for enfant in enfants:
+            enfant.join()
+        self.stdout.write(self.style.SUCCESS("Travailleurs arretes."))
@@ -1,15 +1,116 @@
-from django.core.management.base import BaseCommand
+import random
+import time as chrono
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from restaurant.models import Categorie, Plat, Table, Commande, ItemCommande
+from django.db import transaction
+from django.utils import timezone
+from restaurant import numerotation, ventes
+from restaurant.models import (
+    Categorie, Plat, PlatPrixHistorique, Table, Commande, ItemCommande, Reservation, Facture,
+    OccupationTable
+)
 from decimal import Decimal
 
+CENTIME = Decimal('0.01')
+
+PRENOMS = [
+    "Awa", "Moussa", "Fatou", "Ibrahima", "Aminata", "Ousmane", "Mariama",
+    "Cheikh", "Khady", "Mamadou", "Aissatou", "Abdoulaye", "Ndeye", "Babacar",
+    "Sophie", "Thomas", "Julie", "Karim", "Nadia", "Paul",
+]
+NOMS = [
+    "Diop", "Ndiaye", "Fall", "Sow", "Ba", "Diallo", "Faye", "Gueye", "Sarr",
+    "Cisse", "Kane", "Mbaye", "Seck", "Traore", "Martin", "Bernard", "Dubois",
+]
+# (poids, heure de debut, heure de fin) des services
+SERVICES = [(4, 12.0, 14.5), (6, 19.0, 22.5)]
+METHODES = [('ESPECE', 50), ('MOBILE', 35), ('CARTE', 15)]
+
+
+@contextmanager
+def dates_imposees(*champs):
+    """Desactive auto_now / auto_now_add : les dates fournies sont conservees"""
+    anciens = [(champ, champ.auto_now, champ.auto_now_add) for champ in champs]
+    for champ in champs:
+        champ.auto_now = champ.auto_now_add = False
+    try:
+        yield
+    finally:
+        for champ, auto_now, auto_now_add in anciens:
+            champ.auto_now, champ.auto_now_add = auto_now, auto_now_add
+
 
 class Command(BaseCommand):
-    help = "Insère les données de base pour le test"
+    help = "Insère les données de base pour le test, ou un jeu de données volumineux (--jours)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--jours', '--days',
+            type=int,
+            default=0,
+            help="Genere l'historique des N derniers jours (mode volumineux)"
+        )
+        parser.add_argument(
+            '--tables',
+            type=int,
+            default=10,
+            help="Nombre de tables de la salle"
+        )
+        parser.add_argument(
+            '--commandes-par-jour', '--orders-per-day',
+            type=int,
+            default=200,
+            help="Nombre moyen de commandes par jour"
+        )
+        parser.add_argument(
+            '--graine', '--seed',
+            type=int,
+            default=42,
+            help="Graine aleatoire : meme graine, memes donnees"
+        )
+        parser.add_argument(
+            '--lot', '--batch-size',
+            type=int,
+            default=2000,
+            help="Nombre de lignes par INSERT"
+        )
 
     def handle(self, *args, **kwargs):
         self.stdout.write(self.style.WARNING(" Insertion des données..."))
 
+        serveur = self.donnees_de_base(kwargs['tables'])
+
+        if kwargs['jours'] > 0:
+            self.historique(kwargs)
+            return
+
+        # --- COMMANDE D'EXEMPLE ---
+        table1 = Table.objects.get(numero=1)
+
+        commande = Commande.objects.create(
+            table=table1,
+            serveur=serveur,
+            statut="EN_COURS"
+        )
+
+        # On prend quelques plats existants
+        plats = Plat.objects.all()[:3]
+
+        for plat in plats:
+            ItemCommande.objects.create(
+                commande=commande,
+                plat=plat,
+                quantite=1,
+                prix_unitaire=plat.prix
+            )
+
+        self.stdout.write(self.style.SUCCESS("Données insérées avec succès !"))
+
+    def donnees_de_base(self, nombre_tables):
         # --- UTILISATEUR / SERVEUR ---
         serveur, created = User.objects.get_or_create(
             username="serveur1",
@@ -63,33 +164,208 @@ class Command(BaseCommand):
             )
 
         # --- TABLES ---
-        for i in range(1, 11):  # 10 tables
-            Table.objects.get_or_create(
+        existantes = set(Table.objects.values_list('numero', flat=True))
+        Table.objects.bulk_create(
+            Table(
                 numero=i,
-                defaults={
-                    "capacite": 4 if i <= 5 else 6,
-                    "disponible": True
-                }
+                capacite=(4 if i <= 5 else 6) if i <= 10 else (2, 4, 4, 6, 8)[i % 5],
+                disponible=True
             )
+            for i in range(1, nombre_tables + 1)
+            if i not in existantes
+        )
 
-        # --- COMMANDE D'EXEMPLE ---
-        table1 = Table.objects.get(numero=1)
+        return serveur
 
-        commande = Commande.objects.create(
-            table=table1,
-            serveur=serveur,
-            statut="EN_COURS"
-        )
+    def historique(self, options):
+        """Reservations, commandes, items et factures des N derniers jours.
 
-        # On prend quelques plats existants
-        plats = Plat.objects.all()[:3]
+        Chaque jour est genere puis insere dans sa propre transaction, par
+        lots de `--lot` lignes : la memoire reste constante quelle que soit
+        la duree de l'historique.
+        """
+        rng = random.Random(options['graine'])
+        lot = options['lot']
+        jours = options['jours']
+        par_jour = options['commandes_par_jour']
 
+        tables = list(
+            Table.objects.filter(numero__lte=options['tables']).values_list('id', 'capacite')
+        )
+        plats = list(Plat.objects.values_list('id', 'prix', 'categorie__nom'))
+        if not tables or not plats:
+            raise CommandError("Aucune table ou aucun plat disponible")
+        par_categorie = {}
         for plat in plats:
-            ItemCommande.objects.create(
-                commande=commande,
-                plat=plat,
-                quantite=1,
-                prix_unitaire=plat.prix
+            par_categorie.setdefault(plat[2], []).append(plat)
+        serveurs = self.serveurs(max(3, len(tables) // 15))
+
+        aujourd_hui = timezone.localdate()
+        premier = aujourd_hui - timedelta(days=jours)
+        debut = chrono.monotonic()
+        lignes = 0
+
+        modeles = (Commande, Reservation, Facture)
+        champs = [
+            champ for modele in modeles for champ in modele._meta.concrete_fields
+            if getattr(champ, 'auto_now', False) or getattr(champ, 'auto_now_add', False)
+        ]
+        with dates_imposees(*champs):
+            for decalage in range(jours):
+                jour = premier + timedelta(days=decalage)
+                with transaction.atomic():
+                    lignes += self.reservations(rng, jour, tables, lot)
+                    lignes += self.commandes(
+                        rng, jour, tables, par_categorie, serveurs, par_jour, lot
+                    )
+                if (decalage + 1) % 30 == 0 or decalage + 1 == jours:
+                    duree = chrono.monotonic() - debut
+                    self.stdout.write(
+                        f"{decalage + 1}/{jours} jours, {lignes} lignes "
+                        f"({lignes / max(duree, 0.001):.0f} lignes/s)"
+                    )
+
+        ventes.reconstruire(depuis=premier)
+        # Les prix actuels couvrent tout l'historique genere
+        debut_historique = timezone.make_aware(datetime.combine(premier, time.min))
+        PlatPrixHistorique.objects.filter(
+            version=1, valide_du__gt=debut_historique
+        ).update(valide_du=debut_historique)
+        self.stdout.write(self.style.SUCCESS(
+            f"{lignes} lignes insérées en {chrono.monotonic() - debut:.1f} s."
+        ))
+
+    def serveurs(self, nombre):
+        mot_de_passe = make_password("password123")
+        existants = set(
+            User.objects.filter(username__startswith='serveur').values_list('username', flat=True)
+        )
+        User.objects.bulk_create(
+            User(
+                username=f"serveur{i}",
+                first_name=PRENOMS[i % len(PRENOMS)],
+                last_name="Serveur",
+                password=mot_de_passe
             )
+            for i in range(1, nombre + 1)
+            if f"serveur{i}" not in existants
+        )
+        return list(
+            User.objects.filter(
+                username__in=[f"serveur{i}" for i in range(1, nombre + 1)]
+            ).order_by('username').values_list('id', flat=True)
+        )
 
-        self.stdout.write(self.style.SUCCESS("Données insérées avec succès !"))
+    def moment(self, rng, jour):
+        _, heure_debut, heure_fin = rng.choices(
+            SERVICES, weights=[poids for poids, _, _ in SERVICES]
+        )[0]
+        heure = rng.uniform(heure_debut, heure_fin)
+        return timezone.make_aware(datetime.combine(jour, time.min)) + timedelta(hours=heure)
+
+    def reservations(self, rng, jour, tables, lot):
+        """Au plus deux reservations par table et par soir, sans chevauchement"""
+        duree = Reservation.duree_service()
+        soir = timezone.make_aware(datetime.combine(jour, time(18, 0)))
+        objets = []
+        for table_id, capacite in tables:
+            debut = soir + timedelta(minutes=rng.choice((0, 15, 30)))
+            for _ in range(2):
+                if rng.random() < 0.35:
+                    statut = 'ANNULEE' if rng.random() < 0.12 else 'TERMINEE'
+                    prenom, nom = rng.choice(PRENOMS), rng.choice(NOMS)
+                    objets.append(Reservation(
+                        client_nom=f"{prenom} {nom}",
+                        client_telephone=f"+221 77 {rng.randrange(10**7):07d}",
+                        client_email=f"{prenom}.{nom}@example.com".lower(),
+                        table_id=table_id,
+                        nombre_personnes=rng.randint(1, capacite),
+                        date_reservation=debut,
+                        date_fin=debut + duree,
+                        date_creation=debut - timedelta(days=rng.randint(0, 14)),
+                        statut=statut
+                    ))
+                debut += duree + timedelta(minutes=rng.choice((0, 15, 30)))
+        Reservation.objects.bulk_create(objets, batch_size=lot)
+        return len(objets)
+
+    def commandes(self, rng, jour, tables, par_categorie, serveurs, par_jour, lot):
+        nombre = max(0, round(rng.gauss(par_jour, par_jour * 0.1)))
+        principaux = par_categorie.get("Plats principaux") or sum(par_categorie.values(), [])
+        autres = [plat for nom, liste in par_categorie.items()
+                  if nom != "Plats principaux" for plat in liste]
+
+        commandes, lignes = [], []
+        for _ in range(nombre):
+            table_id, capacite = rng.choice(tables)
+            couverts = rng.randint(1, capacite)
+            creation = self.moment(rng, jour)
+            items = []
+            for _ in range(couverts):
+                items.append((rng.choice(principaux), 1))
+            for _ in range(rng.randint(0, couverts + 1)):
+                if autres:
+                    items.append((rng.choice(autres), rng.choice((1, 1, 1, 2, 3))))
+            montant = sum(prix * quantite for (_, prix, _), quantite in items)
+            commandes.append(Commande(
+                table_id=table_id,
+                serveur_id=rng.choice(serveurs),
+                date_creation=creation,
+                date_modification=creation + timedelta(minutes=rng.randint(30, 90)),
+                statut='PAYEE',
+                couverts=couverts,
+                montant_total=montant,
+                nombre_items=len(items)
+            ))
+            lignes.append(items)
+
+        Commande.objects.bulk_create(commandes, batch_size=lot)
+
+        ItemCommande.objects.bulk_create(
+            (
+                ItemCommande(
+                    commande_id=commande.pk,
+                    plat_id=plat_id,
+                    quantite=quantite,
+                    prix_unitaire=prix
+                )
+                for commande, items in zip(commandes, lignes)
+                for (plat_id, prix, _), quantite in items
+            ),
+            batch_size=lot,
+            totaux_a_jour=True
+        )
+
+        # Numeros alloues dans la transaction du jour : sequence sans trou
+        numeros = numerotation.numeros(len(commandes), jour) if commandes else []
+        factures = []
+        for commande, numero in zip(commandes, numeros):
+            tva = (commande.montant_total * Facture.TAUX_TVA).quantize(CENTIME)
+            factures.append(Facture(
+                commande_id=commande.pk,
+                numero_facture=numero,
+                montant_total=commande.montant_total,
+                tva=tva,
+                montant_ttc=commande.montant_total + tva,
+                methode_paiement=rng.choices(
+                    [methode for methode, _ in METHODES],
+                    weights=[poids for _, poids in METHODES]
+                )[0],
+                date_emission=commande.date_modification,
+                payee=True
+            ))
+        Facture.objects.bulk_create(factures, batch_size=lot)
+
+        # Table occupee de l'ouverture de la commande a sa facture
+        occupations = [
+            OccupationTable(
+                table_id=commande.table_id,
+                commande_id=commande.pk,
+                debut=commande.date_creation,
+                fin=commande.date_modification
+            )
+            for commande in commandes
+        ]
+        OccupationTable.objects.bulk_create(occupations, batch_size=lot)
+
+        return len(commandes) + sum(map(len, lignes)) + len(factures) + len(occupations)
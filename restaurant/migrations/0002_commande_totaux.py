@@ -0,0 +1,43 @@
+# Generated by Django 5.2.9 on 2026-10-18 20:08
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def calculer_totaux(apps, schema_editor):
+    Commande = apps.get_model('restaurant', 'Commande')
+    for commande in Commande.objects.annotate(
+        montant=Sum(F('items__quantite') * F('items__prix_unitaire')),
+        nombre=Count('items')
+    ).iterator():
+        Commande.objects.filter(pk=commande.pk).update(
+            montant_total=commande.montant or Decimal('0.00'),
+            nombre_items=commande.nombre
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commande',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='commande',
+            name='montant_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='commande',
+            name='nombre_items',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(calculer_totaux, migrations.RunPython.noop),
+    ]
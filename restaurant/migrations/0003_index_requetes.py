@@ -0,0 +1,47 @@
+# Generated by Django 5.2.9 on 2026-10-18 20:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0002_commande_totaux'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['-date_creation', '-id'], name='commande_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['statut', '-date_creation', '-id'], name='commande_statut_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(condition=models.Q(('statut', 'PAYEE'), _negated=True), fields=['-date_creation'], name='commande_ouverte_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facture',
+            index=models.Index(fields=['-date_emission', '-id'], name='facture_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plat',
+            index=models.Index(condition=models.Q(('disponible', True)), fields=['categorie', 'nom'], name='plat_disponible_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['-date_reservation', '-id'], name='reservation_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['statut', '-date_reservation', '-id'], name='reservation_statut_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='table',
+            index=models.Index(condition=models.Q(('disponible', False)), fields=['numero'], name='table_occupee_idx'),
+        ),
+    ]
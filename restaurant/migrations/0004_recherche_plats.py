@@ -0,0 +1,78 @@
+from django.db import migrations
+
+
+SQLITE_CREATION = [
+    "CREATE VIRTUAL TABLE restaurant_plat_fts USING fts5("
+    "nom, description, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO restaurant_plat_fts (rowid, nom, description) "
+    "SELECT id, nom, description FROM restaurant_plat",
+]
+
+SQLITE_SUPPRESSION = [
+    "DROP TABLE IF EXISTS restaurant_plat_fts",
+]
+
+POSTGRESQL_CREATION = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_ts_config WHERE cfgname = 'french_unaccent'
+        ) THEN
+            CREATE TEXT SEARCH CONFIGURATION french_unaccent (COPY = french);
+            ALTER TEXT SEARCH CONFIGURATION french_unaccent
+                ALTER MAPPING FOR hword, hword_part, word
+                WITH unaccent, french_stem;
+        END IF;
+    END
+    $$
+    """,
+    "ALTER TABLE restaurant_plat ADD COLUMN recherche tsvector "
+    "GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('french_unaccent', coalesce(nom, '')), 'A') || "
+    "setweight(to_tsvector('french_unaccent', coalesce(description, '')), 'B')"
+    ") STORED",
+    "CREATE INDEX plat_recherche_idx ON restaurant_plat USING GIN (recherche)",
+]
+
+POSTGRESQL_SUPPRESSION = [
+    "DROP INDEX IF EXISTS plat_recherche_idx",
+    "ALTER TABLE restaurant_plat DROP COLUMN IF EXISTS recherche",
+]
+
+
+def executer(requetes_par_moteur):
+    def operation(apps, schema_editor):
+        connection = schema_editor.connection
+        requetes = requetes_par_moteur.get(connection.vendor, [])
+        if connection.vendor == 'sqlite' and requetes is SQLITE_CREATION:
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA compile_options")
+                options = {ligne[0] for ligne in cursor.fetchall()}
+            if 'ENABLE_FTS5' not in options:
+                # recherche.rechercher_ids() se rabat alors sur icontains
+                return
+        for requete in requetes:
+            schema_editor.execute(requete)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0003_index_requetes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            executer({
+                'sqlite': SQLITE_CREATION,
+                'postgresql': POSTGRESQL_CREATION,
+            }),
+            executer({
+                'sqlite': SQLITE_SUPPRESSION,
+                'postgresql': POSTGRESQL_SUPPRESSION,
+            }),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def calculer_date_fin(apps, schema_editor):
+    Reservation = apps.get_model('restaurant', 'Reservation')
+    duree = timedelta(minutes=getattr(settings, 'RESERVATION_DUREE', 120))
+    Reservation.objects.update(date_fin=models.F('date_reservation') + duree)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0004_recherche_plats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='date_fin',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(calculer_date_fin, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='reservation',
+            name='date_fin',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('statut__in', ['EN_ATTENTE', 'CONFIRMEE'])), fields=['table', 'date_reservation', 'date_fin'], name='reservation_creneau_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.9 on 2026-10-18 20:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0005_reservation_creneaux'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenceFacture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periode', models.CharField(max_length=8, unique=True)),
+                ('dernier_numero', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Sequence de factures',
+                'verbose_name_plural': 'Sequences de factures',
+            },
+        ),
+    ]
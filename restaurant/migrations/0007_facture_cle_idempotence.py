@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 20:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0006_sequence_facture'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facture',
+            name='cle_idempotence',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.9 on 2026-10-18 20:20
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def cumuler_ventes(apps, schema_editor):
+    Facture = apps.get_model('restaurant', 'Facture')
+    VenteJournaliere = apps.get_model('restaurant', 'VenteJournaliere')
+    lignes = Facture.objects.order_by().annotate(
+        jour=TruncDate('date_emission', tzinfo=timezone.get_current_timezone())
+    ).values('jour', 'methode_paiement').annotate(
+        nombre_factures=Count('id'),
+        couverts=Sum('commande__couverts'),
+        montant_ht=Sum('montant_total'),
+        somme_tva=Sum('tva'),
+        somme_ttc=Sum('montant_ttc'),
+        montant_encaisse=Sum('montant_ttc', filter=Q(payee=True)),
+    )
+    VenteJournaliere.objects.bulk_create(
+        VenteJournaliere(
+            jour=ligne['jour'],
+            methode_paiement=ligne['methode_paiement'],
+            nombre_factures=ligne['nombre_factures'],
+            nombre_commandes=ligne['nombre_factures'],
+            couverts=ligne['couverts'] or 0,
+            montant_ht=ligne['montant_ht'] or 0,
+            tva=ligne['somme_tva'] or 0,
+            montant_ttc=ligne['somme_ttc'] or 0,
+            montant_encaisse=ligne['montant_encaisse'] or 0,
+        )
+        for ligne in lignes
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0007_facture_cle_idempotence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commande',
+            name='couverts',
+            field=models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.CreateModel(
+            name='VenteJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('methode_paiement', models.CharField(choices=[('ESPECE', 'Espece'), ('CARTE', 'Carte bancaire'), ('MOBILE', 'Mobile money')], max_length=20)),
+                ('nombre_factures', models.PositiveIntegerField(default=0)),
+                ('nombre_commandes', models.PositiveIntegerField(default=0)),
+                ('couverts', models.PositiveIntegerField(default=0)),
+                ('montant_ht', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('tva', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('montant_ttc', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('montant_encaisse', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Vente journaliere',
+                'verbose_name_plural': 'Ventes journalieres',
+                'ordering': ['-jour', 'methode_paiement'],
+                'constraints': [models.UniqueConstraint(fields=('jour', 'methode_paiement'), name='vente_jour_methode_unique')],
+            },
+        ),
+        migrations.RunPython(cumuler_ventes, migrations.RunPython.noop),
+    ]
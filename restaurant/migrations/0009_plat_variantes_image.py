@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0008_ventes_journalieres'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plat',
+            name='variantes_image',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.9 on 2026-10-18 20:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0009_plat_variantes_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=200)),
+                ('arguments', models.JSONField(blank=True, default=dict)),
+                ('file', models.CharField(default='defaut', max_length=30)),
+                ('priorite', models.SmallIntegerField(default=0)),
+                ('cle', models.CharField(blank=True, max_length=200, null=True, unique=True)),
+                ('statut', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('EN_COURS', 'En cours'), ('TERMINEE', 'Terminee'), ('ECHEC', 'Echec')], default='EN_ATTENTE', max_length=20)),
+                ('tentatives', models.PositiveSmallIntegerField(default=0)),
+                ('tentatives_max', models.PositiveSmallIntegerField(default=5)),
+                ('disponible_a', models.DateTimeField(default=django.utils.timezone.now)),
+                ('travailleur', models.CharField(blank=True, max_length=100)),
+                ('bail', models.DateTimeField(blank=True, null=True)),
+                ('derniere_erreur', models.TextField(blank=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Tache',
+                'verbose_name_plural': 'Taches',
+                'indexes': [models.Index(condition=models.Q(('statut', 'EN_ATTENTE')), fields=['file', '-priorite', 'disponible_a'], name='tache_en_attente_idx'), models.Index(condition=models.Q(('statut', 'EN_COURS')), fields=['bail'], name='tache_en_cours_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.9 on 2026-10-18 21:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def prix_initiaux(apps, schema_editor):
+    # Prix actuel valable depuis la creation du plat, ou depuis sa premiere
+    # commande si elle est plus ancienne (donnees importees)
+    Plat = apps.get_model('restaurant', 'Plat')
+    PlatPrixHistorique = apps.get_model('restaurant', 'PlatPrixHistorique')
+    plats = Plat.objects.order_by().annotate(
+        premiere_commande=Min('itemcommande__commande__date_creation')
+    ).values_list('pk', 'prix', 'date_creation', 'premiere_commande')
+    PlatPrixHistorique.objects.bulk_create(
+        PlatPrixHistorique(
+            plat_id=pk,
+            version=1,
+            prix=prix,
+            valide_du=min(filter(None, (date_creation, premiere_commande))),
+        )
+        for pk, prix, date_creation, premiere_commande in plats
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0010_taches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatPrixHistorique',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('prix', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('valide_du', models.DateTimeField()),
+                ('valide_au', models.DateTimeField(blank=True, null=True)),
+                ('plat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historique_prix', to='restaurant.plat')),
+            ],
+            options={
+                'verbose_name': 'Prix historique',
+                'verbose_name_plural': 'Historique des prix',
+                'ordering': ['plat', '-version'],
+                'indexes': [models.Index(fields=['plat', 'valide_du'], name='prix_plat_validite_idx')],
+                'constraints': [models.UniqueConstraint(fields=('plat', 'version'), name='prix_plat_version_unique'), models.UniqueConstraint(condition=models.Q(('valide_au__isnull', True)), fields=('plat',), name='prix_plat_courant_unique'), models.CheckConstraint(condition=models.Q(('valide_au__isnull', True), ('valide_au__gt', models.F('valide_du')), _connector='OR'), name='prix_intervalle_valide')],
+            },
+        ),
+        migrations.RunPython(prix_initiaux, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.9 on 2026-10-18 21:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def occupations_initiales(apps, schema_editor):
+    # Historique reconstitue depuis les commandes payees (de l'ouverture a
+    # la facture), puis occupations en cours des tables marquees occupees
+    Table = apps.get_model('restaurant', 'Table')
+    Commande = apps.get_model('restaurant', 'Commande')
+    OccupationTable = apps.get_model('restaurant', 'OccupationTable')
+    OccupationTable.objects.bulk_create(
+        (
+            OccupationTable(table_id=table_id, commande_id=pk, debut=debut, fin=fin)
+            for pk, table_id, debut, fin in Commande.objects.filter(
+                facture__isnull=False
+            ).order_by().values_list('pk', 'table_id', 'date_creation', 'facture__date_emission')
+            if fin >= debut
+        ),
+        batch_size=2000
+    )
+    maintenant = django.utils.timezone.now()
+    for table in Table.objects.filter(disponible=False):
+        commande = Commande.objects.filter(table=table).exclude(
+            statut='PAYEE'
+        ).order_by('-date_creation').first()
+        OccupationTable.objects.create(
+            table=table,
+            commande=commande,
+            origine='COMMANDE' if commande else 'MANUELLE',
+            debut=commande.date_creation if commande else maintenant,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0011_historique_prix'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccupationTable',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origine', models.CharField(choices=[('COMMANDE', 'Commande'), ('MANUELLE', 'Manuelle')], default='COMMANDE', max_length=10)),
+                ('debut', models.DateTimeField(default=django.utils.timezone.now)),
+                ('fin', models.DateTimeField(blank=True, null=True)),
+                ('commande', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occupations', to='restaurant.commande')),
+                ('table', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupations', to='restaurant.table')),
+            ],
+            options={
+                'verbose_name': 'Occupation de table',
+                'verbose_name_plural': 'Occupations des tables',
+                'ordering': ['-debut'],
+                'indexes': [models.Index(fields=['fin', 'debut'], name='occupation_fin_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('fin__isnull', True)), fields=('table',), name='occupation_en_cours_unique'), models.CheckConstraint(condition=models.Q(('fin__isnull', True), ('fin__gte', models.F('debut')), _connector='OR'), name='occupation_intervalle_valide')],
+            },
+        ),
+        migrations.RunPython(occupations_initiales, migrations.RunPython.noop),
+    ]
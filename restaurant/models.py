@@ -1,6 +1,13 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import (
+    Count, F, OuterRef, Prefetch, Q, Subquery, Sum, Value
+)
+from django.db.models.functions import Coalesce, Concat, NullIf, Trim
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+from datetime import timedelta
 from decimal import Decimal
 
 class Categorie(models.Model):
@@ -32,6 +39,8 @@ class Plat(models.Model):
         blank=True, 
         null=True
     )
+    # Variantes redimensionnees de l'image, produites par images.py
+    variantes_image = models.JSONField(default=dict, blank=True, editable=False)
     disponible = models.BooleanField(default=True)
     date_creation = models.DateTimeField(auto_now_add=True)
     
@@ -39,10 +48,67 @@ class Plat(models.Model):
         verbose_name = "Plat"
         verbose_name_plural = "Plats"
         ordering = ['categorie', 'nom']
+        indexes = [
+            # Menu public : plats disponibles, par categorie puis nom
+            models.Index(
+                fields=['categorie', 'nom'],
+                condition=Q(disponible=True),
+                name='plat_disponible_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.nom} - {self.prix} FCFA"
 
+class PlatPrixHistorique(models.Model):
+    """Prix d'un plat sur l'intervalle [valide_du, valide_au).
+
+    Une ligne par changement de prix, ecrite par prix.py ; la ligne
+    courante a valide_au vide.
+    """
+    plat = models.ForeignKey(
+        Plat,
+        on_delete=models.CASCADE,
+        related_name='historique_prix'
+    )
+    version = models.PositiveIntegerField()
+    prix = models.DecimalField(
+        max_digits=10,
+        decimal_places=2
+    )
+    valide_du = models.DateTimeField()
+    valide_au = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Prix historique"
+        verbose_name_plural = "Historique des prix"
+        ordering = ['plat', '-version']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['plat', 'version'],
+                name='prix_plat_version_unique'
+            ),
+            models.UniqueConstraint(
+                fields=['plat'],
+                condition=Q(valide_au__isnull=True),
+                name='prix_plat_courant_unique'
+            ),
+            models.CheckConstraint(
+                condition=Q(valide_au__isnull=True) | Q(valide_au__gt=F('valide_du')),
+                name='prix_intervalle_valide'
+            ),
+        ]
+        indexes = [
+            # Jointure sur intervalle : plat, puis debut de validite
+            models.Index(
+                fields=['plat', 'valide_du'],
+                name='prix_plat_validite_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.plat_id} v{self.version} : {self.prix} FCFA"
+
 class Table(models.Model):
     numero = models.IntegerField(unique=True)
     capacite = models.IntegerField(
@@ -54,6 +120,13 @@ class Table(models.Model):
         verbose_name = "Table"
         verbose_name_plural = "Tables"
         ordering = ['numero']
+        indexes = [
+            models.Index(
+                fields=['numero'],
+                condition=Q(disponible=False),
+                name='table_occupee_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"Table {self.numero} ({self.capacite} places)"
@@ -65,6 +138,8 @@ class Reservation(models.Model):
         ('ANNULEE', 'Annulee'),
         ('TERMINEE', 'Terminee'),
     ]
+    # Statuts qui bloquent la table sur le creneau
+    STATUTS_ACTIFS = ['EN_ATTENTE', 'CONFIRMEE']
     
     client_nom = models.CharField(max_length=200)
     client_telephone = models.CharField(max_length=20)
@@ -78,6 +153,8 @@ class Reservation(models.Model):
         validators=[MinValueValidator(1)]
     )
     date_reservation = models.DateTimeField()
+    # Fin du creneau : date_reservation + duree du service
+    date_fin = models.DateTimeField(editable=False)
     date_creation = models.DateTimeField(auto_now_add=True)
     statut = models.CharField(
         max_length=20,
@@ -90,9 +167,85 @@ class Reservation(models.Model):
         verbose_name = "Reservation"
         verbose_name_plural = "Reservations"
         ordering = ['-date_reservation']
+        indexes = [
+            models.Index(
+                fields=['-date_reservation', '-id'],
+                name='reservation_date_idx'
+            ),
+            models.Index(
+                fields=['statut', '-date_reservation', '-id'],
+                name='reservation_statut_date_idx'
+            ),
+            # Recherche de chevauchements sur les reservations actives
+            models.Index(
+                fields=['table', 'date_reservation', 'date_fin'],
+                condition=Q(statut__in=['EN_ATTENTE', 'CONFIRMEE']),
+                name='reservation_creneau_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.client_nom} - Table {self.table.numero}"
+    
+    @staticmethod
+    def duree_service():
+        return timedelta(minutes=getattr(settings, 'RESERVATION_DUREE', 120))
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Date chargee : un deplacement change aussi les analyses de l'ancien jour
+        instance._date_initiale = instance.__dict__.get('date_reservation')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        if self.date_reservation:
+            self.date_fin = self.date_reservation + self.duree_service()
+        super().save(*args, **kwargs)
+
+class CommandeQuerySet(models.QuerySet):
+    def avec_table_serveur(self):
+        """Table et nom du serveur dans la requete des commandes.
+        
+        Les totaux sont les colonnes denormalisees (montant_total,
+        nombre_items) : aucune jointure sur les items n'est necessaire.
+        """
+        return self.select_related('table').annotate(
+            serveur_nom=Coalesce(
+                NullIf(
+                    Trim(Concat(
+                        Coalesce('serveur__first_name', Value('')),
+                        Value(' '),
+                        Coalesce('serveur__last_name', Value(''))
+                    )),
+                    Value('')
+                ),
+                'serveur__username'
+            )
+        )
+    
+    def avec_lignes(self):
+        """Precharge les items, avec leur plat et leur sous-total calcule en SQL"""
+        return self.prefetch_related(
+            Prefetch('items', queryset=ItemCommande.objects.avec_sous_totaux())
+        )
+    
+    def avec_totaux_calcules(self):
+        """Annote total_calcule et nombre_calcule, recalcules depuis les items"""
+        items = ItemCommande.objects.filter(commande=OuterRef('pk')).order_by().values('commande')
+        return self.annotate(
+            total_calcule=Coalesce(
+                Subquery(items.annotate(
+                    montant=Sum(F('quantite') * F('prix_unitaire'))
+                ).values('montant')),
+                Value(Decimal('0.00')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            ),
+            nombre_calcule=Coalesce(
+                Subquery(items.annotate(nombre=Count('id')).values('nombre')),
+                0
+            )
+        )
 
 class Commande(models.Model):
     STATUS_CHOICES = [
@@ -119,18 +272,165 @@ class Commande(models.Model):
         choices=STATUS_CHOICES,
         default='EN_COURS'
     )
+    couverts = models.PositiveSmallIntegerField(
+        default=1,
+        validators=[MinValueValidator(1)]
+    )
     notes = models.TextField(blank=True)
     
+    # Totaux denormalises, tenus a jour par ItemCommande
+    montant_total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        editable=False
+    )
+    nombre_items = models.PositiveIntegerField(
+        default=0,
+        editable=False
+    )
+    date_modification = models.DateTimeField(auto_now=True)
+    
     class Meta:
         verbose_name = "Commande"
         verbose_name_plural = "Commandes"
         ordering = ['-date_creation']
+        indexes = [
+            models.Index(
+                fields=['-date_creation', '-id'],
+                name='commande_date_idx'
+            ),
+            models.Index(
+                fields=['statut', '-date_creation', '-id'],
+                name='commande_statut_date_idx'
+            ),
+            # Commandes en cuisine / en salle, non encore payees
+            models.Index(
+                fields=['-date_creation'],
+                condition=~Q(statut='PAYEE'),
+                name='commande_ouverte_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"Commande #{self.id} - Table {self.table.numero}"
     
+    # Champs que seuls les deltas des items ont le droit d'ecrire
+    CHAMPS_TOTAUX = ('montant_total', 'nombre_items')
+    
+    def save(self, *args, **kwargs):
+        # Un save() complet ne doit pas ecraser les totaux tenus par
+        # des UPDATE concurrents (ajout d'items par un autre serveur)
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.CHAMPS_TOTAUX
+            ]
+        super().save(*args, **kwargs)
+    
+    objects = CommandeQuerySet.as_manager()
+    
     def total(self):
-        return sum(item.subtotal() for item in self.items.all())
+        # Annotation de avec_totaux_calcules() si presente
+        return getattr(self, 'total_calcule', self.montant_total)
+    
+    def nom_serveur(self):
+        if hasattr(self, 'serveur_nom'):
+            return self.serveur_nom or ''
+        if self.serveur is None:
+            return ''
+        return self.serveur.get_full_name() or self.serveur.username
+    
+    def recalculer_totaux(self):
+        """Recalcule et enregistre les totaux a partir des items"""
+        self.montant_total, self.nombre_items = self.calculer_totaux()
+        self.save(update_fields=[*self.CHAMPS_TOTAUX, 'date_modification'])
+    
+    def calculer_totaux(self):
+        """Recalcule les totaux a partir des items (sans les enregistrer)"""
+        totaux = self.items.aggregate(
+            montant=Sum(F('quantite') * F('prix_unitaire')),
+            nombre=Count('id')
+        )
+        return totaux['montant'] or Decimal('0.00'), totaux['nombre']
+    
+    def appliquer_delta(self, montant, nombre=0):
+        """Applique atomiquement une variation aux totaux denormalises"""
+        maintenant = _appliquer_deltas({self.pk: (montant, nombre)})
+        # Garder l'instance en memoire coherente avec la base
+        self.montant_total += montant
+        self.nombre_items += nombre
+        self.date_modification = maintenant
+
+class ItemCommandeQuerySet(models.QuerySet):
+    """Operations de masse qui maintiennent les totaux des commandes"""
+    
+    def avec_sous_totaux(self):
+        return self.select_related('plat').annotate(
+            sous_total=models.ExpressionWrapper(
+                F('quantite') * F('prix_unitaire'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            )
+        )
+    
+    def bulk_create(self, objs, *args, totaux_a_jour=False, **kwargs):
+        """`totaux_a_jour=True` : l'appelant a deja renseigne les totaux des
+        commandes (chargements en masse), aucun UPDATE n'est fait."""
+        objs = list(objs)
+        for item in objs:
+            if not item.prix_unitaire:
+                item.prix_unitaire = item.prix_courant()
+        
+        if totaux_a_jour:
+            return super().bulk_create(objs, *args, **kwargs)
+        
+        deltas = {}
+        for item in objs:
+            montant, nombre = deltas.get(item.commande_id, (0, 0))
+            deltas[item.commande_id] = (montant + item.subtotal(), nombre + 1)
+        
+        with transaction.atomic():
+            objs = super().bulk_create(objs, *args, **kwargs)
+            _appliquer_deltas(deltas)
+        return objs
+    
+    def update(self, **kwargs):
+        if not {'commande', 'commande_id', 'quantite', 'prix_unitaire'} & set(kwargs):
+            return super().update(**kwargs)
+        
+        with transaction.atomic():
+            commandes = set(self.values_list('commande_id', flat=True))
+            lignes = super().update(**kwargs)
+            nouvelle = kwargs.get('commande_id', kwargs.get('commande'))
+            if nouvelle is not None:
+                commandes.add(getattr(nouvelle, 'pk', nouvelle))
+            for commande in Commande.objects.filter(pk__in=commandes):
+                commande.recalculer_totaux()
+        return lignes
+    
+    def delete(self):
+        with transaction.atomic():
+            deltas = {
+                ligne['commande_id']: (-ligne['montant'], -ligne['nombre'])
+                for ligne in self.order_by().values('commande_id').annotate(
+                    montant=Sum(F('quantite') * F('prix_unitaire')),
+                    nombre=Count('id')
+                )
+            }
+            resultat = super().delete()
+            _appliquer_deltas(deltas)
+        return resultat
+
+def _appliquer_deltas(deltas):
+    """Ajoute {commande_id: (montant, nombre)} aux totaux, par UPDATE atomique"""
+    maintenant = timezone.now()
+    for commande_id, (montant, nombre) in deltas.items():
+        Commande.objects.filter(pk=commande_id).update(
+            montant_total=F('montant_total') + montant,
+            nombre_items=F('nombre_items') + nombre,
+            date_modification=maintenant
+        )
+    return maintenant
 
 class ItemCommande(models.Model):
     commande = models.ForeignKey(
@@ -152,6 +452,8 @@ class ItemCommande(models.Model):
     )
     notes = models.TextField(blank=True)
     
+    objects = ItemCommandeQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Item de commande"
         verbose_name_plural = "Items de commande"
@@ -159,13 +461,78 @@ class ItemCommande(models.Model):
     def __str__(self):
         return f"{self.quantite}x {self.plat.nom}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Etat charge, pour calculer les deltas a l'enregistrement
+        instance._etat_initial = (
+            instance.__dict__.get('commande_id'),
+            instance.__dict__.get('quantite'),
+            instance.__dict__.get('prix_unitaire'),
+        )
+        return instance
+    
     def subtotal(self):
+        # Annotation de avec_sous_totaux() si presente
+        if hasattr(self, 'sous_total'):
+            return self.sous_total
         return self.quantite * self.prix_unitaire
     
+    def prix_courant(self):
+        """Prix du plat a l'ajout : plat deja charge, carte des prix en memoire
+        (cache partage seulement, voir prix.py), sinon lu en base"""
+        if not self._meta.get_field('plat').is_cached(self):
+            from .prix import tarif
+            tarif_plat = tarif(self.plat_id)
+            if tarif_plat is not None:
+                return tarif_plat.prix
+        return self.plat.prix
+    
     def save(self, *args, **kwargs):
         if not self.prix_unitaire:
-            self.prix_unitaire = self.plat.prix
-        super().save(*args, **kwargs)
+            self.prix_unitaire = self.prix_courant()
+        
+        if self._state.adding:
+            etat_initial = None
+        else:
+            etat_initial = self._charger_etat_initial()
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            
+            montant, nombre = self.subtotal(), 1
+            if etat_initial is not None:
+                ancienne_commande, quantite, prix = etat_initial
+                if ancienne_commande == self.commande_id:
+                    montant, nombre = montant - quantite * prix, 0
+                else:
+                    _appliquer_deltas({ancienne_commande: (-quantite * prix, -1)})
+            if montant or nombre:
+                self._appliquer_delta_commande(montant, nombre)
+        
+        self._etat_initial = (
+            self.commande_id, self.quantite, self.prix_unitaire
+        )
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            resultat = super().delete(*args, **kwargs)
+            self._appliquer_delta_commande(-self.subtotal(), -1)
+        return resultat
+    
+    def _charger_etat_initial(self):
+        etat = getattr(self, '_etat_initial', None)
+        if etat is None or None in etat:
+            etat = ItemCommande.objects.filter(pk=self.pk).values_list(
+                'commande_id', 'quantite', 'prix_unitaire'
+            ).first()
+        return etat
+    
+    def _appliquer_delta_commande(self, montant, nombre):
+        if self._meta.get_field('commande').is_cached(self):
+            self.commande.appliquer_delta(montant, nombre)
+        else:
+            _appliquer_deltas({self.commande_id: (montant, nombre)})
 
 class Facture(models.Model):
     METHODE_PAIEMENT_CHOICES = [
@@ -202,24 +569,236 @@ class Facture(models.Model):
     )
     date_emission = models.DateTimeField(auto_now_add=True)
     payee = models.BooleanField(default=False)
+    # Jeton du formulaire d'encaissement : rend les POST repetes idempotents
+    cle_idempotence = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False
+    )
+    
+    TAUX_TVA = Decimal('0.18')
+    CHAMPS_VENTES = ('methode_paiement', 'montant_total', 'tva', 'montant_ttc', 'payee')
     
     class Meta:
         verbose_name = "Facture"
         verbose_name_plural = "Factures"
         ordering = ['-date_emission']
+        indexes = [
+            models.Index(
+                fields=['-date_emission', '-id'],
+                name='facture_date_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"Facture {self.numero_facture}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(champ in instance.__dict__ for champ in cls.CHAMPS_VENTES):
+            instance._etat_ventes = instance.etat_ventes()
+        return instance
+    
+    def etat_ventes(self):
+        """Ce qui determine la contribution de la facture aux ventes du jour"""
+        centime = Decimal('0.01')
+        return (
+            self.methode_paiement,
+            Decimal(self.montant_total).quantize(centime),
+            Decimal(self.tva).quantize(centime),
+            Decimal(self.montant_ttc).quantize(centime),
+            self.payee,
+        )
+    
     def save(self, *args, **kwargs):
-        if not self.numero_facture:
-            from datetime import datetime
-            self.numero_facture = f"FAC-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        
         if not self.montant_total:
             self.montant_total = self.commande.total()
         
-        self.tva = self.montant_total * Decimal('0.18')
+        self.tva = self.montant_total * self.TAUX_TVA
         self.montant_ttc = self.montant_total + self.tva
         
-        super().save(*args, **kwargs)
\ No newline at end of file
+        # Le numero est alloue dans la meme transaction que l'insertion :
+        # en cas d'echec, il est rendu a la sequence (numerotation sans trou)
+        with transaction.atomic():
+            if not self.numero_facture:
+                from .numerotation import prochain_numero
+                self.numero_facture = prochain_numero()
+            super().save(*args, **kwargs)
+
+class SequenceFacture(models.Model):
+    """Compteur de numeros de facture, une ligne par periode (annee ou jour)"""
+    periode = models.CharField(max_length=8, unique=True)
+    dernier_numero = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = "Sequence de factures"
+        verbose_name_plural = "Sequences de factures"
+    
+    def __str__(self):
+        return f"{self.periode} : {self.dernier_numero}"
+
+class VenteJournaliere(models.Model):
+    """Cumul des factures par jour et methode de paiement.
+
+    Tenu a jour a chaque facture emise ou payee (voir ventes.py) ; le
+    tableau de bord et la liste des factures lisent ces lignes au lieu
+    d'agreger toutes les factures.
+    """
+    jour = models.DateField()
+    methode_paiement = models.CharField(
+        max_length=20,
+        choices=Facture.METHODE_PAIEMENT_CHOICES
+    )
+    nombre_factures = models.PositiveIntegerField(default=0)
+    nombre_commandes = models.PositiveIntegerField(default=0)
+    couverts = models.PositiveIntegerField(default=0)
+    montant_ht = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00')
+    )
+    tva = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00')
+    )
+    montant_ttc = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00')
+    )
+    # Part du TTC des factures marquees payees
+    montant_encaisse = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00')
+    )
+    
+    class Meta:
+        verbose_name = "Vente journaliere"
+        verbose_name_plural = "Ventes journalieres"
+        ordering = ['-jour', 'methode_paiement']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['jour', 'methode_paiement'],
+                name='vente_jour_methode_unique'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.jour} {self.methode_paiement} : {self.montant_ttc} FCFA"
+
+class Tache(models.Model):
+    """Travail differe, execute par `manage.py runworker` (voir taches.py)"""
+    STATUT_CHOICES = [
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_COURS', 'En cours'),
+        ('TERMINEE', 'Terminee'),
+        ('ECHEC', 'Echec'),
+    ]
+    
+    nom = models.CharField(max_length=200)
+    arguments = models.JSONField(default=dict, blank=True)
+    file = models.CharField(max_length=30, default='defaut')
+    priorite = models.SmallIntegerField(default=0)
+    # Cle d'idempotence : une seule tache par cle, quel que soit son statut
+    cle = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    statut = models.CharField(
+        max_length=20,
+        choices=STATUT_CHOICES,
+        default='EN_ATTENTE'
+    )
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    tentatives_max = models.PositiveSmallIntegerField(default=5)
+    disponible_a = models.DateTimeField(default=timezone.now)
+    # Bail du travailleur : passe ce delai, une tache EN_COURS est reprise
+    travailleur = models.CharField(max_length=100, blank=True)
+    bail = models.DateTimeField(null=True, blank=True)
+    derniere_erreur = models.TextField(blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Tache"
+        verbose_name_plural = "Taches"
+        indexes = [
+            # Prise de taches : les seules lignes lues a chaque tour
+            models.Index(
+                fields=['file', '-priorite', 'disponible_a'],
+                condition=Q(statut='EN_ATTENTE'),
+                name='tache_en_attente_idx'
+            ),
+            models.Index(
+                fields=['bail'],
+                condition=Q(statut='EN_COURS'),
+                name='tache_en_cours_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.nom} ({self.get_statut_display()})"
+
+class OccupationTable(models.Model):
+    """Occupation d'une table sur l'intervalle [debut, fin).
+
+    Journal en ajout seul, ecrit par occupation.py : une ligne par
+    ouverture de table, fermee (fin) a sa liberation ; la ligne en cours
+    a fin vide. Table.disponible en est l'etat courant.
+    """
+    ORIGINE_CHOICES = [
+        ('COMMANDE', 'Commande'),
+        ('MANUELLE', 'Manuelle'),
+    ]
+    
+    table = models.ForeignKey(
+        Table,
+        on_delete=models.CASCADE,
+        related_name='occupations'
+    )
+    commande = models.ForeignKey(
+        Commande,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='occupations'
+    )
+    origine = models.CharField(
+        max_length=10,
+        choices=ORIGINE_CHOICES,
+        default='COMMANDE'
+    )
+    debut = models.DateTimeField(default=timezone.now)
+    fin = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Occupation de table"
+        verbose_name_plural = "Occupations des tables"
+        ordering = ['-debut']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['table'],
+                condition=Q(fin__isnull=True),
+                name='occupation_en_cours_unique'
+            ),
+            models.CheckConstraint(
+                condition=Q(fin__isnull=True) | Q(fin__gte=F('debut')),
+                name='occupation_intervalle_valide'
+            ),
+        ]
+        indexes = [
+            # Chronologie : occupations en cours ou terminees apres le
+            # debut de la soiree
+            models.Index(
+                fields=['fin', 'debut'],
+                name='occupation_fin_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Table {self.table_id} : {self.debut} - {self.fin or '...'}"
+    
+    def duree(self, maintenant=None):
+        return (self.fin or maintenant or timezone.now()) - self.debut
@@ -0,0 +1,30 @@
+"""
+E-mails aux clients, envoyes par la file de taches (file 'critique').
+
+La tache relit la reservation au moment de l'envoi : un client qui annule
+avant le passage du travailleur ne recoit rien.
+"""
+from django.conf import settings
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+
+from .models import Reservation
+from .taches import tache
+
+
+@tache(file='critique', tentatives=8)
+def confirmer_reservation(reservation_id):
+    reservation = Reservation.objects.select_related('table').filter(
+        pk=reservation_id, statut__in=Reservation.STATUTS_ACTIFS
+    ).first()
+    if reservation is None or not reservation.client_email:
+        return False
+    send_mail(
+        "Votre reservation est enregistree",
+        render_to_string(
+            'restaurant/emails/confirmation_reservation.txt', {'reservation': reservation}
+        ),
+        getattr(settings, 'DEFAULT_FROM_EMAIL', None),
+        [reservation.client_email],
+    )
+    return True
@@ -0,0 +1,56 @@
+"""
+Numerotation des factures.
+
+Les numeros sont consecutifs et sans trou sur chaque periode (annee, ou
+jour si FACTURE_NUMEROTATION = 'journaliere') : FAC-2026-000042.
+
+Chaque periode a sa ligne dans SequenceFacture. L'allocation commence par
+un UPDATE ... SET dernier_numero = dernier_numero + n, qui verrouille la
+ligne (ou, sous SQLite, la base) jusqu'a la fin de la transaction : les
+allocations concurrentes de plusieurs workers sont serialisees, et un
+rollback rend les numeros. Une sequence native PostgreSQL n'est pas
+utilisee car ses valeurs ne sont pas rendues en cas de rollback.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import SequenceFacture
+from .utils import incrementer
+
+
+def periode(date=None):
+    date = date or timezone.localdate()
+    if getattr(settings, 'FACTURE_NUMEROTATION', 'annuelle') == 'journaliere':
+        return date.strftime('%Y%m%d')
+    return date.strftime('%Y')
+
+
+def formater(periode, numero):
+    return f"FAC-{periode}-{numero:06d}"
+
+
+def allouer(nombre=1, date=None):
+    """Reserve `nombre` numeros consecutifs et retourne leur range.
+
+    A appeler dans la transaction qui enregistre les factures : la
+    numerotation n'est sans trou que si tous les numeros d'un bloc sont
+    utilises avant le commit (imports, generation en masse).
+    """
+    cle = periode(date)
+    with transaction.atomic():
+        incrementer(SequenceFacture, {'periode': cle}, dernier_numero=nombre)
+        dernier = SequenceFacture.objects.filter(periode=cle).values_list(
+            'dernier_numero', flat=True
+        ).get()
+    return range(dernier - nombre + 1, dernier + 1)
+
+
+def prochain_numero(date=None):
+    return formater(periode(date), allouer(1, date)[0])
+
+
+def numeros(nombre, date=None):
+    """Bloc de `nombre` numeros de facture formates"""
+    cle = periode(date)
+    return [formater(cle, numero) for numero in allouer(nombre, date)]
@@ -0,0 +1,167 @@
+"""
+Occupation des tables : journal des intervalles d'occupation et etat
+courant de la salle.
+
+ouvrir() et liberer() ajoutent ou ferment une ligne d'OccupationTable et
+tiennent a jour, dans la meme transaction, Table.disponible : la colonne
+reste l'etat courant materialise, lu par les filtres existants
+(reservations, API, index table_occupee_idx). etat_salle() sert le plan de
+salle depuis le cache ; il est recalcule depuis le journal, en une
+requete, apres chaque changement.
+
+chronologie() lit les occupations d'une soiree pour toutes les tables en
+une requete sur l'index occupation_fin_idx : seules les occupations en
+cours ou terminees apres le debut de la soiree sont parcourues.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import FilteredRelation, Q
+from django.utils import timezone
+
+from .models import OccupationTable, Table
+
+CLE_ETAT = 'salle:etat'
+
+
+def duree_cache():
+    return getattr(settings, 'SALLE_CACHE_DUREE', 3600)
+
+
+def invalider():
+    cache.delete(CLE_ETAT)
+    # Et de nouveau apres le commit : une requete concurrente a pu remettre
+    # l'ancien etat en cache entre-temps
+    transaction.on_commit(lambda: cache.delete(CLE_ETAT))
+
+
+def ouvrir(table_id, commande=None, quand=None):
+    """Occupe la table ; retourne l'occupation en cours (existante ou creee)"""
+    with transaction.atomic():
+        en_cours = OccupationTable.objects.filter(table_id=table_id, fin=None).first()
+        if en_cours is None:
+            try:
+                with transaction.atomic():
+                    en_cours = OccupationTable.objects.create(
+                        table_id=table_id,
+                        commande=commande,
+                        origine='COMMANDE' if commande is not None else 'MANUELLE',
+                        debut=quand or timezone.now(),
+                    )
+            except IntegrityError:
+                # Ouverture concurrente : occupation_en_cours_unique
+                en_cours = OccupationTable.objects.get(table_id=table_id, fin=None)
+        Table.objects.filter(pk=table_id).update(disponible=False)
+    invalider()
+    return en_cours
+
+
+def liberer(table_id, quand=None):
+    """Libere la table ; retourne True si une occupation a ete fermee"""
+    with transaction.atomic():
+        fermees = OccupationTable.objects.filter(table_id=table_id, fin=None).update(
+            fin=quand or timezone.now()
+        )
+        Table.objects.filter(pk=table_id).update(disponible=True)
+    invalider()
+    return bool(fermees)
+
+
+def basculer(table_id):
+    """Ouvre ou libere la table a la main ; retourne True si elle est libre"""
+    if OccupationTable.objects.filter(table_id=table_id, fin=None).exists():
+        liberer(table_id)
+        return True
+    ouvrir(table_id)
+    return False
+
+
+def etat_salle():
+    """[{id, numero, capacite, disponible, depuis, commande}] des tables,
+    par numero ; `depuis` et `commande` decrivent l'occupation en cours"""
+    etat = cache.get(CLE_ETAT)
+    if etat is None:
+        etat = [
+            {
+                'id': pk,
+                'numero': numero,
+                'capacite': capacite,
+                'disponible': depuis is None,
+                'depuis': depuis,
+                'commande': commande_id,
+            }
+            for pk, numero, capacite, depuis, commande_id in Table.objects.annotate(
+                en_cours=FilteredRelation(
+                    'occupations', condition=Q(occupations__fin__isnull=True)
+                )
+            ).order_by('numero').values_list(
+                'pk', 'numero', 'capacite', 'en_cours__debut', 'en_cours__commande_id'
+            )
+        ]
+        cache.set(CLE_ETAT, etat, duree_cache())
+    return etat
+
+
+def soiree(jour):
+    """Intervalle [debut, fin) de la soiree `jour` (setting SALLE_SOIREE) ;
+    une fermeture avant l'ouverture tombe le lendemain"""
+    ouverture, fermeture = getattr(settings, 'SALLE_SOIREE', (time(17, 0), time(2, 0)))
+    debut = timezone.make_aware(datetime.combine(jour, ouverture))
+    fin = timezone.make_aware(datetime.combine(
+        jour + timedelta(days=1) if fermeture <= ouverture else jour, fermeture
+    ))
+    return debut, fin
+
+
+def occupations(debut, fin):
+    """Occupations qui chevauchent [debut, fin), par debut"""
+    # Tri sur debut et non (table, debut) : SQLite parcourrait alors l'index
+    # de la cle etrangere, toute la table, au lieu d'occupation_fin_idx
+    return OccupationTable.objects.filter(
+        Q(fin__isnull=True) | Q(fin__gt=debut), debut__lt=fin
+    ).order_by('debut')
+
+
+def chronologie(debut, fin, maintenant=None):
+    """Etat de salle complete des occupations de chaque table sur [debut, fin).
+
+    `minutes` : temps d'occupation dans l'intervalle, les occupations en
+    cours comptant jusqu'a `maintenant`.
+    """
+    maintenant = maintenant or timezone.now()
+    par_table = defaultdict(list)
+    for table_id, debut_occupation, fin_occupation, commande_id, origine in occupations(
+        debut, fin
+    ).values_list('table_id', 'debut', 'fin', 'commande_id', 'origine'):
+        par_table[table_id].append({
+            'debut': debut_occupation,
+            'fin': fin_occupation,
+            'commande': commande_id,
+            'origine': origine,
+        })
+
+    tables = []
+    for table in etat_salle():
+        intervalles = par_table.get(table['id'], [])
+        tables.append(dict(
+            table,
+            occupations=intervalles,
+            minutes=round(_duree_occupee(intervalles, debut, fin, maintenant).total_seconds() / 60),
+        ))
+    return tables
+
+
+def _duree_occupee(intervalles, debut, fin, maintenant):
+    """Duree de la reunion des `intervalles` (tries par debut) dans [debut, fin) :
+    des occupations qui se chevauchent (historique importe) ne comptent qu'une fois"""
+    total, curseur = timedelta(), debut
+    for intervalle in intervalles:
+        debut_intervalle = max(intervalle['debut'], curseur)
+        fin_intervalle = min(intervalle['fin'] or maintenant, fin)
+        if fin_intervalle > debut_intervalle:
+            total += fin_intervalle - debut_intervalle
+            curseur = fin_intervalle
+    return total
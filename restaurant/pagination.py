@@ -0,0 +1,117 @@
+"""
+Pagination par curseur (keyset) pour les listes de gestion.
+
+Les listes sont triees par (date decroissante, id decroissant). Le curseur
+encode la cle de tri de la derniere (ou premiere) ligne affichee, et la
+page suivante est obtenue par une condition sur cette cle au lieu d'un
+OFFSET : le cout d'une page ne depend pas de sa profondeur.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import DateTimeField, Q
+from django.utils.dateparse import parse_datetime
+
+TAILLE_PAGE = 25
+
+SUIVANT = 's'
+PRECEDENT = 'p'
+
+
+class PageCurseur:
+    """Une page de resultats avec les curseurs des pages voisines"""
+
+    def __init__(self, lignes, champ, a_suivant, a_precedent):
+        self.object_list = lignes
+        self.champ = champ
+        self.a_suivant = a_suivant and bool(lignes)
+        self.a_precedent = a_precedent and bool(lignes)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def curseur_suivant(self):
+        if self.a_suivant:
+            return encoder_curseur(self.object_list[-1], self.champ, SUIVANT)
+        return ''
+
+    @property
+    def curseur_precedent(self):
+        if self.a_precedent:
+            return encoder_curseur(self.object_list[0], self.champ, PRECEDENT)
+        return ''
+
+
+def encoder_curseur(objet, champ, sens):
+    # Instances de modele, ou dictionnaires d'un queryset .values()
+    if isinstance(objet, dict):
+        valeur, pk = objet[champ], objet['id']
+    else:
+        valeur, pk = getattr(objet, champ), objet.pk
+    if hasattr(valeur, 'isoformat'):
+        valeur = valeur.isoformat()
+    donnees = json.dumps([valeur, pk, sens], separators=(',', ':'))
+    return base64.urlsafe_b64encode(donnees.encode()).decode().rstrip('=')
+
+
+def decoder_curseur(curseur, type_valeur=datetime):
+    """Retourne (valeur, pk, sens), ou None si le curseur est invalide.
+
+    `type_valeur` est le type attendu de la valeur : datetime, ou int pour
+    une pagination sur l'id. Une valeur d'un autre type rend le curseur
+    invalide.
+    """
+    if not curseur:
+        return None
+    try:
+        brut = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4))
+        valeur, pk, sens = json.loads(brut)
+        if type_valeur is datetime:
+            valeur = parse_datetime(valeur)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if not isinstance(valeur, type_valeur) or isinstance(valeur, bool):
+        return None
+    if not isinstance(pk, int) or isinstance(pk, bool):
+        return None
+    if sens not in (SUIVANT, PRECEDENT):
+        return None
+    return valeur, pk, sens
+
+
+def paginer(queryset, champ, curseur=None, taille=TAILLE_PAGE):
+    """Retourne la PageCurseur designee par `curseur` (premiere page sinon)"""
+    champ_modele = queryset.model._meta.get_field(champ)
+    position = decoder_curseur(
+        curseur, datetime if isinstance(champ_modele, DateTimeField) else int
+    )
+
+    if position is None:
+        lignes = list(queryset.order_by(f'-{champ}', '-id')[:taille + 1])
+        return PageCurseur(lignes[:taille], champ, len(lignes) > taille, False)
+
+    valeur, pk, sens = position
+    if sens == SUIVANT:
+        # (champ, id) < (valeur, pk) ; la borne sur champ seul guide l'index
+        lignes = list(
+            queryset.filter(**{f'{champ}__lte': valeur})
+            .filter(Q(**{f'{champ}__lt': valeur}) | Q(id__lt=pk))
+            .order_by(f'-{champ}', '-id')[:taille + 1]
+        )
+        return PageCurseur(lignes[:taille], champ, len(lignes) > taille, True)
+
+    lignes = list(
+        queryset.filter(**{f'{champ}__gte': valeur})
+        .filter(Q(**{f'{champ}__gt': valeur}) | Q(id__gt=pk))
+        .order_by(champ, 'id')[:taille + 1]
+    )
+    return PageCurseur(lignes[:taille][::-1], champ, True, len(lignes) > taille)
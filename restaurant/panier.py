@@ -0,0 +1,102 @@
+"""
+Ajout d'un panier complet (plusieurs plats) a une commande.
+
+Quel que soit le nombre de lignes : une requete pour valider les plats et
+relever leurs prix, puis dans une transaction un UPDATE des totaux de la
+commande (qui la verrouille et refuse une commande payee), un INSERT groupe
+des items et la relecture du nouveau total.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import evenements
+from .models import Commande, ItemCommande, Plat
+
+QUANTITE_MAX = 99
+LIGNES_MAX = 100
+
+
+class PanierInvalide(Exception):
+    def __init__(self, erreurs):
+        self.erreurs = erreurs
+        super().__init__('; '.join(erreurs))
+
+
+def normaliser(lignes):
+    """[(plat_id, quantite, notes)] depuis des dictionnaires (JSON)"""
+    if not isinstance(lignes, list) or not lignes:
+        raise PanierInvalide(["Le panier est vide"])
+    if len(lignes) > LIGNES_MAX:
+        raise PanierInvalide([f"Au plus {LIGNES_MAX} lignes par panier"])
+    resultat, erreurs = [], []
+    for numero, ligne in enumerate(lignes, 1):
+        if not isinstance(ligne, dict):
+            erreurs.append(f"Ligne {numero} : objet attendu")
+            continue
+        plat, quantite = ligne.get('plat'), ligne.get('quantite', 1)
+        notes = ligne.get('notes') or ''
+        if isinstance(plat, bool) or not isinstance(plat, int):
+            erreurs.append(f"Ligne {numero} : identifiant de plat invalide")
+        elif isinstance(quantite, bool) or not isinstance(quantite, int) or not (
+            1 <= quantite <= QUANTITE_MAX
+        ):
+            erreurs.append(f"Ligne {numero} : quantite entre 1 et {QUANTITE_MAX} attendue")
+        elif not isinstance(notes, str):
+            erreurs.append(f"Ligne {numero} : notes invalides")
+        else:
+            resultat.append((plat, quantite, notes))
+    if erreurs:
+        raise PanierInvalide(erreurs)
+    return resultat
+
+
+def ajouter(commande_id, lignes):
+    """Ajoute les lignes [(plat_id, quantite, notes)] a la commande.
+
+    Retourne (items crees, montant total, nombre d'items) apres ajout.
+    """
+    if not lignes:
+        raise PanierInvalide(["Le panier est vide"])
+
+    plats = Plat.objects.only('id', 'nom', 'prix', 'disponible').order_by().in_bulk(
+        {plat_id for plat_id, _, _ in lignes}
+    )
+    inconnus = sorted({plat_id for plat_id, _, _ in lignes if plat_id not in plats})
+    indisponibles = sorted({
+        plats[plat_id].nom for plat_id, _, _ in lignes
+        if plat_id in plats and not plats[plat_id].disponible
+    })
+    erreurs = [f"Plat inconnu : {plat_id}" for plat_id in inconnus]
+    erreurs += [f"Plat indisponible : {nom}" for nom in indisponibles]
+    if erreurs:
+        raise PanierInvalide(erreurs)
+
+    # Prix releve une seule fois pour tout le panier
+    items = [
+        ItemCommande(
+            commande_id=commande_id,
+            plat=plats[plat_id],
+            quantite=quantite,
+            prix_unitaire=plats[plat_id].prix,
+            notes=notes,
+        )
+        for plat_id, quantite, notes in lignes
+    ]
+    montant = sum(item.subtotal() for item in items)
+
+    with transaction.atomic():
+        if not Commande.objects.filter(pk=commande_id).exclude(statut='PAYEE').update(
+            montant_total=F('montant_total') + montant,
+            nombre_items=F('nombre_items') + len(items),
+            date_modification=timezone.now()
+        ):
+            raise PanierInvalide(["Commande introuvable ou deja payee"])
+        items = ItemCommande.objects.bulk_create(items, totaux_a_jour=True)
+        # bulk_create n'envoie pas post_save : l'ecran cuisine est prevenu ici
+        for item in items:
+            evenements.publier_item(item)
+        total, nombre = Commande.objects.filter(pk=commande_id).values_list(
+            'montant_total', 'nombre_items'
+        ).get()
+    return items, total, nombre
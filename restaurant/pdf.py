@@ -0,0 +1,154 @@
+"""
+Ecriture de PDF minimale, sans dependance : texte en Helvetica et
+Helvetica-Bold (polices standard des lecteurs PDF, non embarquees,
+encodage WinAnsi) et traits, sur des pages de taille libre.
+
+Chaque page est un flux compresse independant (Page.flux()) : les pages
+peuvent etre produites dans d'autres processus puis assemblees par
+document(). La sortie ne depend que du contenu (aucune date de creation),
+deux rendus identiques donnent les memes octets.
+"""
+import unicodedata
+import zlib
+from functools import lru_cache
+
+MM = 72 / 25.4
+POLICES = {'F1': 'Helvetica', 'F2': 'Helvetica-Bold'}
+
+# Chasses (1/1000 du corps) des caracteres 32 a 126, metriques AFM d'Adobe
+_CHASSES_ASCII = {
+    'F1': (
+        278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+        1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+        333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+        556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+    ),
+    'F2': (
+        278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+        975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+        333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+        611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+    ),
+}
+
+
+@lru_cache(maxsize=None)
+def chasses(police):
+    """Table des 256 chasses WinAnsi de la police, calculee une fois par processus.
+
+    Hors ASCII, une lettre accentuee prend la chasse de sa lettre de base.
+    """
+    ascii_ = _CHASSES_ASCII[police]
+    table = []
+    for code in range(256):
+        if 32 <= code <= 126:
+            table.append(ascii_[code - 32])
+            continue
+        caractere = bytes([code]).decode('cp1252', 'replace')
+        base = unicodedata.normalize('NFD', caractere)[0]
+        table.append(ascii_[ord(base) - 32] if 32 <= ord(base) <= 126 else 556)
+    return tuple(table)
+
+
+def encoder(texte):
+    return texte.encode('cp1252', 'replace')
+
+
+def largeur(texte, police='F1', taille=10):
+    table = chasses(police)
+    return sum(table[octet] for octet in encoder(texte)) * taille / 1000
+
+
+def tronquer(texte, largeur_max, police='F1', taille=10):
+    """Coupe `texte` (avec '...') pour qu'il tienne dans `largeur_max` points"""
+    if largeur(texte, police, taille) <= largeur_max:
+        return texte
+    while texte and largeur(texte + '...', police, taille) > largeur_max:
+        texte = texte[:-1]
+    return texte.rstrip() + '...'
+
+
+def _chaine(texte):
+    return b'(' + encoder(texte).replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(
+        b')', b'\\)'
+    ) + b')'
+
+
+class Page:
+    """Page dont l'origine est le coin haut gauche, y croissant vers le bas"""
+
+    def __init__(self, largeur, hauteur):
+        self.largeur = largeur
+        self.hauteur = hauteur
+        # Repere retourne : les coordonnees ne dependent pas de la hauteur,
+        # des fragments prepares d'avance restent valables sur toute page
+        self.operations = [b'1 0 0 -1 0 %.2f cm' % hauteur]
+
+    def brut(self, operations):
+        self.operations.append(operations)
+
+    def texte(self, x, y, texte, police='F1', taille=10, alignement='gauche'):
+        if alignement == 'droite':
+            x -= largeur(texte, police, taille)
+        elif alignement == 'centre':
+            x -= largeur(texte, police, taille) / 2
+        # Le texte est redresse (matrice 1 0 0 -1) dans le repere retourne
+        self.operations.append(
+            b'BT /%s %g Tf 1 0 0 -1 %.2f %.2f Tm %s Tj ET'
+            % (police.encode(), taille, x, y, _chaine(texte))
+        )
+
+    def trait(self, x1, y1, x2, y2, epaisseur=0.5):
+        self.operations.append(
+            b'%g w %.2f %.2f m %.2f %.2f l S' % (epaisseur, x1, y1, x2, y2)
+        )
+
+    def flux(self):
+        """(largeur, hauteur, contenu compresse) : picklable, pour document()"""
+        return self.largeur, self.hauteur, zlib.compress(b'\n'.join(self.operations), 6)
+
+
+def document(pages):
+    """Assemble en un fichier PDF les pages produites par Page.flux()"""
+    objets = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # Arbre des pages, ecrit quand les pages sont connues
+    ]
+    for police, nom in POLICES.items():
+        objets.append(
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>'
+            % nom.encode()
+        )
+    ressources = b'<< /Font << /F1 3 0 R /F2 4 0 R >> >>'
+    references = []
+    for largeur_page, hauteur_page, contenu in pages:
+        objets.append(
+            b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream'
+            % (len(contenu), contenu)
+        )
+        objets.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] '
+            b'/Resources %s /Contents %d 0 R >>'
+            % (largeur_page, hauteur_page, ressources, len(objets))
+        )
+        references.append(b'%d 0 R' % len(objets))
+    objets[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(references), len(references)
+    )
+
+    sortie = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    positions = []
+    for numero, objet in enumerate(objets, 1):
+        positions.append(len(sortie))
+        sortie += b'%d 0 obj\n%s\nendobj\n' % (numero, objet)
+    debut_xref = len(sortie)
+    sortie += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objets) + 1)
+    sortie += b''.join(b'%010d 00000 n \n' % position for position in positions)
+    sortie += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%EOF\n' % (
+        len(objets) + 1, debut_xref
+    )
+    return bytes(sortie)
@@ -0,0 +1,113 @@
+"""
+Historique des prix des plats et carte des prix en memoire.
+
+Chaque changement de Plat.prix (signal post_save) ferme la ligne courante
+de PlatPrixHistorique et en ouvre une nouvelle : le tarif en vigueur a une
+date donnee se retrouve par une jointure sur intervalle (ventes_par_tarif).
+
+tarif() sert prix, version de prix et nom d'un plat sans requete : la carte
+{plat: Tarif} est chargee en une requete par version du menu (cache_menu),
+que toute modification de plat incremente. La carte n'est utilisee qu'avec
+un cache partage (CACHE_PARTAGE) : avec un cache par worker, la version
+d'un worker ne voit pas les modifications faites par les autres, qui
+factureraient l'ancien prix. Sans cache partage, tarif() retourne None et
+le prix est lu en base. Les modifications faites par update() ou en SQL ne
+passent ni par les signaux ni par l'historique.
+"""
+from collections import namedtuple
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, FilteredRelation, Max, Q, Sum
+from django.utils import timezone
+
+from . import cache_menu
+from .models import ItemCommande, PlatPrixHistorique
+
+Tarif = namedtuple('Tarif', 'prix version nom')
+
+# (version du menu, {plat_id: Tarif}) : remplace d'un bloc, sans verrou
+_carte = (None, {})
+
+
+def enregistrer_prix(plat):
+    """Ouvre une nouvelle periode de prix si celui de `plat` a change"""
+    maintenant = timezone.now()
+    with transaction.atomic():
+        courant = PlatPrixHistorique.objects.select_for_update().filter(
+            plat=plat, valide_au=None
+        ).first()
+        if courant is not None:
+            if courant.prix == Decimal(plat.prix):
+                return courant
+            courant.valide_au = maintenant
+            courant.save(update_fields=['valide_au'])
+            version = courant.version + 1
+        else:
+            version = (
+                PlatPrixHistorique.objects.filter(plat=plat).aggregate(Max('version'))['version__max']
+                or 0
+            ) + 1
+        return PlatPrixHistorique.objects.create(
+            plat=plat,
+            version=version,
+            prix=plat.prix,
+            valide_du=maintenant if courant is not None else plat.date_creation or maintenant,
+        )
+
+
+def carte():
+    """{plat_id: Tarif} des prix courants, rechargee a chaque version du menu"""
+    global _carte
+    version, tarifs = _carte
+    version_courante = cache_menu.version_menu()
+    if version != version_courante:
+        tarifs = {
+            plat_id: Tarif(prix, version_prix, nom)
+            for plat_id, prix, version_prix, nom in PlatPrixHistorique.objects.filter(
+                valide_au=None
+            ).values_list('plat_id', 'prix', 'version', 'plat__nom')
+        }
+        _carte = (version_courante, tarifs)
+    return tarifs
+
+
+def tarif(plat_id):
+    """Tarif courant du plat, ou None s'il n'a pas d'historique ou si le
+    cache n'est pas partage entre les workers"""
+    if not getattr(settings, 'CACHE_PARTAGE', False):
+        return None
+    return carte().get(plat_id)
+
+
+def ventes_par_tarif(debut, fin):
+    """Ventes des commandes ouvertes dans [debut, fin), par plat et tarif.
+
+    Chaque item est rattache, en une seule requete, au tarif en vigueur a
+    l'ouverture de sa commande ; `montant_tarif` est ce qu'aurait rapporte
+    le prix de la carte, `montant` ce qui a ete facture (prix_unitaire).
+    """
+    return ItemCommande.objects.filter(
+        commande__date_creation__gte=debut, commande__date_creation__lt=fin
+    ).annotate(
+        tarif=FilteredRelation(
+            'plat__historique_prix',
+            condition=Q(plat__historique_prix__valide_du__lte=F('commande__date_creation')) & (
+                Q(plat__historique_prix__valide_au__isnull=True)
+                | Q(plat__historique_prix__valide_au__gt=F('commande__date_creation'))
+            ),
+        )
+    ).values(
+        'plat_id', 'plat__nom', 'tarif__version', 'tarif__prix', 'tarif__valide_du', 'tarif__valide_au'
+    ).annotate(
+        quantite_vendue=Sum('quantite'),
+        montant=Sum(ExpressionWrapper(
+            F('quantite') * F('prix_unitaire'),
+            output_field=DecimalField(max_digits=14, decimal_places=2)
+        )),
+        montant_tarif=Sum(ExpressionWrapper(
+            F('quantite') * F('tarif__prix'),
+            output_field=DecimalField(max_digits=14, decimal_places=2)
+        )),
+    ).order_by('plat__nom', 'tarif__version')
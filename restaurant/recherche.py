@@ -0,0 +1,113 @@
+"""
+Recherche plein texte sur les plats.
+
+- SQLite : table virtuelle FTS5 `restaurant_plat_fts` (tokenizer unicode61
+  sans diacritiques), tenue a jour par les signaux de Plat.
+- PostgreSQL : colonne tsvector generee `restaurant_plat.recherche` et son
+  index GIN, avec la configuration `french_unaccent` (unaccent puis
+  racinisation francaise). La base la maintient seule.
+
+Les deux moteurs sont crees par la migration 0004. Chaque mot de la
+recherche est traite comme un prefixe ("cre gla" trouve "Crème glacée")
+et les resultats sont classes par pertinence, le nom pesant plus que la
+description.
+"""
+import re
+
+from django.db import connection, OperationalError
+from django.db.models import Q
+
+from .models import Plat
+
+TABLE_FTS = 'restaurant_plat_fts'
+CONFIG_PG = 'french_unaccent'
+
+LIMITE = 50
+MOTS_MAX = 8
+
+_MOT = re.compile(r'\w+')
+
+
+def mots(texte):
+    return _MOT.findall(texte.lower())[:MOTS_MAX]
+
+
+def rechercher_ids(texte, limite=LIMITE):
+    """Ids des plats correspondant a `texte`, du plus au moins pertinent"""
+    termes = mots(texte)
+    if not termes:
+        return []
+
+    if connection.vendor == 'sqlite':
+        try:
+            return _rechercher_sqlite(termes, limite)
+        except OperationalError:
+            # SQLite compile sans FTS5 : la migration n'a pas cree la table
+            pass
+    elif connection.vendor == 'postgresql':
+        return _rechercher_postgresql(termes, limite)
+
+    filtre = Q()
+    for terme in termes:
+        filtre &= Q(nom__icontains=terme) | Q(description__icontains=terme)
+    return list(Plat.objects.filter(filtre).values_list('id', flat=True)[:limite])
+
+
+def _rechercher_sqlite(termes, limite):
+    requete = ' '.join(f'"{terme}"*' for terme in termes)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {TABLE_FTS} WHERE {TABLE_FTS} MATCH %s '
+            f'ORDER BY bm25({TABLE_FTS}, 10.0, 1.0) LIMIT %s',
+            [requete, limite]
+        )
+        return [ligne[0] for ligne in cursor.fetchall()]
+
+
+def _rechercher_postgresql(termes, limite):
+    requete = ' & '.join(f'{terme}:*' for terme in termes)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT id FROM restaurant_plat '
+            f"WHERE recherche @@ to_tsquery('{CONFIG_PG}', %s) "
+            f"ORDER BY ts_rank(recherche, to_tsquery('{CONFIG_PG}', %s)) DESC, nom "
+            'LIMIT %s',
+            [requete, requete, limite]
+        )
+        return [ligne[0] for ligne in cursor.fetchall()]
+
+
+def indexer(plat):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f'INSERT OR REPLACE INTO {TABLE_FTS} (rowid, nom, description) '
+                'VALUES (%s, %s, %s)',
+                [plat.pk, plat.nom, plat.description]
+            )
+        except OperationalError:
+            pass
+
+
+def desindexer(plat_id):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(f'DELETE FROM {TABLE_FTS} WHERE rowid = %s', [plat_id])
+        except OperationalError:
+            pass
+
+
+def reconstruire_index():
+    """Reconstruit l'index SQLite (apres des update() en masse, par exemple)"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE_FTS}')
+        cursor.execute(
+            f'INSERT INTO {TABLE_FTS} (rowid, nom, description) '
+            'SELECT id, nom, description FROM restaurant_plat'
+        )
@@ -0,0 +1,221 @@
+"""
+Recus PDF des factures (ticket de caisse 80 mm), a l'unite ou par journee.
+
+Les donnees d'un lot sont lues en deux requetes (commandes avec facture,
+table et serveur, puis leurs items), quel que soit le nombre de factures.
+Le gabarit (en-tete, pied, metriques des polices) est prepare une fois par
+processus ; au-dela de SEUIL_PROCESSUS recus, les pages sont rendues par
+un pool de processus puis assemblees.
+
+Les fichiers sont adresses par leur contenu : nommes d'apres l'empreinte
+des donnees rendues et de VERSION_GABARIT (recus/<ab>/<empreinte>.pdf).
+Une reimpression ne coute que la lecture des donnees ; une facture
+modifiee, ou un gabarit change, donne un nouveau fichier.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import pdf
+from .models import Commande, Facture
+from .taches import tache
+from .utils import bornes_jour
+
+DOSSIER = 'recus'
+# A incrementer a chaque changement de mise en page
+VERSION_GABARIT = 1
+# Un processus rend plusieurs milliers de recus par seconde : le pool ne
+# paie son demarrage que sur de gros lots
+SEUIL_PROCESSUS = 1000
+TAILLE_PAQUET = 100
+
+LARGEUR = 80 * pdf.MM
+MARGE = 5 * pdf.MM
+INTERLIGNE = 11
+RESTAURANT = ("Restaurant Pro", "Didaoure", "Sokode, Togo", "Tel: +228 93 34 16 90")
+METHODES = dict(Facture.METHODE_PAIEMENT_CHOICES)
+
+
+def _montant(valeur):
+    return f"{Decimal(valeur):.0f} FCFA"
+
+
+def lire(**filtres):
+    """Donnees (dictionnaires JSON) des recus des factures filtrees, par date"""
+    commandes = Commande.objects.avec_table_serveur().avec_lignes().select_related('facture').filter(
+        **{f'facture__{champ}': valeur for champ, valeur in filtres.items()}
+    ).order_by('facture__date_emission', 'facture__id')
+    return [
+        {
+            'numero': commande.facture.numero_facture,
+            'date': timezone.localtime(commande.facture.date_emission).strftime('%d/%m/%Y %H:%M'),
+            'commande': commande.pk,
+            'table': commande.table.numero,
+            'serveur': commande.nom_serveur(),
+            'methode': METHODES.get(commande.facture.methode_paiement, ''),
+            'lignes': [
+                [item.plat.nom, item.quantite, str(item.prix_unitaire), str(item.subtotal())]
+                for item in commande.items.all()
+            ],
+            'montant_total': str(commande.facture.montant_total),
+            'tva': str(commande.facture.tva),
+            'montant_ttc': str(commande.facture.montant_ttc),
+        }
+        for commande in commandes
+    ]
+
+
+def empreinte(recus):
+    contenu = json.dumps([VERSION_GABARIT, recus], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(contenu.encode()).hexdigest()
+
+
+def chemin(valeur_empreinte):
+    return f'{DOSSIER}/{valeur_empreinte[:2]}/{valeur_empreinte}.pdf'
+
+
+@lru_cache(maxsize=None)
+def _gabarit():
+    """En-tete et pied prepares une fois : (operations de l'en-tete, hauteur,
+    operations du pied a decaler, hauteur du pied)"""
+    entete = pdf.Page(LARGEUR, 0)
+    y = MARGE + 14
+    entete.texte(LARGEUR / 2, y, RESTAURANT[0], 'F2', 14, 'centre')
+    for ligne in RESTAURANT[1:]:
+        y += INTERLIGNE
+        entete.texte(LARGEUR / 2, y, ligne, 'F1', 8, 'centre')
+    y += 8
+    entete.trait(MARGE, y, LARGEUR - MARGE, y)
+    pied = pdf.Page(LARGEUR, 0)
+    pied.trait(MARGE, 0, LARGEUR - MARGE, 0)
+    pied.texte(LARGEUR / 2, 14, "Merci de votre visite !", 'F1', 8, 'centre')
+    return (
+        b'\n'.join(entete.operations[1:]), y,
+        b'\n'.join(pied.operations[1:]), 14 + MARGE,
+    )
+
+
+def rendre_page(recu):
+    """Flux PDF (pdf.Page.flux()) du recu `recu`, donnees de lire()"""
+    entete, y, pied, hauteur_pied = _gabarit()
+    # Entete de facture (4 lignes), 2 lignes par item, totaux et paiement
+    # (4 lignes), plus les espacements ajoutes ci-dessous
+    hauteur = y + INTERLIGNE * (8 + 2 * len(recu['lignes'])) + 26 + hauteur_pied
+    page = pdf.Page(LARGEUR, hauteur)
+    page.brut(entete)
+    droite = LARGEUR - MARGE
+
+    y += INTERLIGNE + 4
+    page.texte(MARGE, y, f"FACTURE No {recu['numero']}", 'F2', 9)
+    for texte in (
+        recu['date'],
+        f"Commande #{recu['commande']} - Table {recu['table']}",
+        f"Serveur : {recu['serveur']}",
+    ):
+        y += INTERLIGNE
+        page.texte(MARGE, y, texte, 'F1', 8)
+    y += 6
+    page.trait(MARGE, y, droite, y)
+
+    for nom, quantite, prix_unitaire, sous_total in recu['lignes']:
+        y += INTERLIGNE + 2
+        montant = _montant(sous_total)
+        page.texte(droite, y, montant, 'F1', 8, 'droite')
+        place = droite - MARGE - pdf.largeur(montant, 'F1', 8) - 6
+        page.texte(MARGE, y, pdf.tronquer(nom, place, 'F1', 8), 'F1', 8)
+        y += INTERLIGNE - 2
+        page.texte(MARGE + 6, y, f"{quantite} x {_montant(prix_unitaire)}", 'F1', 7)
+    y += 6
+    page.trait(MARGE, y, droite, y)
+
+    for libelle, valeur, police in (
+        ("Sous-total", recu['montant_total'], 'F1'),
+        (f"TVA ({Facture.TAUX_TVA * 100:.0f}%)", recu['tva'], 'F1'),
+        ("TOTAL TTC", recu['montant_ttc'], 'F2'),
+    ):
+        y += INTERLIGNE + (2 if police == 'F2' else 0)
+        page.texte(MARGE, y, libelle, police, 9 if police == 'F2' else 8)
+        page.texte(droite, y, _montant(valeur), police, 9 if police == 'F2' else 8, 'droite')
+    y += INTERLIGNE
+    page.texte(MARGE, y, f"Paiement : {recu['methode']}", 'F1', 8)
+
+    y += 8
+    page.brut(b'q 1 0 0 1 0 %.2f cm\n%s\nQ' % (y, pied))
+    return page.flux()
+
+
+def rendre_pages(recus):
+    return [rendre_page(recu) for recu in recus]
+
+
+def nombre_processus():
+    return getattr(settings, 'RECUS_PROCESSUS', None) or os.cpu_count() or 1
+
+
+def rendre(recus, processus=None):
+    """Document PDF (octets) des `recus`, une page par recu"""
+    processus = processus or nombre_processus()
+    if processus < 2 or len(recus) < SEUIL_PROCESSUS:
+        return pdf.document(rendre_pages(recus))
+    paquets = [recus[i:i + TAILLE_PAQUET] for i in range(0, len(recus), TAILLE_PAQUET)]
+    # fork : les processus heritent du gabarit deja prepare et ne touchent
+    # pas a la base
+    _gabarit()
+    with ProcessPoolExecutor(
+        max_workers=processus, mp_context=multiprocessing.get_context('fork')
+    ) as pool:
+        return pdf.document(page for pages in pool.map(rendre_pages, paquets) for page in pages)
+
+
+def enregistrer(recus, processus=None):
+    """Chemin (stockage par defaut) du PDF des `recus`, rendu s'il n'existe pas.
+
+    Retourne (chemin, rendu) ; rendu vaut False pour une reimpression.
+    """
+    nom = chemin(empreinte(recus))
+    if default_storage.exists(nom):
+        return nom, False
+    contenu = rendre(recus, processus)
+    # Rendu concurrent du meme document : le premier enregistre suffit
+    if not default_storage.exists(nom):
+        default_storage.save(nom, ContentFile(contenu))
+    return nom, True
+
+
+def recu_facture(facture_id):
+    recus = lire(pk=facture_id)
+    if not recus:
+        raise Facture.DoesNotExist(f"Facture {facture_id} introuvable")
+    return enregistrer(recus, processus=1)
+
+
+def recus_du_jour(jour, processus=None):
+    """PDF de toutes les factures emises le `jour` ; (chemin, nombre, rendu)"""
+    debut, fin = bornes_jour(jour)
+    recus = lire(date_emission__gte=debut, date_emission__lt=fin)
+    if not recus:
+        return None, 0, False
+    nom, rendu = enregistrer(recus, processus)
+    return nom, len(recus), rendu
+
+
+@tache(file='lente', tentatives=3)
+def generer_recu(facture_id):
+    """Rendu anticipe apres l'encaissement : la premiere impression est gratuite"""
+    if Facture.objects.filter(pk=facture_id).exists():
+        recu_facture(facture_id)
+
+
+@tache(file='lente', tentatives=3)
+def imprimer_journee(jour):
+    recus_du_jour(parse_date(jour))
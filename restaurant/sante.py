@@ -0,0 +1,35 @@
+"""
+Sondes de sante pour le repartiteur de charge et la supervision.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def sonder_cache(alias):
+    """Ecrit, relit puis efface une cle ; retourne l'etat du cache `alias`"""
+    cache = caches[alias]
+    cle = f'sante:{uuid.uuid4().hex}'
+    etat = {'backend': type(cache).__name__, 'ok': False}
+    debut = time.perf_counter()
+    try:
+        cache.set(cle, 1, 10)
+        etat['ok'] = cache.get(cle) == 1
+        cache.delete(cle)
+    except Exception as exc:
+        etat['erreur'] = f'{type(exc).__name__}: {exc}'
+    etat['latence_ms'] = round((time.perf_counter() - debut) * 1000, 2)
+    if not etat['ok'] and 'erreur' not in etat:
+        etat['erreur'] = "valeur ecrite non relue"
+    return etat
+
+
+def etat_caches():
+    """Etat de chaque cache configure, et ce qui s'appuie dessus"""
+    return {
+        'caches': {alias: sonder_cache(alias) for alias in settings.CACHES},
+        'partage': getattr(settings, 'CACHE_PARTAGE', False),
+        'sessions': settings.SESSION_ENGINE.rsplit('.', 1)[-1],
+    }
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import (
+    analyses, authentification, cache_menu, evenements, images, instrumentation, occupation, prix,
+    recherche, ventes
+)
+from .models import Categorie, Commande, Facture, ItemCommande, Plat, Reservation, Table
+
+
+@receiver(post_save, sender=Plat)
+@receiver(post_delete, sender=Plat)
+@receiver(post_save, sender=Categorie)
+@receiver(post_delete, sender=Categorie)
+def invalider_menu(sender, **kwargs):
+    cache_menu.incrementer_version()
+    # Et de nouveau apres le commit : entre-temps, une autre requete a pu
+    # remettre l'ancien menu en cache sous la nouvelle version
+    transaction.on_commit(cache_menu.incrementer_version)
+
+
+@receiver(post_save, sender=Plat)
+def historiser_prix(sender, instance, raw=False, **kwargs):
+    if not raw:
+        prix.enregistrer_prix(instance)
+
+
+@receiver(post_save, sender=Plat)
+def indexer_plat(sender, instance, **kwargs):
+    recherche.indexer(instance)
+
+
+@receiver(post_save, sender=Plat)
+def traiter_image_plat(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if (instance.image and not images.a_jour(instance)) or (
+        not instance.image and instance.variantes_image
+    ):
+        images.planifier(instance.pk)
+
+
+@receiver(pre_delete, sender=Plat)
+def retirer_items_plat(sender, instance, **kwargs):
+    # La cascade vers ItemCommande se ferait par un DELETE direct, sans
+    # passer par ItemCommandeQuerySet.delete() : les totaux des commandes
+    # ne seraient pas diminues. Dans la transaction de la suppression.
+    ItemCommande.objects.filter(plat=instance).delete()
+
+
+@receiver(post_delete, sender=Plat)
+def desindexer_plat(sender, instance, **kwargs):
+    recherche.desindexer(instance.pk)
+
+
+@receiver(post_save, sender=Commande)
+def diffuser_commande(sender, instance, **kwargs):
+    evenements.publier_commande(instance)
+
+
+@receiver(post_save, sender=ItemCommande)
+def diffuser_item(sender, instance, created, **kwargs):
+    if created:
+        evenements.publier_item(instance)
+
+
+@receiver(post_save, sender=Facture)
+def cumuler_vente(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        ventes.enregistrer_facture(instance, created)
+
+
+@receiver(post_delete, sender=Facture)
+def retirer_vente(sender, instance, **kwargs):
+    ventes.retirer_facture(instance)
+
+
+@receiver(post_save, sender=Facture)
+@receiver(post_delete, sender=Facture)
+def oublier_analyses_facture(sender, instance, raw=False, **kwargs):
+    if not raw:
+        analyses.invalider(timezone.localdate(instance.date_emission))
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def oublier_analyses_reservation(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # Reservation deplacee : le jour d'origine change aussi
+        dates = {instance.date_reservation, getattr(instance, '_date_initiale', None)}
+        for jour in {timezone.localdate(date) for date in dates if date is not None}:
+            analyses.invalider(jour)
+        instance._date_initiale = instance.date_reservation
+
+
+@receiver(post_save, sender=Table)
+@receiver(post_delete, sender=Table)
+def oublier_etat_salle(sender, **kwargs):
+    occupation.invalider()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def oublier_utilisateur(sender, instance, **kwargs):
+    authentification.oublier_utilisateur(instance.pk)
+    # Comme pour le menu : une requete concurrente a pu remettre l'ancien
+    # utilisateur en cache avant le commit
+    transaction.on_commit(lambda: authentification.oublier_utilisateur(instance.pk))
+
+
+@receiver(connection_created)
+def instrumenter_connexion(sender, connection, **kwargs):
+    instrumentation.instrumenter_connexion(connection)
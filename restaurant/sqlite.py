@@ -0,0 +1,66 @@
+"""
+SQLite en production.
+
+Les reglages de connexion (journal WAL, busy_timeout, mmap, transactions
+IMMEDIATE...) sont dans settings.DATABASES et appliques par Django a
+chaque nouvelle connexion. Ce module regroupe ce qui vient autour :
+prechauffage de la connexion d'un worker, etat des pragmas, et entretien
+periodique (commande optimiser_sqlite).
+"""
+import os
+
+from django.db import connections
+
+PRAGMAS = ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size', 'temp_store')
+
+
+def est_sqlite(alias='default'):
+    return connections[alias].vendor == 'sqlite'
+
+
+def prechauffer(alias='default'):
+    """Ouvre la connexion et charge le schema avant la premiere requete"""
+    if not est_sqlite(alias):
+        return
+    with connections[alias].cursor() as curseur:
+        curseur.execute("SELECT count(*) FROM sqlite_master")
+        curseur.fetchone()
+
+
+def _pragma(curseur, nom):
+    curseur.execute(f"PRAGMA {nom}")
+    ligne = curseur.fetchone()
+    return ligne[0] if ligne else None
+
+
+def etat(alias='default'):
+    """Pragmas de la connexion, taille de la base et du journal WAL"""
+    connexion = connections[alias]
+    with connexion.cursor() as curseur:
+        resultat = {nom: _pragma(curseur, nom) for nom in PRAGMAS}
+        taille_page = _pragma(curseur, 'page_size')
+        resultat['taille_base'] = _pragma(curseur, 'page_count') * taille_page
+        resultat['pages_libres'] = _pragma(curseur, 'freelist_count')
+    resultat['transaction_mode'] = connexion.transaction_mode or 'DEFERRED'
+    resultat['taille_wal'] = taille_wal(alias)
+    return resultat
+
+
+def taille_wal(alias='default'):
+    chemin = f"{connections[alias].settings_dict['NAME']}-wal"
+    return os.path.getsize(chemin) if os.path.exists(chemin) else 0
+
+
+def optimiser(alias='default', analyser=False):
+    """Statistiques du planificateur puis point de controle du journal.
+
+    PRAGMA optimize ne relance ANALYZE que sur les tables qui en ont besoin ;
+    `analyser` force un ANALYZE complet. Le point de controle TRUNCATE
+    reporte le journal WAL dans la base et le ramene a zero octet s'il n'est
+    pas en cours de lecture. Retourne (bloque, pages du journal, pages
+    reportees).
+    """
+    with connections[alias].cursor() as curseur:
+        curseur.execute("ANALYZE" if analyser else "PRAGMA optimize")
+        curseur.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return tuple(curseur.fetchone())
@@ -0,0 +1,233 @@
+"""
+File de taches en base de donnees, sans courtier externe.
+
+Une tache est une ligne de Tache ecrite dans la transaction de l'appelant :
+elle n'existe que si l'operation qui la demande est validee, et n'est
+visible des travailleurs qu'apres le commit. `manage.py runworker` prend
+les taches de ses files, par priorite puis anciennete, sous un bail ; une
+erreur replanifie la tache avec un delai exponentiel, jusqu'a
+`tentatives_max` essais.
+
+Execution au moins une fois : une tache dont le travailleur meurt est
+reprise a l'expiration de son bail. Les fonctions de tache doivent donc
+etre idempotentes. Seules les fonctions decorees par @tache s'executent.
+
+Files : 'critique' (e-mails aux clients), 'defaut', 'lente' (images,
+documents). Un travailleur peut etre dedie a certaines files
+(`runworker --files critique`) pour qu'un lot lent ne retarde pas le reste.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Tache
+
+logger = logging.getLogger(__name__)
+
+FILES = ('critique', 'defaut', 'lente')
+DELAI_BASE = 10
+DELAI_MAX = 3600
+PAUSE_MAX = 60
+
+
+def tache(file='defaut', priorite=0, tentatives=5):
+    """Declare une fonction executable par la file de taches"""
+    if file not in FILES:
+        raise ValueError(f"File inconnue : {file}")
+
+    def decorateur(fonction):
+        fonction.options_tache = {
+            'file': file,
+            'priorite': priorite,
+            'tentatives_max': tentatives,
+        }
+        return fonction
+    return decorateur
+
+
+def nom_tache(fonction):
+    return f'{fonction.__module__}.{fonction.__qualname__}'
+
+
+def enfiler(fonction, cle=None, delai=None, priorite=None, **arguments):
+    """Ajoute une tache dans la transaction en cours.
+
+    Avec une `cle` deja connue, aucune tache n'est ajoutee et la tache
+    existante est retournee, quel que soit son statut.
+    """
+    options = getattr(fonction, 'options_tache', None)
+    if options is None:
+        raise ValueError(f"{nom_tache(fonction)} n'est pas declaree avec @tache")
+    valeurs = dict(
+        options,
+        nom=nom_tache(fonction),
+        arguments=arguments,
+        disponible_a=timezone.now() + (delai or timedelta()),
+    )
+    if priorite is not None:
+        valeurs['priorite'] = priorite
+    if cle is None:
+        return Tache.objects.create(**valeurs)
+    return Tache.objects.get_or_create(cle=cle, defaults=valeurs)[0]
+
+
+def delai_nouvel_essai(tentative):
+    """Attente avant l'essai suivant : exponentielle, plafonnee, avec alea"""
+    delai = min(DELAI_MAX, DELAI_BASE * 2 ** (tentative - 1))
+    return timedelta(seconds=delai * random.uniform(0.75, 1.25))
+
+
+def duree_bail():
+    return timedelta(seconds=getattr(settings, 'TACHES_BAIL', 300))
+
+
+def reserver(travailleur, files=None, nombre=1):
+    """Prend jusqu'a `nombre` taches pretes pour `travailleur`"""
+    maintenant = timezone.now()
+    pretes = Tache.objects.filter(statut='EN_ATTENTE', disponible_a__lte=maintenant)
+    if files:
+        pretes = pretes.filter(file__in=files)
+    pretes = pretes.order_by('-priorite', 'disponible_a', 'id')
+
+    with transaction.atomic():
+        # PostgreSQL : les travailleurs concurrents sautent les lignes deja
+        # prises. SQLite : la transaction IMMEDIATE les serialise.
+        if connection.features.has_select_for_update_skip_locked:
+            pretes = pretes.select_for_update(skip_locked=True)
+        ids = list(pretes.values_list('pk', flat=True)[:nombre])
+        if not ids:
+            return []
+        Tache.objects.filter(pk__in=ids, statut='EN_ATTENTE').update(
+            statut='EN_COURS',
+            travailleur=travailleur,
+            bail=maintenant + duree_bail(),
+            tentatives=F('tentatives') + 1,
+        )
+    return list(
+        Tache.objects.filter(pk__in=ids, statut='EN_COURS', travailleur=travailleur)
+        .order_by('-priorite', 'disponible_a', 'id')
+    )
+
+
+def executer(tache):
+    """Execute une tache prise par reserver() et enregistre son resultat"""
+    encore_a_moi = Tache.objects.filter(
+        pk=tache.pk, statut='EN_COURS', travailleur=tache.travailleur
+    )
+    try:
+        fonction = import_string(tache.nom)
+        if not hasattr(fonction, 'options_tache'):
+            raise ValueError(f"{tache.nom} n'est pas declaree avec @tache")
+        fonction(**tache.arguments)
+    except Exception as exc:
+        logger.exception("Tache %s (%s) en erreur, essai %s/%s",
+                         tache.pk, tache.nom, tache.tentatives, tache.tentatives_max)
+        erreur = f'{type(exc).__name__}: {exc}'
+        if tache.tentatives >= tache.tentatives_max:
+            encore_a_moi.update(
+                statut='ECHEC', bail=None, derniere_erreur=erreur, date_fin=timezone.now()
+            )
+        else:
+            encore_a_moi.update(
+                statut='EN_ATTENTE',
+                bail=None,
+                derniere_erreur=erreur,
+                disponible_a=timezone.now() + delai_nouvel_essai(tache.tentatives),
+            )
+        return False
+    encore_a_moi.update(statut='TERMINEE', bail=None, date_fin=timezone.now())
+    return True
+
+
+def reprendre_expirees():
+    """Remet en attente les taches dont le travailleur a depasse le bail"""
+    expirees = Tache.objects.filter(statut='EN_COURS', bail__lt=timezone.now())
+    echecs = expirees.filter(tentatives__gte=F('tentatives_max')).update(
+        statut='ECHEC', bail=None, derniere_erreur="Bail expire", date_fin=timezone.now()
+    )
+    reprises = expirees.update(statut='EN_ATTENTE', bail=None, derniere_erreur="Bail expire")
+    return reprises + echecs
+
+
+def purger():
+    """Supprime les taches terminees depuis TACHES_CONSERVATION_JOURS"""
+    limite = timezone.now() - timedelta(days=getattr(settings, 'TACHES_CONSERVATION_JOURS', 7))
+    return Tache.objects.filter(statut='TERMINEE', date_fin__lt=limite).delete()[0]
+
+
+def nouveau_travailleur():
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def travailler(files=None, arret=None, une_fois=False):
+    """Boucle d'un travailleur (un thread) ; retourne le nombre de taches.
+
+    `une_fois` : s'arrete des qu'aucune tache n'est prete. Sinon, attend
+    TACHES_ATTENTE secondes entre deux tours a vide, jusqu'a `arret` ; une
+    erreur de base est journalisee et le tour recommence apres une pause
+    croissante (PAUSE_MAX secondes au plus).
+    """
+    arret = arret or threading.Event()
+    travailleur = nouveau_travailleur()
+    attente = getattr(settings, 'TACHES_ATTENTE', 1.0)
+    intervalle_entretien = getattr(settings, 'TACHES_ENTRETIEN', 60)
+    entretien = 0.0
+    executees = 0
+    pause = attente
+    try:
+        while not arret.is_set():
+            close_old_connections()
+            try:
+                if time.monotonic() - entretien > intervalle_entretien:
+                    reprendre_expirees()
+                    purger()
+                    entretien = time.monotonic()
+                pretes = reserver(travailleur, files)
+                for tache_prete in pretes:
+                    executer(tache_prete)
+                    executees += 1
+            except DatabaseError:
+                if une_fois:
+                    raise
+                # Base indisponible ou verrouillee : le thread survit et
+                # reessaie de plus en plus tard. Une tache interrompue est
+                # reprise a l'expiration de son bail.
+                logger.exception("Travailleur %s : erreur de base, nouvel essai dans %.0f s",
+                                 travailleur, pause)
+                connection.close()
+                arret.wait(pause)
+                pause = min(pause * 2, PAUSE_MAX)
+                continue
+            pause = attente
+            if not pretes:
+                if une_fois:
+                    break
+                arret.wait(attente)
+    finally:
+        # Thread hors du cycle requete/reponse : rien ne ferme sa connexion
+        connection.close()
+    return executees
+
+
+def executer_en_attente(files=None):
+    """Execute dans le thread courant toutes les taches pretes (tests, scripts)"""
+    travailleur = nouveau_travailleur()
+    executees = 0
+    while True:
+        pretes = reserver(travailleur, files)
+        if not pretes:
+            return executees
+        for tache_prete in pretes:
+            executer(tache_prete)
+            executees += 1
@@ -0,0 +1,27 @@
+from django import template
+
+from restaurant import images
+
+register = template.Library()
+
+
+@register.inclusion_tag('restaurant/_image_plat.html')
+def image_plat(plat, classes='', sizes='100vw', chargement='lazy'):
+    """<picture> responsive d'un plat : AVIF, WebP puis JPEG, par largeur"""
+    pret = images.a_jour(plat)
+    return {
+        'plat': plat,
+        'classes': classes,
+        'sizes': sizes,
+        'chargement': chargement,
+        'sources': images.sources(plat) if pret else [],
+        'srcset_jpeg': images.srcset(plat, 'jpeg') if pret else '',
+        'src': images.url(plat),
+        'largeur': plat.variantes_image.get('largeur') if pret else None,
+        'hauteur': plat.variantes_image.get('hauteur') if pret else None,
+    }
+
+
+@register.simple_tag
+def srcset_plat(plat, extension='jpeg'):
+    return images.srcset(plat, extension)
@@ -1,7 +1,45 @@
-from django.test import TestCase, Client
+import asyncio
+import base64
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import signal
+import zlib
+import tempfile
+import threading
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+from asgiref.testing import ApplicationCommunicator
+from django.core.handlers.asgi import ASGIHandler
+from django.test import RequestFactory, TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.core.management import call_command, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.utils import timezone
+from datetime import datetime, time, timedelta
 from decimal import Decimal
+from io import StringIO
+from . import (
+    analyses, benchmarks, cache_menu, evenements, export, images, instrumentation, numerotation,
+    occupation, pagination, pdf, prix, recus, sqlite, taches
+)
+from .caisse import EncaissementImpossible, encaisser
+from .disponibilite import CreneauIndisponible, reserver, tables_libres
 from .models import *
+from .utils import bornes_jour
+from PIL import Image
 
 class ModelTests(TestCase):
     def setUp(self):
@@ -127,4 +165,1827 @@ class ViewTests(TestCase):
         
         self.client.login(username='admin', password='admin123')
         response = self.client.get('/dashboard/')
-        self.assertEqual(response.status_code, 200)
\ No newline at end of file
+        self.assertEqual(response.status_code, 200)
+
+class TotauxCommandeTests(TestCase):
+    def setUp(self):
+        categorie = Categorie.objects.create(nom="Plats")
+        self.plat = Plat.objects.create(
+            nom="Poulet braisé",
+            description="Poulet grillé",
+            prix=Decimal('5000.00'),
+            categorie=categorie
+        )
+        self.autre_plat = Plat.objects.create(
+            nom="Jus naturel",
+            description="Fait maison",
+            prix=Decimal('1200.00'),
+            categorie=categorie
+        )
+        table = Table.objects.create(numero=1, capacite=4)
+        self.commande = Commande.objects.create(table=table)
+    
+    def assertTotaux(self, montant, nombre):
+        commande = Commande.objects.get(pk=self.commande.pk)
+        self.assertEqual(commande.montant_total, Decimal(montant))
+        self.assertEqual(commande.nombre_items, nombre)
+        self.assertEqual(commande.calculer_totaux(), (Decimal(montant), nombre))
+    
+    def test_save_et_delete_maintiennent_les_totaux(self):
+        """Test deltas appliques par save() et delete()"""
+        item = ItemCommande.objects.create(
+            commande=self.commande, plat=self.plat, quantite=2
+        )
+        self.assertTotaux('10000.00', 1)
+        self.assertEqual(self.commande.total(), Decimal('10000.00'))
+        
+        item = ItemCommande.objects.get(pk=item.pk)
+        item.quantite = 3
+        item.save()
+        self.assertTotaux('15000.00', 1)
+        
+        item.delete()
+        self.assertTotaux('0.00', 0)
+    
+    def test_operations_de_masse(self):
+        """Test bulk_create, update et delete sur le queryset"""
+        ItemCommande.objects.bulk_create([
+            ItemCommande(commande=self.commande, plat=self.plat, quantite=1),
+            ItemCommande(commande=self.commande, plat=self.autre_plat, quantite=2),
+        ])
+        self.assertTotaux('7400.00', 2)
+        
+        ItemCommande.objects.filter(plat=self.autre_plat).update(quantite=5)
+        self.assertTotaux('11000.00', 2)
+        
+        ItemCommande.objects.filter(plat=self.plat).delete()
+        self.assertTotaux('6000.00', 1)
+    
+    def test_suppression_du_plat(self):
+        """Test cascade depuis Plat : les items retires sortent des totaux"""
+        ItemCommande.objects.create(commande=self.commande, plat=self.plat, quantite=2)
+        ItemCommande.objects.create(commande=self.commande, plat=self.autre_plat, quantite=1)
+        self.plat.delete()
+        self.assertTotaux('1200.00', 1)
+        
+        Plat.objects.filter(pk=self.autre_plat.pk).delete()
+        self.assertTotaux('0.00', 0)
+    
+    def test_save_commande_ne_perd_pas_les_totaux(self):
+        """Test qu'un save() complet n'ecrase pas des totaux concurrents"""
+        copie = Commande.objects.get(pk=self.commande.pk)
+        ItemCommande.objects.create(
+            commande=self.commande, plat=self.plat, quantite=1
+        )
+        copie.statut = 'PRETE'
+        copie.save()
+        self.assertTotaux('5000.00', 1)
+    
+    def test_commande_recalculer_totaux(self):
+        """Test commande de verification et de correction"""
+        ItemCommande.objects.create(
+            commande=self.commande, plat=self.plat, quantite=1
+        )
+        Commande.objects.filter(pk=self.commande.pk).update(montant_total=0)
+        
+        with self.assertRaises(CommandError):
+            call_command('recalculer_totaux', verifier=True, stdout=StringIO())
+        call_command('recalculer_totaux', stdout=StringIO())
+        self.assertTotaux('5000.00', 1)
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='admin',
+            password='admin123'
+        )
+        table = Table.objects.create(numero=1, capacite=4)
+        Commande.objects.bulk_create([
+            Commande(table=table, statut='PAYEE' if i % 3 else 'EN_COURS')
+            for i in range(60)
+        ])
+        self.client.login(username='admin', password='admin123')
+    
+    def parcourir(self, url, curseur='', sens='curseur_suivant'):
+        ids = []
+        while True:
+            response = self.client.get(url, {'statut': 'PAYEE', 'curseur': curseur})
+            page = response.context['page']
+            ids.extend(commande.id for commande in page)
+            curseur = getattr(page, sens)
+            if not curseur:
+                return ids, page
+    
+    def test_parcours_complet_sans_doublon(self):
+        """Test pagination par curseur avec filtre de statut"""
+        attendus = list(
+            Commande.objects.filter(statut='PAYEE')
+            .order_by('-date_creation', '-id').values_list('id', flat=True)
+        )
+        ids, derniere = self.parcourir('/commandes/')
+        self.assertEqual(ids, attendus)
+        
+        precedents, _ = self.parcourir(
+            '/commandes/', derniere.curseur_precedent, 'curseur_precedent'
+        )
+        self.assertEqual(len(precedents), len(attendus) - len(derniere))
+    
+    def test_curseur_invalide(self):
+        """Test curseur illisible : retour a la premiere page"""
+        response = self.client.get('/commandes/', {'curseur': 'n%importe'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['page'].a_precedent)
+
+    def test_curseur_mauvais_type(self):
+        """Test curseur forge avec une valeur du mauvais type : premiere page"""
+        def forger(valeur):
+            return base64.urlsafe_b64encode(
+                json.dumps([valeur, 1, 's']).encode()
+            ).decode().rstrip('=')
+
+        for url in ('/commandes/', '/factures/'):
+            response = self.client.get(url, {'curseur': forger(5)})
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.context['page'].a_precedent)
+        self.assertIsNone(pagination.decoder_curseur(forger(True), int))
+        self.assertIsNone(pagination.decoder_curseur(forger('2024-01-01T12:00:00'), int))
+        self.assertIsNotNone(pagination.decoder_curseur(forger(5), int))
+
+
+class IndexTests(TestCase):
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # Sur des tables presque vides, le planificateur prefere un seq scan
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        self.debut, self.fin = bornes_jour(timezone.localdate())
+    
+    def assertUtiliseIndex(self, queryset, index):
+        self.assertIn(index, queryset.explain())
+    
+    def test_filtres_du_dashboard(self):
+        """Test intervalles semi-ouverts servis par les index de date"""
+        self.assertUtiliseIndex(
+            Commande.objects.filter(
+                date_creation__gte=self.debut, date_creation__lt=self.fin
+            ),
+            'commande_date_idx'
+        )
+        self.assertUtiliseIndex(
+            Reservation.objects.filter(
+                date_reservation__gte=self.debut, date_reservation__lt=self.fin
+            ),
+            'reservation_date_idx'
+        )
+        self.assertUtiliseIndex(
+            Facture.objects.filter(
+                date_emission__gte=self.debut, date_emission__lt=self.fin
+            ),
+            'facture_date_idx'
+        )
+    
+    def test_filtres_des_listes_et_du_menu(self):
+        """Test index composites et partiels"""
+        self.assertUtiliseIndex(
+            Commande.objects.filter(statut='PAYEE').order_by('-date_creation', '-id'),
+            'commande_statut_date_idx'
+        )
+        self.assertUtiliseIndex(
+            Plat.objects.filter(categorie_id=1, disponible=True),
+            'plat_disponible_idx'
+        )
+
+
+class CacheMenuTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.categorie = Categorie.objects.create(nom="Desserts")
+        self.plat = Plat.objects.create(
+            nom="Crème glacée",
+            description="3 boules au choix",
+            prix=Decimal('1500.00'),
+            categorie=self.categorie
+        )
+    
+    def test_menu_servi_depuis_le_cache(self):
+        """Test aucune requete SQL une fois le menu en cache"""
+        self.client.get('/menu/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/menu/')
+        self.assertContains(response, 'Crème glacée')
+    
+    def test_modification_invalide_le_cache(self):
+        """Test incrementation de la version par les signaux"""
+        version = cache_menu.version_menu()
+        self.client.get('/menu/')
+        
+        self.plat.disponible = False
+        self.plat.save()
+        
+        self.assertGreater(cache_menu.version_menu(), version)
+        response = self.client.get('/menu/')
+        self.assertNotContains(response, 'Crème glacée')
+    
+    def test_get_conditionnel(self):
+        """Test 304 sur ETag inchange, 200 apres modification"""
+        response = self.client.get('/menu/')
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        
+        response = self.client.get('/menu/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        
+        Categorie.objects.create(nom="Boissons")
+        response = self.client.get('/menu/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class RechercheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        categorie = Categorie.objects.create(nom="Desserts")
+        for nom, description in [
+            ("Crème glacée", "3 boules au choix"),
+            ("Tarte aux pommes", "Tarte faite maison, crème fraîche"),
+            ("Jus naturel", "Fait maison"),
+        ]:
+            Plat.objects.create(
+                nom=nom,
+                description=description,
+                prix=Decimal('1500.00'),
+                categorie=categorie
+            )
+    
+    def noms(self, texte):
+        return [plat.nom for plat in cache_menu.rechercher(texte)]
+    
+    def test_accents_prefixes_et_pertinence(self):
+        """Test recherche sans accents, par prefixe, classee"""
+        self.assertEqual(self.noms("creme"), ["Crème glacée", "Tarte aux pommes"])
+        self.assertEqual(self.noms("gla"), ["Crème glacée"])
+        self.assertEqual(
+            set(self.noms("fait mai")), {"Tarte aux pommes", "Jus naturel"}
+        )
+        self.assertEqual(self.noms("%"), [])
+    
+    def test_index_suit_les_modifications(self):
+        """Test mise a jour incrementale de l'index"""
+        plat = Plat.objects.get(nom="Jus naturel")
+        plat.nom = "Jus de bissap"
+        plat.save()
+        self.assertEqual(self.noms("bissap"), ["Jus de bissap"])
+        
+        plat.delete()
+        self.assertEqual(self.noms("bissap"), [])
+    
+    def test_menu_et_suggestions(self):
+        """Test recherche depuis le menu et l'API de suggestions"""
+        response = self.client.get('/menu/', {'search': 'glacee'})
+        self.assertContains(response, 'Crème glacée')
+        self.assertNotContains(response, 'Jus naturel')
+        
+        response = self.client.get('/menu/recherche/', {'q': 'tar'})
+        self.assertEqual(response.json()['resultats'][0]['nom'], "Tarte aux pommes")
+
+
+class DisponibiliteTests(TestCase):
+    def setUp(self):
+        self.petite = Table.objects.create(numero=1, capacite=2)
+        self.grande = Table.objects.create(numero=2, capacite=6)
+        self.soiree = timezone.localdate() + timedelta(days=1)
+        self.vingt_heures = timezone.make_aware(
+            datetime.combine(self.soiree, time(20, 0))
+        )
+        reserver(Reservation(
+            client_nom="Awa",
+            client_telephone="90000000",
+            table=self.grande,
+            nombre_personnes=5,
+            date_reservation=self.vingt_heures
+        ))
+    
+    def donnees(self, **kwargs):
+        donnees = {
+            'client_nom': "Kofi",
+            'client_telephone': "91000000",
+            'table': self.grande.id,
+            'nombre_personnes': 4,
+            'date_reservation': (
+                self.vingt_heures + timedelta(hours=1)
+            ).strftime('%Y-%m-%dT%H:%M'),
+        }
+        donnees.update(kwargs)
+        return donnees
+    
+    def test_tables_libres_en_une_requete(self):
+        """Test chevauchement d'intervalles et capacite"""
+        debut = self.vingt_heures + timedelta(hours=1)
+        with self.assertNumQueries(1):
+            libres = list(tables_libres(debut, debut + timedelta(hours=2), 2))
+        self.assertEqual(libres, [self.petite])
+        
+        debut = self.vingt_heures + timedelta(hours=2)
+        libres = tables_libres(debut, debut + timedelta(hours=2), 4)
+        self.assertEqual(list(libres), [self.grande])
+    
+    def test_reservation_refusee_si_chevauchement(self):
+        """Test double reservation et capacite refusees"""
+        response = self.client.post('/reservation/', self.donnees())
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'deja reservee')
+        
+        response = self.client.post(
+            '/reservation/', self.donnees(table=self.petite.id)
+        )
+        self.assertContains(response, "2 places")
+        
+        with self.assertRaises(CreneauIndisponible):
+            reserver(Reservation(
+                client_nom="Kofi",
+                client_telephone="91000000",
+                table=self.grande,
+                nombre_personnes=4,
+                date_reservation=self.vingt_heures - timedelta(minutes=90)
+            ))
+        self.assertEqual(Reservation.objects.count(), 1)
+    
+    def test_creneaux_de_la_soiree(self):
+        """Test API des creneaux libres"""
+        response = self.client.get('/reservation/creneaux/', {
+            'date': self.soiree.isoformat(),
+            'personnes': 3,
+        })
+        creneaux = {
+            creneau['heure']: [table['numero'] for table in creneau['tables']]
+            for creneau in response.json()['creneaux']
+        }
+        self.assertEqual(creneaux['18:00'], [2])
+        self.assertEqual(creneaux['18:30'], [])
+        self.assertEqual(creneaux['22:00'], [2])
+        
+        for jour in ('2024-02-30', '9999-12-31'):
+            response = self.client.get('/reservation/creneaux/', {'date': jour})
+            self.assertEqual(response.status_code, 400)
+    
+    def test_liste_date_impossible(self):
+        """Test liste des reservations : date impossible ignoree"""
+        User.objects.create_user(username='admin', password='admin123')
+        self.client.login(username='admin', password='admin123')
+        response = self.client.get('/reservations/', {'date': self.soiree.isoformat()})
+        self.assertEqual(len(response.context['reservations']), 1)
+        for jour in ('2024-02-30', '9999-12-31'):
+            response = self.client.get('/reservations/', {'date': jour})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context['reservations']), 1)
+
+
+class NumerotationTests(TestCase):
+    def test_numeros_consecutifs_sans_trou(self):
+        """Test numerotation par periode et restitution sur rollback"""
+        annee = timezone.localdate().strftime('%Y')
+        self.assertEqual(numerotation.prochain_numero(), f"FAC-{annee}-000001")
+        
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                numerotation.numeros(10)
+                raise RuntimeError
+        
+        self.assertEqual(numerotation.numeros(2), [
+            f"FAC-{annee}-000002", f"FAC-{annee}-000003"
+        ])
+    
+    def test_numerotation_journaliere(self):
+        """Test sequence par jour"""
+        with self.settings(FACTURE_NUMEROTATION='journaliere'):
+            jour = timezone.localdate().strftime('%Y%m%d')
+            self.assertEqual(numerotation.prochain_numero(), f"FAC-{jour}-000001")
+
+
+class NumerotationConcurrenteTests(TransactionTestCase):
+    THREADS = 8
+    FACTURES_PAR_THREAD = 10
+    
+    def test_allocations_concurrentes(self):
+        """Test de charge : plusieurs workers facturent en meme temps"""
+        categorie = Categorie.objects.create(nom="Plats")
+        plat = Plat.objects.create(
+            nom="Riz au poisson",
+            description="Specialite locale",
+            prix=Decimal('4000.00'),
+            categorie=categorie
+        )
+        table = Table.objects.create(numero=1, capacite=4)
+        commandes = []
+        for _ in range(self.THREADS * self.FACTURES_PAR_THREAD):
+            commande = Commande.objects.create(table=table)
+            ItemCommande.objects.create(commande=commande, plat=plat)
+            commandes.append(commande)
+        
+        erreurs = []
+        
+        def caissier(lot):
+            try:
+                for commande in lot:
+                    Facture.objects.create(commande=commande, methode_paiement='ESPECE')
+            except Exception as e:
+                erreurs.append(e)
+            finally:
+                connections.close_all()
+        
+        threads = [
+            threading.Thread(target=caissier, args=(commandes[i::self.THREADS],))
+            for i in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(erreurs, [])
+        numeros = sorted(
+            int(numero.rsplit('-', 1)[1])
+            for numero in Facture.objects.values_list('numero_facture', flat=True)
+        )
+        self.assertEqual(numeros, list(range(1, len(commandes) + 1)))
+
+
+class EncaissementTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='admin',
+            password='admin123'
+        )
+        categorie = Categorie.objects.create(nom="Plats")
+        self.plat = Plat.objects.create(
+            nom="Steak frites",
+            description="Steak tendre",
+            prix=Decimal('6500.00'),
+            categorie=categorie
+        )
+        self.table = Table.objects.create(numero=3, capacite=4, disponible=False)
+        self.commande = Commande.objects.create(table=self.table)
+        ItemCommande.objects.create(commande=self.commande, plat=self.plat, quantite=2)
+        self.client.login(username='admin', password='admin123')
+    
+    def test_encaissement_atomique_et_idempotent(self):
+        """Test double soumission du formulaire d'encaissement"""
+        url = f'/commandes/{self.commande.id}/facturer/'
+        cle = self.client.get(url).context['cle_idempotence']
+        donnees = {'methode_paiement': 'MOBILE', 'cle_idempotence': cle}
+        
+        premiere = self.client.post(url, donnees)
+        seconde = self.client.post(url, donnees)
+        self.assertEqual(premiere['Location'], seconde['Location'])
+        
+        facture = Facture.objects.get()
+        self.assertEqual(facture.montant_total, Decimal('13000.00'))
+        self.assertTrue(facture.payee)
+        self.commande.refresh_from_db()
+        self.table.refresh_from_db()
+        self.assertEqual(self.commande.statut, 'PAYEE')
+        self.assertTrue(self.table.disponible)
+    
+    def test_commande_deja_payee(self):
+        """Test second encaissement avec une autre cle"""
+        facture, creee = encaisser(self.commande.id, 'ESPECE', 'a')
+        self.assertTrue(creee)
+        self.assertEqual(encaisser(self.commande.id, 'CARTE', 'b'), (facture, False))
+    
+    def test_encaissement_refuse(self):
+        """Test methode invalide et commande vide, sans effet de bord"""
+        with self.assertRaises(EncaissementImpossible):
+            encaisser(self.commande.id, 'CHEQUE')
+        
+        vide = Commande.objects.create(table=self.table)
+        with self.assertRaises(EncaissementImpossible):
+            encaisser(vide.id, 'ESPECE')
+        vide.refresh_from_db()
+        self.assertEqual(vide.statut, 'EN_COURS')
+        self.assertFalse(Facture.objects.exists())
+
+
+class VentesJournalieresTests(TestCase):
+    def setUp(self):
+        categorie = Categorie.objects.create(nom="Plats")
+        self.plat = Plat.objects.create(
+            nom="Poulet yassa",
+            prix=Decimal('5000.00'),
+            categorie=categorie
+        )
+        self.table = Table.objects.create(numero=4, capacite=6)
+    
+    def _commande(self, quantite, couverts=2):
+        commande = Commande.objects.create(table=self.table, couverts=couverts)
+        ItemCommande.objects.create(commande=commande, plat=self.plat, quantite=quantite)
+        return commande
+    
+    def test_cumul_incremental(self):
+        """Test mise a jour du cumul a l'encaissement et au paiement"""
+        encaisser(self._commande(2).id, 'ESPECE')
+        encaisser(self._commande(1, couverts=3).id, 'ESPECE')
+        facture = Facture.objects.create(
+            commande=self._commande(1),
+            montant_total=Decimal('5000.00'),
+            methode_paiement='CARTE'
+        )
+        
+        especes = VenteJournaliere.objects.get(methode_paiement='ESPECE')
+        self.assertEqual(especes.jour, timezone.localdate())
+        self.assertEqual(especes.nombre_factures, 2)
+        self.assertEqual(especes.couverts, 5)
+        self.assertEqual(especes.montant_ht, Decimal('15000.00'))
+        self.assertEqual(especes.montant_ttc, Decimal('17700.00'))
+        self.assertEqual(especes.montant_encaisse, Decimal('17700.00'))
+        
+        carte = VenteJournaliere.objects.get(methode_paiement='CARTE')
+        self.assertEqual(carte.montant_encaisse, Decimal('0.00'))
+        facture = Facture.objects.get(pk=facture.pk)
+        facture.payee = True
+        facture.save()
+        carte.refresh_from_db()
+        self.assertEqual(carte.montant_encaisse, Decimal('5900.00'))
+        
+        facture.delete()
+        carte.refresh_from_db()
+        self.assertEqual(carte.nombre_factures, 0)
+        self.assertEqual(carte.montant_ttc, Decimal('0.00'))
+    
+    def test_reconstruction(self):
+        """Test recalcul du cumul apres une modification en masse"""
+        encaisser(self._commande(2).id, 'MOBILE')
+        encaisser(self._commande(3).id, 'CARTE')
+        call_command('reconstruire_ventes', '--verifier', stdout=StringIO())
+        
+        Facture.objects.filter(methode_paiement='CARTE').update(payee=False)
+        with self.assertRaises(CommandError):
+            call_command('reconstruire_ventes', '--verifier', stdout=StringIO())
+        
+        call_command('reconstruire_ventes', stdout=StringIO())
+        call_command('reconstruire_ventes', '--verifier', stdout=StringIO())
+        for jour in ('2024-02-30', '9999-12-31'):
+            with self.assertRaises(CommandError):
+                call_command('reconstruire_ventes', '--depuis', jour, stdout=StringIO())
+        self.assertEqual(
+            VenteJournaliere.objects.get(methode_paiement='CARTE').montant_encaisse,
+            Decimal('0.00')
+        )
+    
+    def test_tableau_de_bord(self):
+        """Test chiffre d'affaires du jour lu dans le cumul"""
+        User.objects.create_user(username='admin', password='admin123')
+        self.client.login(username='admin', password='admin123')
+        encaisser(self._commande(2, couverts=4).id, 'ESPECE')
+        
+        response = self.client.get('/dashboard/')
+        self.assertEqual(response.context['chiffre_affaires_jour'], Decimal('11800.00'))
+        self.assertEqual(response.context['couverts_jour'], 4)
+        response = self.client.get('/factures/')
+        self.assertEqual(response.context['total_factures'], Decimal('11800.00'))
+
+class ImagesPlatsTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        reglages = override_settings(MEDIA_ROOT=self.media)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.categorie = Categorie.objects.create(nom="Plats")
+    
+    def _photo(self):
+        # Photo paysage 1000x600 prise "couchee" (orientation EXIF 6)
+        photo = Image.new('RGB', (1000, 600), (200, 80, 40))
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = "Appareil"
+        tampon = io.BytesIO()
+        photo.save(tampon, 'JPEG', exif=exif)
+        return ContentFile(tampon.getvalue(), name='photo.jpg')
+    
+    def test_variantes(self):
+        """Test generation des variantes et du <picture>"""
+        with mock.patch.object(images, 'planifier') as planifier:
+            plat = Plat.objects.create(
+                nom="Thieboudienne",
+                description="Riz au poisson",
+                prix=Decimal('4000.00'),
+                categorie=self.categorie,
+                image=self._photo()
+            )
+        planifier.assert_called_once_with(plat.pk)
+        
+        self.assertTrue(images.generer_variantes(plat.pk))
+        self.assertFalse(images.generer_variantes(plat.pk))
+        plat.refresh_from_db()
+        variantes = plat.variantes_image
+        self.assertEqual((variantes['largeur'], variantes['hauteur']), (600, 1000))
+        self.assertEqual(set(variantes['formats']), {'avif', 'webp', 'jpeg'})
+        self.assertEqual(list(variantes['formats']['jpeg']), ['320', '600'])
+        
+        chemin = variantes['formats']['jpeg']['600']
+        self.assertIn(variantes['empreinte'], chemin)
+        with default_storage.open(chemin) as fichier, Image.open(fichier) as variante:
+            self.assertEqual(variante.size, (600, 1000))
+            self.assertEqual(len(variante.getexif()), 0)
+        
+        html = Template(
+            '{% load images_plats %}{% image_plat plat "photo" sizes="50vw" %}'
+        ).render(Context({'plat': plat}))
+        self.assertIn('<source type="image/avif"', html)
+        self.assertIn('320w', html)
+        self.assertIn('sizes="50vw"', html)
+    
+    def test_repli_et_purge(self):
+        """Test image d'origine tant que les variantes manquent, puis purge"""
+        with mock.patch.object(images, 'planifier'):
+            plat = Plat.objects.create(
+                nom="Mafe",
+                description="Sauce arachide",
+                prix=Decimal('3500.00'),
+                categorie=self.categorie,
+                image=self._photo()
+            )
+            html = Template('{% load images_plats %}{% image_plat plat %}').render(
+                Context({'plat': plat})
+            )
+            self.assertIn(plat.image.url, html)
+            self.assertNotIn('<picture>', html)
+            
+            images.generer_variantes(plat.pk)
+            plat.refresh_from_db()
+            plat.image = None
+            plat.save()
+        images.generer_variantes(plat.pk)
+        plat.refresh_from_db()
+        self.assertEqual(plat.variantes_image, {})
+        self.assertEqual(images.purger(), 6)
+
+class SeedTests(TestCase):
+    def _charger(self):
+        call_command(
+            'seed', jours=3, tables=12, commandes_par_jour=15, graine=7,
+            lot=50, stdout=StringIO()
+        )
+        return list(Commande.objects.order_by('date_creation', 'id').values_list(
+            'table__numero', 'couverts', 'montant_total', 'date_creation', 'facture__montant_ttc'
+        ))
+    
+    def test_historique_deterministe(self):
+        """Test jeu de donnees volumineux reproductible et coherent"""
+        premier = self._charger()
+        self.assertEqual(Table.objects.count(), 12)
+        self.assertEqual(Facture.objects.count(), len(premier))
+        self.assertTrue(Reservation.objects.exists())
+        self.assertLess(
+            Commande.objects.order_by('date_creation').first().date_creation.date(),
+            timezone.localdate()
+        )
+        call_command('recalculer_totaux', '--verifier', stdout=StringIO())
+        call_command('reconstruire_ventes', '--verifier', stdout=StringIO())
+        
+        Commande.objects.all().delete()
+        Reservation.objects.all().delete()
+        self.assertEqual(self._charger(), premier)
+
+class BenchVuesTests(TestCase):
+    def test_mesure_et_comparaison(self):
+        """Test mesure d'une vue et detection des regressions"""
+        User.objects.create_user(username='admin', password='admin123')
+        self.client.login(username='admin', password='admin123')
+        Table.objects.create(numero=1, capacite=4)
+        
+        mesure = benchmarks.mesurer_vue(
+            self.client, 'get', lambda: ('/tables/', None), repetitions=2
+        )
+        self.assertEqual(mesure['statut'], 200)
+        self.assertGreater(mesure['requetes'], 0)
+        self.assertGreater(mesure['memoire_kio'], 0)
+        
+        reference = {'gestion_tables': dict(mesure)}
+        self.assertEqual(benchmarks.comparer({'gestion_tables': mesure}, reference), [])
+        
+        plus_de_requetes = dict(mesure, requetes=mesure['requetes'] + 1)
+        plus_lent = dict(mesure, temps_ms=mesure['temps_ms'] * 2 + 10)
+        self.assertEqual(len(benchmarks.comparer({'gestion_tables': plus_de_requetes}, reference)), 1)
+        self.assertEqual(len(benchmarks.comparer({'gestion_tables': plus_lent}, reference)), 1)
+        # Reference versionnee : requetes seules, temps non compares
+        requetes = {'gestion_tables': {'requetes': mesure['requetes']}}
+        self.assertEqual(benchmarks.comparer({'gestion_tables': plus_lent}, requetes), [])
+        self.assertEqual(len(benchmarks.comparer({'gestion_tables': plus_de_requetes}, requetes)), 1)
+        
+        reference['gestion_tables']['budget_requetes'] = mesure['requetes'] + 1
+        self.assertEqual(benchmarks.comparer({'gestion_tables': plus_de_requetes}, reference), [])
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='admin',
+            password='admin123',
+            is_staff=True
+        )
+        self.client.login(username='admin', password='admin123')
+        instrumentation.plus_lentes.vider()
+    
+    def test_echantillonnage(self):
+        """Test en-tete Server-Timing et liste des requetes lentes"""
+        response = self.client.get('/tables/')
+        self.assertNotIn('Server-Timing', response)
+        
+        with override_settings(INSTRUMENTATION_ECHANTILLON=1):
+            response = self.client.get('/tables/')
+        self.assertIn('sql;dur=', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+        
+        mesure, = instrumentation.plus_lentes.lister()
+        self.assertEqual(mesure['vue'], 'gestion_tables')
+        self.assertGreater(mesure['requetes'], 0)
+        self.assertGreater(mesure['templates_ms'], 0)
+        
+        response = self.client.get('/instrumentation/')
+        self.assertContains(response, '/tables/')
+        self.client.post('/instrumentation/')
+        self.assertEqual(instrumentation.plus_lentes.lister(), [])
+    
+    def test_middleware_asynchrone(self):
+        """Test mesure dans une chaine de middlewares asynchrone"""
+        async def vue(request):
+            return HttpResponse("ok")
+        
+        middleware = instrumentation.InstrumentationMiddleware(vue)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with override_settings(INSTRUMENTATION_ECHANTILLON=1):
+            response = asyncio.run(middleware(RequestFactory().get('/asynchrone/')))
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertEqual(instrumentation.plus_lentes.lister()[0]['chemin'], '/asynchrone/')
+    
+    def test_requetes_repetees(self):
+        """Test empreinte commune aux requetes ne differant que par leurs parametres"""
+        for numero in range(1, 4):
+            Table.objects.create(numero=numero, capacite=4)
+        chrono = instrumentation.ChronoSQL(empreintes=True)
+        with connection.execute_wrapper(chrono):
+            for table in Table.objects.all():
+                Table.objects.filter(pk=table.pk).exists()
+            list(Table.objects.filter(pk__in=[1, 2]))
+            list(Table.objects.filter(pk__in=[1, 2, 3]))
+        (nombre, sql), (nombre_in, _) = chrono.doublons()
+        self.assertEqual((nombre, nombre_in), (3, 2))
+        self.assertIn('restaurant_table', sql)
+    
+    def test_reserve_au_staff(self):
+        """Test page d'instrumentation refusee hors staff"""
+        User.objects.create_user(username='serveur', password='serveur123')
+        self.client.login(username='serveur', password='serveur123')
+        response = self.client.get('/instrumentation/')
+        self.assertEqual(response.status_code, 302)
+
+class InstrumentationAsgiTests(TransactionTestCase):
+    async def appeler(self, chemin, requete=''):
+        communicateur = ApplicationCommunicator(ASGIHandler(), {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'https',
+            'path': chemin,
+            'query_string': requete.encode(),
+            'headers': [(b'host', b'testserver')],
+        })
+        await communicateur.send_input({'type': 'http.request'})
+        debut = await communicateur.receive_output(10)
+        while (await communicateur.receive_output(10)).get('more_body'):
+            pass
+        return debut
+    
+    @override_settings(INSTRUMENTATION_ECHANTILLON=1)
+    def test_vue_synchrone_sous_asgi(self):
+        """Test requetes d'une vue synchrone comptees sous ASGI (thread de la vue)"""
+        Table.objects.create(numero=1, capacite=4)
+        instrumentation.plus_lentes.vider()
+        # Boucle dans un thread neuf, comme celle d'un serveur ASGI : aucune
+        # connexion n'y est encore ouverte
+        resultat = {}
+        serveur = threading.Thread(target=lambda: resultat.update(
+            debut=asyncio.run(self.appeler('/reservation/creneaux/', 'personnes=2'))
+        ))
+        serveur.start()
+        serveur.join()
+        debut = resultat['debut']
+        self.assertEqual(debut['status'], 200)
+        mesure, = instrumentation.plus_lentes.lister()
+        self.assertEqual(mesure['vue'], 'creneaux_reservation')
+        self.assertGreater(mesure['requetes'], 0)
+
+class ExportTests(TestCase):
+    def setUp(self):
+        User.objects.create_user(username='admin', password='admin123')
+        self.client.login(username='admin', password='admin123')
+        categorie = Categorie.objects.create(nom="Plats")
+        self.plat = Plat.objects.create(
+            nom="Yassa; poulet",
+            description="",
+            prix=Decimal('4500.50'),
+            categorie=categorie
+        )
+        table = Table.objects.create(numero=2, capacite=4)
+        for _ in range(3):
+            commande = Commande.objects.create(table=table)
+            ItemCommande.objects.create(commande=commande, plat=self.plat, quantite=2)
+            encaisser(commande.id, 'CARTE')
+    
+    def test_export_en_flux(self):
+        """Test export CSV et Excel des factures et commandes"""
+        jour = timezone.localdate().isoformat()
+        response = self.client.get(f'/exports/factures/?du={jour}&au={jour}')
+        self.assertTrue(response.streaming)
+        self.assertIn(f'factures_{jour}_{jour}.csv', response['Content-Disposition'])
+        lignes = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(lignes[0][0], 'numero')
+        self.assertEqual(len(lignes), 4)
+        self.assertEqual(lignes[1][7], '10621.18')
+        
+        response = self.client.get('/exports/commandes/?format=excel')
+        contenu = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(contenu.startswith('\ufeff'))
+        lignes = list(csv.reader(io.StringIO(contenu[1:]), delimiter=';'))
+        self.assertEqual(lignes[1][6], "Yassa; poulet")
+        self.assertEqual(lignes[1][8], '4500,50')
+        
+        hier = (timezone.localdate() - timedelta(days=1)).isoformat()
+        response = self.client.get(f'/exports/reservations/?au={hier}')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+        self.assertEqual(self.client.get('/exports/inconnu/').status_code, 404)
+        for jour in ('2024-02-30', '9999-12-31'):
+            self.assertEqual(self.client.get(f'/exports/factures/?au={jour}').status_code, 400)
+    
+    def test_formules_neutralisees(self):
+        """Test texte commencant comme une formule precede d'une apostrophe"""
+        Plat.objects.filter(pk=self.plat.pk).update(nom='=HYPERLINK("http://x")')
+        for format_export, separateur in (('csv', ','), ('excel', ';')):
+            contenu = ''.join(export.flux('commandes', timezone.localdate(), timezone.localdate(), format_export))
+            lignes = list(csv.reader(io.StringIO(contenu.lstrip('\ufeff')), delimiter=separateur))
+            self.assertEqual(lignes[1][6], '\'=HYPERLINK("http://x")')
+        self.assertEqual(export._cellule('-2', False), "'-2")
+        self.assertEqual(export._cellule(Decimal('-2.5'), True), '-2,5')
+    
+    def test_commande_export(self):
+        """Test commande d'export compressee"""
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier)
+        chemin = os.path.join(dossier, 'factures.csv')
+        call_command('export', 'factures', '--sortie', chemin, '--gzip', stderr=StringIO())
+        with gzip.open(chemin + '.gz', 'rt', encoding='utf-8') as fichier:
+            self.assertEqual(len(list(csv.reader(fichier))), 4)
+        for jour in ('2024-02-30', '9999-12-31'):
+            with self.assertRaises(CommandError):
+                call_command('export', 'factures', '--au', jour, '--sortie', chemin)
+
+class RequetesVuesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='admin',
+            password='admin123',
+            first_name='Awa',
+            last_name='Diop'
+        )
+        self.client.login(username='admin', password='admin123')
+        categorie = Categorie.objects.create(nom="Plats")
+        self.plats = [
+            Plat.objects.create(nom=f"Plat {i}", prix=Decimal('1500.00'), categorie=categorie)
+            for i in range(3)
+        ]
+        self.numero = 0
+    
+    def _commandes(self, nombre):
+        for _ in range(nombre):
+            self.numero += 1
+            table = Table.objects.create(numero=self.numero, capacite=4)
+            commande = Commande.objects.create(table=table, serveur=self.user)
+            ItemCommande.objects.bulk_create(
+                ItemCommande(commande=commande, plat=plat, quantite=2) for plat in self.plats
+            )
+        return commande
+    
+    def test_liste_commandes(self):
+        """Test nombre de requetes independant du nombre de commandes"""
+        self._commandes(2)
+        # Session, utilisateur, commandes (table et serveur joints), items
+        with self.assertNumQueries(4):
+            response = self.client.get('/commandes/')
+        self._commandes(10)
+        with self.assertNumQueries(4):
+            response = self.client.get('/commandes/')
+        self.assertContains(response, 'Awa Diop')
+        self.assertContains(response, '9000 FCFA')
+    
+    def test_details_et_tableau_de_bord(self):
+        """Test pages de detail et tableau de bord en requetes constantes"""
+        commande = self._commandes(6)
+        with self.assertNumQueries(4):
+            self.client.get(f'/commandes/{commande.id}/')
+        # Session, utilisateur, 4 statistiques, 2 listes recentes
+        with self.assertNumQueries(8):
+            response = self.client.get('/dashboard/')
+        self.assertEqual(len(response.context['commandes_recentes']), 5)
+        
+        facture, _ = encaisser(commande.id, 'CARTE')
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/factures/{facture.id}/')
+        self.assertContains(response, 'Awa Diop')
+    
+    def test_totaux_calcules(self):
+        """Test annotation des totaux recalcules depuis les items"""
+        commande = self._commandes(1)
+        Commande.objects.filter(pk=commande.pk).update(montant_total=0)
+        commande = Commande.objects.avec_totaux_calcules().get(pk=commande.pk)
+        self.assertEqual(commande.total(), Decimal('9000.00'))
+        self.assertEqual(commande.nombre_calcule, 3)
+
+@override_settings(
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+    AUTHENTICATION_BACKENDS=['restaurant.authentification.UtilisateurCacheBackend'],
+)
+class CacheSessionsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='admin', password='admin123')
+        self.client.login(username='admin', password='admin123')
+    
+    def test_session_et_utilisateur_en_cache(self):
+        """Test requetes authentifiees sans lecture de session ni d'utilisateur"""
+        self.client.get('/cuisine/')
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get('/cuisine/')
+        self.assertEqual(response.status_code, 200)
+        tables = ' '.join(requete['sql'] for requete in requetes.captured_queries)
+        self.assertNotIn('django_session', tables)
+        self.assertNotIn('auth_user', tables)
+    
+    def test_invalidation_utilisateur(self):
+        """Test compte desactive pris en compte malgre le cache"""
+        self.client.get('/cuisine/')
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/cuisine/')
+        self.assertEqual(response.status_code, 302)
+    
+    def test_sante_cache(self):
+        """Test sonde du cache"""
+        response = self.client.get('/sante/cache/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['caches']['default']['ok'])
+        self.assertEqual(response.json()['sessions'], 'cached_db')
+        self.assertIn('no-cache', response['Cache-Control'])
+    
+    def test_sante_cache_en_panne(self):
+        """Test sonde en erreur quand le cache ne garde rien"""
+        with override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+            SESSION_ENGINE='django.contrib.sessions.backends.db',
+        ):
+            response = self.client.get('/sante/cache/')
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()['caches']['default']['ok'])
+
+
+class SqliteTests(TransactionTestCase):
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Reglages propres a SQLite")
+    
+    def test_reglages_connexion(self):
+        """Test pragmas et mode de transaction appliques a la connexion"""
+        etat = sqlite.etat()
+        self.assertEqual(etat['journal_mode'], 'wal')
+        self.assertEqual(etat['synchronous'], 1)
+        self.assertEqual(etat['busy_timeout'], settings.SQLITE_BUSY_TIMEOUT)
+        self.assertEqual(etat['transaction_mode'], 'IMMEDIATE')
+    
+    def test_commande_optimiser(self):
+        """Test entretien periodique de la base"""
+        sortie = StringIO()
+        call_command('optimiser_sqlite', stdout=sortie)
+        self.assertIn('journal_mode       wal', sortie.getvalue())
+        self.assertIn('Base optimisee', sortie.getvalue())
+
+
+class PanierTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='admin', password='admin123')
+        self.client.login(username='admin', password='admin123')
+        categorie = Categorie.objects.create(nom="Plats")
+        self.plats = [
+            Plat.objects.create(nom=f"Plat {i}", prix=Decimal('1000.00') * (i + 1), categorie=categorie)
+            for i in range(12)
+        ]
+        self.table = Table.objects.create(numero=1, capacite=8)
+        self.commande = Commande.objects.create(table=self.table, serveur=self.user)
+        self.url = f'/commandes/{self.commande.pk}/panier/'
+    
+    def _poster(self, items):
+        return self.client.post(
+            self.url, json.dumps({'items': items}), content_type='application/json'
+        )
+    
+    def test_panier_json(self):
+        """Test ajout d'un panier en JSON et nouveau total"""
+        with self.captureOnCommitCallbacks(execute=False) as rappels:
+            response = self._poster([
+                {'plat': self.plats[0].pk, 'quantite': 2, 'notes': 'Sans piment'},
+                {'plat': self.plats[1].pk, 'quantite': 1},
+            ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Decimal(response.json()['total']), Decimal('4000.00'))
+        self.assertEqual(response.json()['nombre_items'], 2)
+        self.assertEqual(len(response.json()['items']), 2)
+        self.commande.refresh_from_db()
+        self.assertEqual(self.commande.montant_total, Decimal('4000.00'))
+        self.assertEqual(self.commande.items.get(plat=self.plats[0]).notes, 'Sans piment')
+        # Un evenement cuisine par item
+        self.assertEqual(len(rappels), 2)
+    
+    def test_requetes_constantes(self):
+        """Test nombre de requetes independant de la taille du panier"""
+        # Session, utilisateur, plats, savepoint, totaux, items, nouveau
+        # total, fin du savepoint
+        with self.assertNumQueries(8):
+            self._poster([{'plat': self.plats[0].pk, 'quantite': 1}])
+        with self.assertNumQueries(8):
+            response = self._poster([
+                {'plat': plat.pk, 'quantite': 2} for plat in self.plats
+            ])
+        self.assertEqual(response.json()['nombre_items'], 13)
+    
+    def test_panier_invalide(self):
+        """Test panier refuse en entier"""
+        self.plats[1].disponible = False
+        self.plats[1].save()
+        for items in (
+            [{'plat': self.plats[0].pk}, {'plat': 9999}],
+            [{'plat': self.plats[0].pk}, {'plat': self.plats[1].pk}],
+            [{'plat': self.plats[0].pk, 'quantite': 0}],
+            [{'plat': 'un'}],
+            [],
+        ):
+            response = self._poster(items)
+            self.assertEqual(response.status_code, 400)
+            self.assertTrue(response.json()['erreurs'])
+        self.assertFalse(self.commande.items.exists())
+        self.commande.refresh_from_db()
+        self.assertEqual(self.commande.montant_total, Decimal('0.00'))
+    
+    def test_commande_payee(self):
+        """Test panier refuse sur une commande payee"""
+        Commande.objects.filter(pk=self.commande.pk).update(statut='PAYEE')
+        response = self._poster([{'plat': self.plats[0].pk}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.commande.items.exists())
+    
+    def test_panier_formulaire(self):
+        """Test ajout par le formulaire multiple, lignes vides ignorees"""
+        donnees = {
+            'panier-TOTAL_FORMS': 3,
+            'panier-INITIAL_FORMS': 0,
+            'panier-0-plat': self.plats[0].pk,
+            'panier-0-quantite': 3,
+            'panier-1-plat': self.plats[2].pk,
+            'panier-1-quantite': 1,
+            'panier-2-plat': '',
+            'panier-2-quantite': 1,
+        }
+        response = self.client.post(self.url, donnees)
+        self.assertRedirects(response, f'/commandes/{self.commande.pk}/items/')
+        self.commande.refresh_from_db()
+        self.assertEqual(self.commande.montant_total, Decimal('6000.00'))
+        self.assertEqual(self.commande.nombre_items, 2)
+        
+        donnees['panier-0-plat'] = ''
+        donnees['panier-0-quantite'] = 4
+        response = self.client.post(self.url, donnees)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Choisissez un plat')
+        self.assertEqual(self.commande.items.count(), 2)
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='admin', password='admin123')
+        self.client.login(username='admin', password='admin123')
+        self.categorie = Categorie.objects.create(nom="Plats")
+        self.plats = [
+            Plat.objects.create(nom=f"Plat {i}", prix=Decimal('1250.50'), categorie=self.categorie)
+            for i in range(3)
+        ]
+        self.commandes = []
+        for numero in range(1, 6):
+            table = Table.objects.create(numero=numero, capacite=4)
+            commande = Commande.objects.create(table=table, serveur=self.user)
+            ItemCommande.objects.bulk_create(
+                ItemCommande(commande=commande, plat=plat, quantite=2) for plat in self.plats
+            )
+            self.commandes.append(commande)
+    
+    def test_liste_champs_et_depliage(self):
+        """Test champs demandes, relations depliees, requetes constantes"""
+        # Session, utilisateur, commandes (table jointe), items (plat joint)
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                '/api/commandes/?fields=id,total&expand=table,items.plat'
+            )
+        self.assertEqual(response.status_code, 200)
+        commande = response.json()['resultats'][0]
+        self.assertEqual(set(commande), {'id', 'total', 'table', 'items'})
+        self.assertEqual(commande['id'], self.commandes[-1].pk)
+        self.assertEqual(commande['total'], '7503.00')
+        self.assertEqual(commande['table']['numero'], 5)
+        self.assertEqual(len(commande['items']), 3)
+        self.assertEqual(commande['items'][0]['plat']['prix'], '1250.50')
+    
+    def test_pagination_curseur(self):
+        """Test parcours complet des pages par curseur"""
+        ids, url = [], '/api/commandes/?fields=id&limite=2'
+        while url:
+            page = self.client.get(url).json()
+            ids += [commande['id'] for commande in page['resultats']]
+            suivant = page['curseur_suivant']
+            url = f'/api/commandes/?fields=id&limite=2&curseur={suivant}' if suivant else None
+        self.assertEqual(ids, [commande.pk for commande in reversed(self.commandes)])
+        
+        page = self.client.get('/api/tables/?limite=2').json()
+        suite = self.client.get(f"/api/tables/?limite=2&curseur={page['curseur_suivant']}").json()
+        self.assertEqual(len(suite['resultats']), 2)
+        self.assertLess(suite['resultats'][0]['id'], page['resultats'][-1]['id'])
+    
+    def test_detail_et_filtres(self):
+        """Test detail d'un objet et filtres"""
+        commande = self.commandes[0]
+        response = self.client.get(f'/api/commandes/{commande.pk}/?expand=items')
+        self.assertEqual(response.json()['id'], commande.pk)
+        self.assertEqual(len(response.json()['items']), 3)
+        self.assertEqual(self.client.get('/api/commandes/999/').status_code, 404)
+        
+        response = self.client.get(f'/api/items/?commande={commande.pk}')
+        self.assertEqual(len(response.json()['resultats']), 3)
+        self.assertEqual(self.client.get('/api/items/?commande=abc').status_code, 400)
+        self.assertEqual(self.client.get('/api/commandes/?fields=inconnu').status_code, 400)
+        self.assertEqual(self.client.get('/api/commandes/?expand=serveur').status_code, 400)
+        for jour in ('2024-02-30', '9999-12-31'):
+            self.assertEqual(self.client.get(f'/api/factures/?date={jour}').status_code, 400)
+        self.assertEqual(self.client.get('/api/inconnue/').status_code, 404)
+    
+    def test_etag(self):
+        """Test requete conditionnelle, sans requete SQL pour le menu"""
+        response = self.client.get('/api/commandes/')
+        etag = response['ETag']
+        response = self.client.get('/api/commandes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.commandes[0].statut = 'SERVIE'
+        self.commandes[0].save()
+        response = self.client.get('/api/commandes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        
+        etag = self.client.get('/api/plats/')['ETag']
+        # Session et utilisateur seulement
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/plats/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.plats[0].prix = Decimal('900.00')
+        self.plats[0].save()
+        response = self.client.get('/api/plats/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+    
+    def test_compression(self):
+        """Test reponse compressee en gzip"""
+        response = self.client.get('/api/commandes/?expand=items', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        contenu = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(contenu['resultats']), 5)
+    
+    def test_authentification(self):
+        """Test API reservee aux utilisateurs connectes"""
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/plats/').status_code, 401)
+
+
+APPELS_TACHES = []
+
+
+@taches.tache()
+def tache_test(valeur):
+    APPELS_TACHES.append(valeur)
+
+
+@taches.tache(file='critique', priorite=5)
+def tache_urgente(valeur):
+    APPELS_TACHES.append(valeur)
+
+
+@taches.tache(tentatives=2)
+def tache_en_panne():
+    raise RuntimeError("panne")
+
+
+def fonction_non_declaree():
+    APPELS_TACHES.append('interdit')
+
+
+class TachesTests(TestCase):
+    def setUp(self):
+        APPELS_TACHES.clear()
+    
+    def test_cle_idempotente(self):
+        """Test une seule tache par cle, meme apres execution"""
+        premiere = taches.enfiler(tache_test, cle='unique', valeur=1)
+        seconde = taches.enfiler(tache_test, cle='unique', valeur=2)
+        self.assertEqual(premiere.pk, seconde.pk)
+        self.assertEqual(taches.executer_en_attente(), 1)
+        taches.enfiler(tache_test, cle='unique', valeur=3)
+        self.assertEqual(taches.executer_en_attente(), 0)
+        self.assertEqual(APPELS_TACHES, [1])
+    
+    def test_priorite_et_files(self):
+        """Test ordre de prise et travailleur dedie a une file"""
+        taches.enfiler(tache_test, valeur='defaut')
+        taches.enfiler(tache_urgente, valeur='critique')
+        taches.enfiler(tache_test, delai=timedelta(hours=1), valeur='plus tard')
+        
+        self.assertEqual(taches.executer_en_attente(files=['lente']), 0)
+        self.assertEqual(taches.executer_en_attente(), 2)
+        self.assertEqual(APPELS_TACHES, ['critique', 'defaut'])
+        self.assertEqual(Tache.objects.filter(statut='TERMINEE').count(), 2)
+        self.assertEqual(Tache.objects.get(statut='EN_ATTENTE').arguments, {'valeur': 'plus tard'})
+    
+    def test_nouvel_essai_puis_echec(self):
+        """Test erreur replanifiee avec delai puis abandonnee"""
+        tache = taches.enfiler(tache_en_panne)
+        avant = timezone.now()
+        with self.assertLogs('restaurant.taches', 'ERROR'):
+            self.assertEqual(taches.executer_en_attente(), 1)
+        tache.refresh_from_db()
+        self.assertEqual((tache.statut, tache.tentatives), ('EN_ATTENTE', 1))
+        self.assertIn('RuntimeError: panne', tache.derniere_erreur)
+        self.assertGreaterEqual(tache.disponible_a, avant + timedelta(seconds=7))
+        
+        Tache.objects.filter(pk=tache.pk).update(disponible_a=timezone.now())
+        with self.assertLogs('restaurant.taches', 'ERROR'):
+            taches.executer_en_attente()
+        tache.refresh_from_db()
+        self.assertEqual((tache.statut, tache.tentatives), ('ECHEC', 2))
+        self.assertIsNotNone(tache.date_fin)
+        self.assertLessEqual(taches.delai_nouvel_essai(30), timedelta(seconds=taches.DELAI_MAX * 1.25))
+    
+    def test_bail_expire(self):
+        """Test reprise d'une tache dont le travailleur est mort"""
+        tache = taches.enfiler(tache_test, valeur='reprise')
+        self.assertEqual(len(taches.reserver('mort')), 1)
+        self.assertEqual(taches.executer_en_attente(), 0)
+        
+        Tache.objects.filter(pk=tache.pk).update(bail=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(taches.reprendre_expirees(), 1)
+        self.assertEqual(taches.executer_en_attente(), 1)
+        self.assertEqual(APPELS_TACHES, ['reprise'])
+        self.assertEqual(Tache.objects.get(pk=tache.pk).tentatives, 2)
+    
+    def test_fonction_non_declaree(self):
+        """Test seules les fonctions @tache s'executent"""
+        with self.assertRaises(ValueError):
+            taches.enfiler(fonction_non_declaree)
+        Tache.objects.create(nom='restaurant.tests.fonction_non_declaree', tentatives_max=1)
+        with self.assertLogs('restaurant.taches', 'ERROR'):
+            taches.executer_en_attente()
+        self.assertEqual(Tache.objects.get().statut, 'ECHEC')
+        self.assertEqual(APPELS_TACHES, [])
+    
+    def test_confirmation_reservation(self):
+        """Test e-mail de confirmation mis en file avec la reservation"""
+        table = Table.objects.create(numero=1, capacite=4)
+        reservation = reserver(Reservation(
+            client_nom="Awa",
+            client_telephone="90000000",
+            client_email="awa@example.com",
+            table=table,
+            nombre_personnes=3,
+            date_reservation=timezone.now() + timedelta(days=1)
+        ))
+        tache = Tache.objects.get()
+        self.assertEqual(tache.file, 'critique')
+        self.assertEqual(tache.cle, f'confirmation-reservation:{reservation.pk}')
+        self.assertEqual(len(mail.outbox), 0)
+        
+        taches.executer_en_attente()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['awa@example.com'])
+        self.assertIn("Table 1, 3 personnes", mail.outbox[0].body)
+        
+        reserver(Reservation(
+            client_nom="Kofi",
+            client_telephone="91000000",
+            table=Table.objects.create(numero=2, capacite=4),
+            nombre_personnes=2,
+            date_reservation=timezone.now() + timedelta(days=1)
+        ))
+        self.assertEqual(Tache.objects.count(), 1)
+    
+    def test_images_par_la_file(self):
+        """Test variantes d'image planifiees dans la file lente"""
+        categorie = Categorie.objects.create(nom="Plats")
+        plat = Plat.objects.create(nom="Alloco", prix=Decimal('1500.00'), categorie=categorie)
+        images.planifier(plat.pk)
+        tache = Tache.objects.get()
+        self.assertEqual((tache.nom, tache.file), ('restaurant.images.generer_variantes', 'lente'))
+        self.assertEqual(tache.arguments, {'plat_id': plat.pk})
+        self.assertEqual(taches.executer_en_attente(), 1)
+        self.assertEqual(Tache.objects.get().statut, 'TERMINEE')
+
+
+class RunworkerTests(TransactionTestCase):
+    def test_une_fois(self):
+        """Test travailleurs en threads, arret quand la file est vide"""
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            self.addCleanup(signal.signal, signum, signal.getsignal(signum))
+        APPELS_TACHES.clear()
+        for valeur in range(5):
+            taches.enfiler(tache_test, valeur=valeur)
+        
+        sortie = StringIO()
+        call_command('runworker', '--une-fois', '--threads', '2', stdout=sortie)
+        self.assertIn("5 tache(s) executee(s)", sortie.getvalue())
+        self.assertEqual(sorted(APPELS_TACHES), [0, 1, 2, 3, 4])
+        self.assertEqual(Tache.objects.filter(statut='TERMINEE').count(), 5)
+        
+        with self.assertRaises(CommandError):
+            call_command('runworker', '--files', 'inconnue', stdout=StringIO())
+    
+    @override_settings(TACHES_ATTENTE=0)
+    def test_erreur_de_base(self):
+        """Test travailleur qui survit a une erreur de base"""
+        APPELS_TACHES.clear()
+        taches.enfiler(tache_test, valeur=1)
+        arret = threading.Event()
+        reserver = taches.reserver
+        appels = []
+        
+        def reserver_instable(travailleur, files):
+            appels.append(travailleur)
+            if len(appels) == 1:
+                raise OperationalError("database is locked")
+            if len(appels) == 3:
+                arret.set()
+            return reserver(travailleur, files)
+        
+        with mock.patch.object(taches, 'reserver', reserver_instable), \
+                self.assertLogs('restaurant.taches', 'ERROR'):
+            self.assertEqual(taches.travailler(arret=arret), 1)
+        self.assertEqual(APPELS_TACHES, [1])
+
+
+class RecusTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        reglages = override_settings(MEDIA_ROOT=self.media)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.user = User.objects.create_user(username='admin', password='admin123')
+        self.client.login(username='admin', password='admin123')
+        categorie = Categorie.objects.create(nom="Plats")
+        self.plats = [
+            Plat.objects.create(nom="Crème brûlée (maison)", prix=Decimal('1500.00'), categorie=categorie),
+            Plat.objects.create(nom="Poulet yassa " * 6, prix=Decimal('4250.00'), categorie=categorie),
+        ]
+        self.factures = []
+        for numero in range(1, 4):
+            commande = Commande.objects.create(table=Table.objects.create(numero=numero, capacite=4))
+            for plat in self.plats:
+                ItemCommande.objects.create(commande=commande, plat=plat, quantite=numero)
+            self.factures.append(encaisser(commande.pk, 'CARTE')[0])
+    
+    def verifier_pdf(self, contenu, pages):
+        self.assertTrue(contenu.startswith(b'%PDF-1.4'))
+        self.assertTrue(contenu.endswith(b'%EOF\n'))
+        xref = int(contenu.rsplit(b'startxref\n', 1)[1].split(b'\n')[0])
+        self.assertTrue(contenu[xref:].startswith(b'xref'))
+        entrees = contenu[xref:].split(b'\n')[3:]
+        for numero, entree in enumerate(entrees[:pages * 2 + 4], 1):
+            position = int(entree[:10])
+            self.assertTrue(contenu[position:].startswith(b'%d 0 obj' % numero))
+        self.assertIn(b'/Count %d' % pages, contenu)
+    
+    def test_recu_facture(self):
+        """Test recu PDF d'une facture, rendu une seule fois"""
+        facture = self.factures[1]
+        response = self.client.get(f'/factures/{facture.id}/recu.pdf')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn(f'recu-{facture.numero_facture}.pdf', response['Content-Disposition'])
+        contenu = b''.join(response.streaming_content)
+        self.verifier_pdf(contenu, 1)
+        
+        flux = zlib.decompress(contenu.split(b'stream\n', 1)[1].split(b'\nendstream', 1)[0])
+        self.assertIn(b'(Cr\xe8me br\xfbl\xe9e \\(maison\\))', flux)
+        self.assertIn(b'(2 x 1500 FCFA)', flux)
+        self.assertIn(b'(TOTAL TTC)', flux)
+        self.assertIn(f'({facture.montant_ttc:.0f} FCFA)'.encode(), flux)
+        self.assertIn(b'...)', flux)
+        
+        with mock.patch.object(recus, 'rendre') as rendre:
+            response = self.client.get(f'/factures/{facture.id}/recu.pdf')
+        self.assertEqual(b''.join(response.streaming_content), contenu)
+        rendre.assert_not_called()
+        self.assertEqual(self.client.get('/factures/999/recu.pdf').status_code, 404)
+    
+    def test_recu_mis_en_file_a_l_encaissement(self):
+        """Test rendu anticipe par la file de taches"""
+        self.assertEqual(
+            set(Tache.objects.values_list('cle', flat=True)),
+            {f'recu:{facture.pk}' for facture in self.factures}
+        )
+        self.assertEqual(taches.executer_en_attente(files=['lente']), 3)
+        chemin, rendu = recus.recu_facture(self.factures[0].pk)
+        self.assertFalse(rendu)
+        self.assertTrue(default_storage.exists(chemin))
+    
+    def test_journee(self):
+        """Test lot du jour : lecture en deux requetes, pool de processus"""
+        debut, fin = bornes_jour(timezone.localdate())
+        with self.assertNumQueries(2):
+            donnees = recus.lire(date_emission__gte=debut, date_emission__lt=fin)
+        self.assertEqual(
+            [recu['numero'] for recu in donnees],
+            [facture.numero_facture for facture in self.factures]
+        )
+        
+        seul = recus.rendre(donnees, processus=1)
+        self.verifier_pdf(seul, 3)
+        with mock.patch.object(recus, 'SEUIL_PROCESSUS', 0), \
+                mock.patch.object(recus, 'TAILLE_PAQUET', 2):
+            self.assertEqual(recus.rendre(donnees, processus=2), seul)
+        
+        sortie = os.path.join(self.media, 'jour.pdf')
+        call_command('imprimer_recus', '--sortie', sortie, stdout=StringIO())
+        with open(sortie, 'rb') as fichier:
+            self.assertEqual(fichier.read(), seul)
+        resultat = StringIO()
+        call_command('imprimer_recus', stdout=resultat)
+        self.assertIn("3 recus", resultat.getvalue())
+        self.assertIn("deja rendus", resultat.getvalue())
+        
+        call_command('imprimer_recus', '--jour', '2020-01-01', stdout=resultat)
+        self.assertIn("Aucune facture", resultat.getvalue())
+        for jour in ('2024-02-30', '9999-12-31'):
+            with self.assertRaises(CommandError):
+                call_command('imprimer_recus', '--jour', jour, stdout=StringIO())
+        call_command('imprimer_recus', '--differe', stdout=StringIO())
+        self.assertTrue(Tache.objects.filter(nom='restaurant.recus.imprimer_journee').exists())
+    
+    def test_chasses(self):
+        """Test metriques : accents, alignement et troncature"""
+        self.assertEqual(pdf.largeur('e', 'F1', 10), pdf.largeur('\u00e9', 'F1', 10))
+        self.assertEqual(pdf.largeur('1500', 'F2', 10), 4 * 5.56)
+        self.assertLessEqual(pdf.largeur(pdf.tronquer("x" * 200, 50), 'F1', 10), 50)
+
+
+class PrixTests(TestCase):
+    def setUp(self):
+        self.categorie = Categorie.objects.create(nom="Plats")
+        self.plat = Plat.objects.create(nom="Attieke", prix=Decimal('2000.00'), categorie=self.categorie)
+        self.table = Table.objects.create(numero=1, capacite=4)
+    
+    def changer_prix(self, valeur):
+        self.plat.prix = Decimal(valeur)
+        self.plat.save()
+    
+    @override_settings(CACHE_PARTAGE=True)
+    def test_historique(self):
+        """Test periodes de prix ouvertes et fermees par les changements"""
+        self.plat.disponible = False
+        self.plat.save()
+        self.changer_prix('2500.00')
+        
+        periodes = list(self.plat.historique_prix.order_by('version'))
+        self.assertEqual([(p.version, p.prix) for p in periodes], [(1, 2000), (2, 2500)])
+        self.assertEqual(periodes[0].valide_au, periodes[1].valide_du)
+        self.assertIsNone(periodes[1].valide_au)
+        self.assertEqual(prix.tarif(self.plat.pk), (Decimal('2500.00'), 2, "Attieke"))
+    
+    @override_settings(CACHE_PARTAGE=True)
+    def test_prix_sans_requete(self):
+        """Test prix de l'item lu dans la carte en memoire"""
+        commande = Commande.objects.create(table=self.table)
+        prix.carte()
+        with CaptureQueriesContext(connection) as requetes:
+            item = ItemCommande(commande_id=commande.pk, plat_id=self.plat.pk, quantite=2)
+            item.save()
+            ItemCommande.objects.bulk_create([
+                ItemCommande(commande_id=commande.pk, plat_id=self.plat.pk, quantite=1)
+            ])
+        self.assertFalse([r for r in requetes if 'restaurant_plat' in r['sql']])
+        self.assertEqual(item.prix_unitaire, Decimal('2000.00'))
+        
+        self.changer_prix('2200.00')
+        item = ItemCommande.objects.create(commande_id=commande.pk, plat_id=self.plat.pk)
+        self.assertEqual(item.prix_unitaire, Decimal('2200.00'))
+    
+    @override_settings(CACHE_PARTAGE=False)
+    def test_prix_lu_en_base_sans_cache_partage(self):
+        """Test cache par worker : prix change par un autre processus"""
+        commande = Commande.objects.create(table=self.table)
+        prix.carte()
+        # Autre worker : sa version du menu n'est pas visible ici
+        Plat.objects.filter(pk=self.plat.pk).update(prix=Decimal('500.00'))
+        item = ItemCommande.objects.create(commande_id=commande.pk, plat_id=self.plat.pk)
+        self.assertEqual(item.prix_unitaire, Decimal('500.00'))
+        self.assertIsNone(prix.tarif(self.plat.pk))
+    
+    def test_ventes_par_tarif(self):
+        """Test rattachement des items au tarif en vigueur, en une requete"""
+        avant = Commande.objects.create(table=self.table)
+        ItemCommande.objects.create(commande=avant, plat=self.plat, quantite=2)
+        ItemCommande.objects.create(
+            commande=avant, plat=self.plat, quantite=1, prix_unitaire=Decimal('1000.00')
+        )
+        self.changer_prix('3000.00')
+        apres = Commande.objects.create(table=self.table)
+        ItemCommande.objects.create(commande=apres, plat=self.plat, quantite=3)
+        
+        debut, fin = bornes_jour(timezone.localdate())
+        with self.assertNumQueries(1):
+            lignes = list(prix.ventes_par_tarif(debut, fin))
+        self.assertEqual(
+            [
+                (l['tarif__version'], l['quantite_vendue'], l['montant'], l['montant_tarif'])
+                for l in lignes
+            ],
+            [(1, 3, Decimal('5000.00'), Decimal('6000.00')), (2, 3, Decimal('9000.00'), Decimal('9000.00'))]
+        )
+        
+        contenu = ''.join(export.flux('tarifs', timezone.localdate(), timezone.localdate()))
+        self.assertIn('Attieke,2,3000.00', contenu)
+
+
+class AnalysesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.serveur = User.objects.create_user('awa', password='x', first_name='Awa', is_staff=True)
+        entrees = Categorie.objects.create(nom="Entrees")
+        plats = Categorie.objects.create(nom="Plats")
+        self.salade = Plat.objects.create(nom="Salade", prix=Decimal('1000.00'), categorie=entrees)
+        self.poulet = Plat.objects.create(nom="Poulet", prix=Decimal('3000.00'), categorie=plats)
+        self.table = Table.objects.create(numero=1, capacite=4)
+        self.aujourd_hui = timezone.localdate()
+        self.hier = self.aujourd_hui - timedelta(days=1)
+    
+    def facturer(self, items, quand=None, duree=timedelta(minutes=40)):
+        commande = Commande.objects.create(table=self.table, serveur=self.serveur, couverts=2)
+        for plat, quantite in items:
+            ItemCommande.objects.create(commande=commande, plat=plat, quantite=quantite)
+        facture, _ = encaisser(commande.pk, 'ESPECE')
+        if quand is not None:
+            # update() : sans signal, comme une correction faite en base
+            Facture.objects.filter(pk=facture.pk).update(date_emission=quand)
+            Commande.objects.filter(pk=commande.pk).update(date_creation=quand - duree)
+        return facture
+    
+    def test_rapport(self):
+        """Test cumuls par plat, categorie, serveur, service et table"""
+        midi_hier = timezone.make_aware(datetime.combine(self.hier, time(12, 30)))
+        self.facturer([(self.salade, 2), (self.poulet, 1)], quand=midi_hier)
+        self.facturer([(self.poulet, 2)])
+        
+        rapport = analyses.rapport(self.hier, self.aujourd_hui)
+        self.assertEqual(rapport['jours'], 2)
+        self.assertEqual(rapport['totaux']['factures'], 2)
+        self.assertEqual(rapport['totaux']['couverts'], 4)
+        self.assertEqual(rapport['totaux']['montant_ht'], Decimal('11000.00'))
+        self.assertEqual(rapport['totaux']['ticket_moyen'], Decimal('5500.00'))
+        self.assertEqual(
+            [(l['nom'], l['quantite'], l['montant']) for l in rapport['plats']],
+            [("Poulet", 3, Decimal('9000.00')), ("Salade", 2, Decimal('2000.00'))]
+        )
+        self.assertEqual(
+            [(l['nom'], l['montant']) for l in rapport['categories']],
+            [("Plats", Decimal('9000.00')), ("Entrees", Decimal('2000.00'))]
+        )
+        self.assertEqual(
+            [(l['nom'], l['factures'], l['montant']) for l in rapport['serveurs']],
+            [("Awa", 2, Decimal('11000.00'))]
+        )
+        midi = rapport['services'][0]
+        self.assertEqual((midi['nom'], midi['factures'], midi['montant']), ("Midi", 1, Decimal('5000.00')))
+        self.assertIn({'heure': 12, 'factures': 1, 'couverts': 2, 'montant': Decimal('5000.00'),
+                       'part': 45.5}, rapport['heures'])
+        self.assertEqual(rapport['jours_semaine'][self.hier.weekday()]['factures'], 1)
+        self.assertEqual(rapport['tables'][0]['commandes'], 2)
+        self.assertEqual(rapport['tables'][0]['rotation'], 1)
+    
+    def test_cache_jours_clos(self):
+        """Test jours clos relus du cache, oublies quand une facture change"""
+        midi_hier = timezone.make_aware(datetime.combine(self.hier, time(12, 30)))
+        self.facturer([(self.salade, 1)], quand=midi_hier)
+        analyses.rapport(self.hier, self.hier)
+        
+        # Le jour clos ne coute plus que la lecture des libelles
+        with CaptureQueriesContext(connection) as requetes:
+            analyses.rapport(self.hier, self.hier)
+        self.assertFalse([r for r in requetes if 'restaurant_facture' in r['sql']])
+        
+        facture = self.facturer([(self.poulet, 1)], quand=midi_hier)
+        self.assertEqual(analyses.rapport(self.hier, self.hier)['totaux']['factures'], 1)
+        facture.refresh_from_db()
+        facture.save()
+        self.assertEqual(analyses.rapport(self.hier, self.hier)['totaux']['factures'], 2)
+    
+    def test_reservations(self):
+        """Test reservations par statut et taux d'annulation"""
+        demain = timezone.now() + timedelta(days=1)
+        for statut in ('CONFIRMEE', 'ANNULEE'):
+            Reservation.objects.create(
+                client_nom="Kofi", client_telephone="90000000", table=self.table,
+                nombre_personnes=3, date_reservation=demain, statut=statut
+            )
+        rapport = analyses.rapport(self.aujourd_hui, timezone.localdate(demain))
+        self.assertEqual(rapport['reservations']['nombre'], 2)
+        self.assertEqual(rapport['reservations']['taux_annulation'], 50)
+    
+    def test_reservation_deplacee(self):
+        """Test deplacement d'une reservation : les deux jours sont oublies"""
+        avant_hier = self.hier - timedelta(days=1)
+        Reservation.objects.create(
+            client_nom="Kofi", client_telephone="90000000", table=self.table, nombre_personnes=3,
+            date_reservation=timezone.make_aware(datetime.combine(avant_hier, time(20, 0)))
+        )
+        self.assertEqual(analyses.rapport(avant_hier, avant_hier)['reservations']['nombre'], 1)
+        self.assertEqual(analyses.rapport(self.hier, self.hier)['reservations']['nombre'], 0)
+        
+        reservation = Reservation.objects.get()
+        reservation.date_reservation += timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation.save()
+        self.assertEqual(analyses.rapport(avant_hier, avant_hier)['reservations']['nombre'], 0)
+        self.assertEqual(analyses.rapport(self.hier, self.hier)['reservations']['nombre'], 1)
+    
+    def test_vue(self):
+        """Test page des analyses reservee au staff"""
+        self.facturer([(self.poulet, 1)])
+        self.client.login(username='awa', password='x')
+        response = self.client.get('/analyses/', {'du': self.hier.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Poulet")
+        
+        for jour in ('2024-02-30', '9999-12-31'):
+            self.assertEqual(self.client.get('/analyses/', {'au': jour}).status_code, 400)
+        response = self.client.get('/analyses/', {'du': '2000-01-01', 'au': '2010-12-31'})
+        self.assertEqual(response.context['rapport']['du'], datetime(2009, 12, 31).date())
+        self.assertEqual(response.context['rapport']['jours'], analyses.PERIODE_MAX)
+        
+        User.objects.create_user('serveur', password='x')
+        self.client.login(username='serveur', password='x')
+        self.assertEqual(self.client.get('/analyses/').status_code, 302)
+
+class OccupationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username='admin', password='admin123')
+        self.client.login(username='admin', password='admin123')
+        categorie = Categorie.objects.create(nom="Plats")
+        self.plat = Plat.objects.create(nom="Riz gras", prix=Decimal('2500.00'), categorie=categorie)
+        self.table = Table.objects.create(numero=7, capacite=4)
+        self.autre = Table.objects.create(numero=8, capacite=2)
+    
+    def test_commande_et_encaissement(self):
+        """Test occupation ouverte par la commande, fermee a la facture"""
+        self.client.post(f'/tables/{self.table.id}/commande/', {'couverts': 2})
+        commande = Commande.objects.get(table=self.table)
+        ouverte = OccupationTable.objects.get(table=self.table)
+        self.assertEqual((ouverte.commande, ouverte.origine, ouverte.fin), (commande, 'COMMANDE', None))
+        self.table.refresh_from_db()
+        self.assertFalse(self.table.disponible)
+        
+        ItemCommande.objects.create(commande=commande, plat=self.plat)
+        facture, _ = encaisser(commande.pk, 'CARTE')
+        ouverte.refresh_from_db()
+        self.assertEqual(ouverte.fin, facture.date_emission)
+        self.table.refresh_from_db()
+        self.assertTrue(self.table.disponible)
+    
+    def test_basculer(self):
+        """Test changement de statut manuel journalise"""
+        self.client.get(f'/tables/{self.table.id}/toggle/')
+        self.client.get(f'/tables/{self.table.id}/toggle/')
+        self.client.get(f'/tables/{self.table.id}/toggle/')
+        self.assertEqual(
+            [(o.origine, o.fin is None) for o in OccupationTable.objects.order_by('pk')],
+            [('MANUELLE', False), ('MANUELLE', True)]
+        )
+        self.table.refresh_from_db()
+        self.assertFalse(self.table.disponible)
+        # Une table deja ouverte n'a qu'une occupation en cours
+        self.assertEqual(occupation.ouvrir(self.table.pk).origine, 'MANUELLE')
+        self.assertEqual(OccupationTable.objects.filter(fin=None).count(), 1)
+    
+    def test_etat_salle_en_cache(self):
+        """Test etat courant servi par le cache, oublie a chaque changement"""
+        occupation.etat_salle()
+        with self.assertNumQueries(0):
+            etat = occupation.etat_salle()
+        self.assertEqual([t['disponible'] for t in etat], [True, True])
+        
+        ouverte = occupation.ouvrir(self.autre.pk)
+        etat = occupation.etat_salle()
+        self.assertEqual([t['disponible'] for t in etat], [True, False])
+        self.assertEqual(etat[1]['depuis'], ouverte.debut)
+        response = self.client.get('/tables/')
+        self.assertContains(response, 'depuis')
+    
+    def test_chronologie(self):
+        """Test occupations d'une soiree pour toutes les tables, en une requete"""
+        jour = timezone.localdate() - timedelta(days=1)
+        debut, fin = occupation.soiree(jour)
+        heure = lambda h, m=0: debut + timedelta(hours=h, minutes=m)
+        for table, de, a in (
+            (self.table, heure(-3), heure(-2)),  # Midi : hors de la soiree
+            (self.table, heure(-1), heure(0, 30)),
+            (self.table, heure(1), heure(2)),
+            (self.table, heure(1, 30), heure(2, 30)),  # Chevauchement compte une fois
+            (self.autre, heure(2), None),
+        ):
+            OccupationTable.objects.create(table=table, debut=de, fin=a)
+        
+        occupation.etat_salle()
+        with self.assertNumQueries(1):
+            tables = occupation.chronologie(debut, fin, maintenant=heure(3))
+        self.assertEqual([len(t['occupations']) for t in tables], [3, 1])
+        self.assertEqual([t['minutes'] for t in tables], [120, 60])
+        self.assertIn('occupation_fin_idx', occupation.occupations(debut, fin).explain())
+        
+        response = self.client.get('/tables/chronologie/', {'date': jour.isoformat()})
+        donnees = response.json()
+        self.assertEqual(donnees['date'], jour.isoformat())
+        self.assertEqual([t['numero'] for t in donnees['tables']], [7, 8])
+        self.assertIsNone(donnees['tables'][1]['occupations'][0]['fin'])
+        for jour in ('2024-02-30', '9999-12-31'):
+            response = self.client.get('/tables/chronologie/', {'date': jour})
+            self.assertEqual(response.status_code, 400)
+
+class FluxCuisineTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='cuisinier',
+            password='password123'
+        )
+        categorie = Categorie.objects.create(nom="Plats")
+        self.plat = Plat.objects.create(
+            nom="Poulet braisé",
+            description="Poulet grillé",
+            prix=Decimal('5000.00'),
+            categorie=categorie
+        )
+        self.table = Table.objects.create(numero=7, capacite=4)
+    
+    def test_signaux_publient_apres_commit(self):
+        """Test evenements de nouvel item et de changement de statut"""
+        bus = evenements.get_bus()
+        with mock.patch.object(bus, 'publier') as publier:
+            with self.captureOnCommitCallbacks(execute=True):
+                commande = Commande.objects.create(table=self.table)
+                ItemCommande.objects.create(commande=commande, plat=self.plat, quantite=2)
+            self.client.login(username='cuisinier', password='password123')
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(f'/commandes/{commande.id}/statut/')
+        
+        types = [(appel.args[0]['type'], appel.args[0].get('statut')) for appel in publier.call_args_list]
+        self.assertEqual(types, [('commande', 'EN_COURS'), ('item', None), ('commande', 'PRETE')])
+        self.assertEqual(publier.call_args_list[1].args[0]['plat'], "Poulet braisé")
+    
+    def test_redirection_apres_statut(self):
+        """Test 'suivant' limite aux URL du site"""
+        commande = Commande.objects.create(table=self.table)
+        self.client.login(username='cuisinier', password='password123')
+        url = f'/commandes/{commande.id}/statut/'
+        response = self.client.post(url, {'suivant': '/commandes/'})
+        self.assertRedirects(response, '/commandes/', fetch_redirect_response=False)
+        for externe in ('https://exemple.com/', '//exemple.com/'):
+            response = self.client.post(url, {'suivant': externe})
+            self.assertRedirects(response, '/cuisine/', fetch_redirect_response=False)
+    
+    async def test_flux_server_sent_events(self):
+        """Test reception d'un evenement publie sur le flux SSE"""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/cuisine/flux/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        
+        flux = aiter(response.streaming_content)
+        self.assertEqual(await anext(flux), b'retry: 3000\n\n')
+        
+        suivant = asyncio.ensure_future(anext(flux))
+        bus = evenements.get_bus()
+        while not bus.nombre_abonnes():
+            await asyncio.sleep(0.01)
+        await asyncio.to_thread(bus.publier, {'type': 'commande', 'id': 1, 'statut': 'PRETE'})
+        
+        message = (await asyncio.wait_for(suivant, 5)).decode()
+        self.assertTrue(message.startswith('event: commande\n'))
+        self.assertIn('"statut": "PRETE"', message)
+        await flux.aclose()
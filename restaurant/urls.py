@@ -5,7 +5,11 @@ urlpatterns = [
     # Pages publiques
     path('', views.index, name='index'),
     path('menu/', views.menu, name='menu'),
+    path('menu/recherche/', views.recherche_plats, name='recherche_plats'),
     path('reservation/', views.reservation, name='reservation'),
+    path('reservation/creneaux/', 
+         views.creneaux_reservation, 
+         name='creneaux_reservation'),
     path('reservation/<int:pk>/confirmation/', 
          views.confirmation_reservation, 
          name='confirmation_reservation'),
@@ -17,6 +21,9 @@ urlpatterns = [
     
     # Tables
     path('tables/', views.gestion_tables, name='gestion_tables'),
+    path('tables/chronologie/', 
+         views.chronologie_tables, 
+         name='chronologie_tables'),
     path('tables/<int:table_id>/toggle/', 
          views.toggle_table, 
          name='toggle_table'),
@@ -34,16 +41,47 @@ urlpatterns = [
     path('tables/<int:table_id>/commande/', 
          views.creer_commande, 
          name='creer_commande'),
+    path('commandes/<int:commande_id>/statut/', 
+         views.avancer_statut, 
+         name='avancer_statut'),
     path('commandes/<int:commande_id>/items/', 
          views.ajouter_items, 
          name='ajouter_items'),
+    path('commandes/<int:commande_id>/panier/', 
+         views.ajouter_panier, 
+         name='ajouter_panier'),
+    
+    # Cuisine
+    path('cuisine/', views.cuisine, name='cuisine'),
+    path('cuisine/flux/', views.flux_cuisine, name='flux_cuisine'),
     
     # Factures
     path('factures/', views.liste_factures, name='liste_factures'),
     path('factures/<int:facture_id>/', 
          views.detail_facture, 
          name='detail_facture'),
+    path('factures/<int:facture_id>/recu.pdf',
+         views.recu_facture,
+         name='recu_facture'),
     path('commandes/<int:commande_id>/facturer/', 
          views.generer_facture, 
          name='generer_facture'),
+    
+    # Exports comptables
+    path('exports/<str:jeu>/', views.exporter, name='exporter'),
+    
+    # API JSON des tablettes
+    path('api/<str:ressource>/', views.api_liste, name='api_liste'),
+    path('api/<str:ressource>/<int:pk>/', views.api_detail, name='api_detail'),
+    
+    # Analyses des ventes (staff)
+    path('analyses/', views.analyses_ventes, name='analyses'),
+    
+    # Performances (staff)
+    path('instrumentation/', 
+         views.instrumentation, 
+         name='instrumentation'),
+    
+    # Supervision
+    path('sante/cache/', views.sante_cache, name='sante_cache'),
 ]
\ No newline at end of file
@@ -0,0 +1,35 @@
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+def bornes_jour(jour):
+    """Intervalle [debut, fin) couvrant le jour `jour` dans le fuseau local.
+
+    A utiliser a la place des lookups `__date`, qui appliquent une fonction
+    a la colonne et empechent l'utilisation des index.
+    """
+    debut = timezone.make_aware(datetime.combine(jour, time.min))
+    fin = timezone.make_aware(datetime.combine(jour + timedelta(days=1), time.min))
+    return debut, fin
+
+
+def incrementer(modele, cles, **deltas):
+    """Ajoute `deltas` aux compteurs de la ligne `cles`, creee au besoin.
+
+    L'UPDATE ... SET champ = champ + delta est atomique et verrouille la
+    ligne jusqu'a la fin de la transaction appelante.
+    """
+    lignes = modele.objects.filter(**cles)
+    increments = {champ: F(champ) + delta for champ, delta in deltas.items()}
+    with transaction.atomic():
+        if lignes.update(**increments):
+            return
+        try:
+            with transaction.atomic():
+                modele.objects.create(**cles, **deltas)
+        except IntegrityError:
+            # Ligne creee entre-temps par une transaction concurrente
+            lignes.update(**increments)
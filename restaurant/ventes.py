@@ -0,0 +1,142 @@
+"""
+Cumul journalier des ventes (VenteJournaliere).
+
+Chaque facture contribue a la ligne (jour d'emission, methode de paiement) :
+nombre de factures et de commandes, couverts, HT, TVA, TTC, et TTC encaisse
+si elle est payee. Les signaux de Facture appliquent la difference entre
+l'ancienne et la nouvelle contribution dans la transaction de la facture,
+par des UPDATE ... SET champ = champ + delta.
+
+Les modifications qui contournent save()/delete() (update() en masse,
+SQL brut) ne sont pas suivies : `reconstruire` (commande
+reconstruire_ventes) recalcule les lignes a partir des factures.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Facture, VenteJournaliere
+from .utils import bornes_jour, incrementer
+
+CHAMPS = (
+    'nombre_factures', 'nombre_commandes', 'couverts',
+    'montant_ht', 'tva', 'montant_ttc', 'montant_encaisse',
+)
+
+
+def _contribution(facture, etat_facture, signe=1):
+    methode, ht, tva, ttc, payee = etat_facture
+    cle = (timezone.localdate(facture.date_emission), methode)
+    return cle, {
+        'nombre_factures': signe,
+        'nombre_commandes': signe,
+        'couverts': signe * facture.commande.couverts,
+        'montant_ht': signe * ht,
+        'tva': signe * tva,
+        'montant_ttc': signe * ttc,
+        'montant_encaisse': signe * ttc if payee else Decimal('0.00'),
+    }
+
+
+def _appliquer(contributions):
+    cumul = {}
+    for cle, deltas in contributions:
+        lignes = cumul.setdefault(cle, dict.fromkeys(CHAMPS, 0))
+        for champ, delta in deltas.items():
+            lignes[champ] += delta
+
+    with transaction.atomic():
+        for (jour, methode), deltas in cumul.items():
+            deltas = {champ: delta for champ, delta in deltas.items() if delta}
+            if deltas:
+                incrementer(
+                    VenteJournaliere,
+                    {'jour': jour, 'methode_paiement': methode},
+                    **deltas
+                )
+
+
+def enregistrer_facture(facture, creee):
+    """Repercute la creation ou la modification de `facture` sur le cumul"""
+    ancien = None if creee else getattr(facture, '_etat_ventes', None)
+    nouveau = facture.etat_ventes()
+    if not creee and ancien is None:
+        # Instance construite a la main, ancien etat inconnu
+        return
+    if ancien != nouveau:
+        contributions = [_contribution(facture, nouveau)]
+        if ancien is not None:
+            contributions.append(_contribution(facture, ancien, signe=-1))
+        _appliquer(contributions)
+    facture._etat_ventes = nouveau
+
+
+def retirer_facture(facture):
+    etat_facture = getattr(facture, '_etat_ventes', None) or facture.etat_ventes()
+    _appliquer([_contribution(facture, etat_facture, signe=-1)])
+
+
+def calculer(depuis=None):
+    """Cumul recalcule a partir des factures : {(jour, methode): {champ: valeur}}"""
+    factures = Facture.objects.order_by()
+    if depuis:
+        factures = factures.filter(date_emission__gte=bornes_jour(depuis)[0])
+    lignes = factures.annotate(
+        jour=TruncDate('date_emission', tzinfo=timezone.get_current_timezone())
+    ).values('jour', 'methode_paiement').annotate(
+        nombre_factures=Count('id'),
+        nombre_commandes=Count('commande', distinct=True),
+        couverts=Sum('commande__couverts'),
+        montant_ht=Sum('montant_total'),
+        somme_tva=Sum('tva'),
+        somme_ttc=Sum('montant_ttc'),
+        montant_encaisse=Sum('montant_ttc', filter=Q(payee=True)),
+    )
+    return {
+        (ligne['jour'], ligne['methode_paiement']): {
+            'nombre_factures': ligne['nombre_factures'],
+            'nombre_commandes': ligne['nombre_commandes'],
+            'couverts': ligne['couverts'] or 0,
+            'montant_ht': ligne['montant_ht'] or Decimal('0.00'),
+            'tva': ligne['somme_tva'] or Decimal('0.00'),
+            'montant_ttc': ligne['somme_ttc'] or Decimal('0.00'),
+            'montant_encaisse': ligne['montant_encaisse'] or Decimal('0.00'),
+        }
+        for ligne in lignes
+    }
+
+
+def reconstruire(depuis=None):
+    """Remplace les lignes du cumul (a partir du jour `depuis`) par le recalcul"""
+    attendu = calculer(depuis)
+    with transaction.atomic():
+        lignes = VenteJournaliere.objects.all()
+        if depuis:
+            lignes = lignes.filter(jour__gte=depuis)
+        lignes.delete()
+        VenteJournaliere.objects.bulk_create(
+            VenteJournaliere(jour=jour, methode_paiement=methode, **valeurs)
+            for (jour, methode), valeurs in attendu.items()
+        )
+    return len(attendu)
+
+
+def ecarts(depuis=None):
+    """Lignes du cumul qui different du recalcul : [(cle, enregistre, attendu)]"""
+    attendu = calculer(depuis)
+    lignes = VenteJournaliere.objects.all()
+    if depuis:
+        lignes = lignes.filter(jour__gte=depuis)
+    enregistre = {
+        (ligne['jour'], ligne['methode_paiement']): {champ: ligne[champ] for champ in CHAMPS}
+        for ligne in lignes.values('jour', 'methode_paiement', *CHAMPS)
+    }
+    vide = dict.fromkeys(CHAMPS, 0)
+    return [
+        (cle, enregistre.get(cle, vide), attendu.get(cle, vide))
+        for cle in sorted(set(enregistre) | set(attendu))
+        if enregistre.get(cle, vide) != attendu.get(cle, vide)
+    ]
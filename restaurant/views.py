@@ -1,12 +1,27 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db.models import Prefetch, Sum
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.decorators.http import condition, require_POST, require_safe
 from .models import *
 from .forms import *
-from datetime import datetime, timedelta
-from decimal import Decimal
+from . import analyses, api, cache_menu, evenements, export, occupation, panier, recus, sante
+from .instrumentation import plus_lentes
+from .caisse import EncaissementImpossible, encaisser
+from .disponibilite import CreneauIndisponible, creneaux_libres, reserver
+from .pagination import paginer
+from .utils import bornes_jour
+from datetime import timedelta
+import json
+import uuid
 
 from django.contrib.auth import logout
 from django.shortcuts import redirect
@@ -15,56 +30,69 @@ def logout_view(request):
     logout(request)
     return redirect('/')
 
+# Les donnees du menu sont passees comme callables : le template ne les
+# evalue que si le fragment HTML correspondant n'est pas deja en cache.
+
+@cache_control(no_cache=True)
+@condition(
+    etag_func=cache_menu.menu_etag,
+    last_modified_func=cache_menu.menu_last_modified
+)
 def index(request):
     """Page d'accueil"""
-    categories = Categorie.objects.all()
-    plats_populaires = Plat.objects.filter(
-        disponible=True
-    )[:6]
-    
     context = {
-        'categories': categories,
-        'plats_populaires': plats_populaires,
+        'categories': cache_menu.categories,
+        'plats_populaires': lambda: cache_menu.plats_disponibles()[:6],
     }
     return render(request, 'restaurant/index.html', context)
 
+@cache_control(no_cache=True)
+@condition(
+    etag_func=cache_menu.menu_etag,
+    last_modified_func=cache_menu.menu_last_modified
+)
 def menu(request):
     """Affichage du menu complet"""
-    categories = Categorie.objects.prefetch_related('plats').all()
-    
     # Filtrage par categorie
     categorie_id = request.GET.get('categorie')
-    if categorie_id:
-        plats = Plat.objects.filter(
-            categorie_id=categorie_id,
-            disponible=True
-        )
-    else:
-        plats = Plat.objects.filter(disponible=True)
+    if categorie_id and not categorie_id.isdigit():
+        categorie_id = None
     
     # Recherche
     search = request.GET.get('search')
-    if search:
-        plats = plats.filter(
-            Q(nom__icontains=search) | 
-            Q(description__icontains=search)
-        )
+    
+    def plats():
+        if search:
+            return cache_menu.rechercher(search, categorie_id)
+        return cache_menu.plats_disponibles(categorie_id)
     
     context = {
-        'categories': categories,
+        'categories': cache_menu.categories,
         'plats': plats,
         'selected_categorie': categorie_id,
+        'menu_version': cache_menu.version_menu(),
+        'menu_cache_duree': cache_menu.duree_cache(),
     }
     return render(request, 'restaurant/menu.html', context)
 
+def recherche_plats(request):
+    """Suggestions de plats pendant la saisie (JSON)"""
+    plats = cache_menu.rechercher(request.GET.get('q', ''))[:10]
+    return JsonResponse({
+        'resultats': [
+            {'id': plat.id, 'nom': plat.nom, 'prix': str(plat.prix)}
+            for plat in plats
+        ]
+    })
+
 @login_required
 def gestion_tables(request):
     """Gestion des tables"""
-    tables = Table.objects.all()
+    # Etat courant de la salle, tenu en cache depuis le journal d'occupation
+    tables = occupation.etat_salle()
     
-    # Tables disponibles
-    tables_disponibles = tables.filter(disponible=True)
-    tables_occupees = tables.filter(disponible=False)
+    tables_disponibles = [table for table in tables if table['disponible']]
+    tables_occupees = [table for table in tables if not table['disponible']]
     
     context = {
         'tables': tables,
@@ -77,10 +105,9 @@ def gestion_tables(request):
 def toggle_table(request, table_id):
     """Changer la disponibilite d'une table"""
     table = get_object_or_404(Table, id=table_id)
-    table.disponible = not table.disponible
-    table.save()
+    disponible = occupation.basculer(table.id)
     
-    status = "disponible" if table.disponible else "occupee"
+    status = "disponible" if disponible else "occupee"
     messages.success(
         request, 
         f"Table {table.numero} est maintenant {status}"
@@ -92,12 +119,17 @@ def reservation(request):
     if request.method == 'POST':
         form = ReservationForm(request.POST)
         if form.is_valid():
-            reservation = form.save()
-            messages.success(
-                request,
-                'Votre reservation a ete enregistree avec succes!'
-            )
-            return redirect('confirmation_reservation', pk=reservation.id)
+            try:
+                # Reverifie la disponibilite sous verrou avant d'enregistrer
+                reservation = reserver(form.save(commit=False))
+            except CreneauIndisponible as e:
+                form.add_error(None, str(e))
+            else:
+                messages.success(
+                    request,
+                    'Votre reservation a ete enregistree avec succes!'
+                )
+                return redirect('confirmation_reservation', pk=reservation.id)
     else:
         form = ReservationForm()
     
@@ -109,6 +141,28 @@ def reservation(request):
     }
     return render(request, 'restaurant/reservation.html', context)
 
+def creneaux_reservation(request):
+    """Tables libres par creneau pour une soiree (JSON)"""
+    personnes = request.GET.get('personnes', '1')
+    personnes = int(personnes) if personnes.isdigit() else 1
+    
+    try:
+        jour = parse_date(request.GET.get('date') or '') or timezone.localdate()
+        libres = creneaux_libres(jour, personnes)
+    except (ValueError, OverflowError):
+        return JsonResponse({'erreurs': ["Date invalide"]}, status=400)
+    creneaux = [
+        {
+            'heure': timezone.localtime(debut).strftime('%H:%M'),
+            'tables': [
+                {'id': table.id, 'numero': table.numero, 'capacite': table.capacite}
+                for table in tables
+            ],
+        }
+        for debut, tables in libres
+    ]
+    return JsonResponse({'date': jour.isoformat(), 'creneaux': creneaux})
+
 def confirmation_reservation(request, pk):
     """Confirmation de reservation"""
     reservation = get_object_or_404(Reservation, pk=pk)
@@ -121,21 +175,34 @@ def confirmation_reservation(request, pk):
 @login_required
 def liste_reservations(request):
     """Liste des reservations"""
-    date_filter = request.GET.get('date')
     statut_filter = request.GET.get('statut')
     
     reservations = Reservation.objects.all()
     
-    if date_filter:
-        reservations = reservations.filter(
-            date_reservation__date=date_filter
-        )
+    try:
+        # Date illisible ou impossible (30 fevrier...) : pas de filtre
+        date_filter = parse_date(request.GET.get('date') or '')
+        if date_filter:
+            debut, fin = bornes_jour(date_filter)
+            reservations = reservations.filter(
+                date_reservation__gte=debut,
+                date_reservation__lt=fin
+            )
+    except (ValueError, OverflowError):
+        pass
     
     if statut_filter:
         reservations = reservations.filter(statut=statut_filter)
     
+    page = paginer(
+        reservations.select_related('table'),
+        'date_reservation',
+        request.GET.get('curseur')
+    )
+    
     context = {
-        'reservations': reservations,
+        'reservations': page,
+        'page': page,
     }
     return render(
         request, 
@@ -156,8 +223,7 @@ def creer_commande(request, table_id):
             commande.serveur = request.user
             commande.save()
             
-            table.disponible = False
-            table.save()
+            occupation.ouvrir(table.id, commande=commande)
             
             messages.success(
                 request,
@@ -176,7 +242,7 @@ def creer_commande(request, table_id):
 @login_required
 def ajouter_items(request, commande_id):
     """Ajouter des items a une commande"""
-    commande = get_object_or_404(Commande, id=commande_id)
+    commande = get_object_or_404(Commande.objects.avec_table_serveur(), id=commande_id)
     
     if request.method == 'POST':
         form = ItemCommandeForm(request.POST)
@@ -193,39 +259,143 @@ def ajouter_items(request, commande_id):
     else:
         form = ItemCommandeForm()
     
-    items = commande.items.all()
-    total = commande.total()
-    
+    return _page_ajouter_items(request, commande, form, _formset_panier())
+
+def _formset_panier(data=None):
+    plats = [
+        (plat.id, f"{plat.nom} - {plat.prix:.0f} FCFA")
+        for plat in cache_menu.plats_disponibles()
+    ]
+    return PanierFormSet(data, prefix='panier', form_kwargs={'plats': plats})
+
+def _page_ajouter_items(request, commande, form, panier):
     context = {
         'form': form,
+        'panier': panier,
         'commande': commande,
-        'items': items,
-        'total': total,
+        'items': commande.items.avec_sous_totaux(),
+        'total': commande.total(),
     }
     return render(request, 'restaurant/ajouter_items.html', context)
 
+@login_required
+@require_POST
+def ajouter_panier(request, commande_id):
+    """Ajouter plusieurs plats en une fois : JSON ou formulaire multiple.
+
+    JSON : {"items": [{"plat": 3, "quantite": 2, "notes": ""}, ...]}, reponse
+    JSON avec les items crees et le nouveau total (400 si invalide).
+    """
+    if request.content_type == 'application/json':
+        try:
+            donnees = json.loads(request.body)
+            items, total, nombre = panier.ajouter(
+                commande_id, panier.normaliser(donnees.get('items'))
+            )
+        except (ValueError, AttributeError):
+            return JsonResponse({'erreurs': ["JSON invalide"]}, status=400)
+        except panier.PanierInvalide as e:
+            return JsonResponse({'erreurs': e.erreurs}, status=400)
+        return JsonResponse({
+            'commande': commande_id,
+            'items': [
+                {
+                    'id': item.pk,
+                    'plat': item.plat_id,
+                    'nom': item.plat.nom,
+                    'quantite': item.quantite,
+                    'prix_unitaire': item.prix_unitaire,
+                    'notes': item.notes,
+                }
+                for item in items
+            ],
+            'total': total,
+            'nombre_items': nombre,
+        }, status=201)
+    
+    formset = _formset_panier(request.POST)
+    if formset.is_valid():
+        lignes = [
+            (ligne['plat'], ligne['quantite'], ligne['notes'])
+            for ligne in formset.cleaned_data if ligne.get('plat')
+        ]
+        try:
+            items, total, nombre = panier.ajouter(commande_id, lignes)
+        except panier.PanierInvalide as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, f'{len(items)} plat(s) ajoute(s)')
+            return redirect('ajouter_items', commande_id=commande_id)
+    
+    commande = get_object_or_404(Commande.objects.avec_table_serveur(), id=commande_id)
+    return _page_ajouter_items(request, commande, ItemCommandeForm(), formset)
+
 @login_required
 def liste_commandes(request):
     """Liste des commandes"""
     statut_filter = request.GET.get('statut')
     
-    commandes = Commande.objects.select_related(
-        'table', 'serveur'
-    ).prefetch_related('items__plat')
+    commandes = Commande.objects.avec_table_serveur().avec_lignes()
     
     if statut_filter:
         commandes = commandes.filter(statut=statut_filter)
     
+    page = paginer(commandes, 'date_creation', request.GET.get('curseur'))
+    
     context = {
-        'commandes': commandes,
+        'commandes': page,
+        'page': page,
     }
     return render(request, 'restaurant/liste_commandes.html', context)
 
+@login_required
+@require_POST
+def avancer_statut(request, commande_id):
+    """Passer une commande a l'etape suivante (cuisine puis salle)"""
+    commande = get_object_or_404(Commande, id=commande_id)
+    suivant = {'EN_COURS': 'PRETE', 'PRETE': 'SERVIE'}.get(commande.statut)
+    
+    if suivant:
+        commande.statut = suivant
+        commande.save()
+        messages.success(
+            request,
+            f'Commande #{commande.id} : {commande.get_statut_display()}'
+        )
+    suivante = request.POST.get('suivant')
+    if not url_has_allowed_host_and_scheme(
+        suivante, allowed_hosts={request.get_host()}, require_https=request.is_secure()
+    ):
+        suivante = 'cuisine'
+    return redirect(suivante)
+
+@login_required
+def cuisine(request):
+    """Ecran cuisine : commandes en cours, mises a jour en direct"""
+    commandes = Commande.objects.filter(
+        statut__in=['EN_COURS', 'PRETE']
+    ).select_related('table').prefetch_related('items__plat').order_by('date_creation')
+    
+    return render(request, 'restaurant/cuisine.html', {'commandes': commandes})
+
+@login_required
+async def flux_cuisine(request):
+    """Flux Server-Sent Events des commandes (vue asynchrone)"""
+    async def flux():
+        yield 'retry: 3000\n\n'
+        async for evenement in evenements.get_bus().abonner(battement=15):
+            yield evenements.format_sse(evenement)
+    
+    response = StreamingHttpResponse(flux(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required
 def detail_commande(request, commande_id):
     """Detail d'une commande"""
     commande = get_object_or_404(
-        Commande.objects.prefetch_related('items__plat'),
+        Commande.objects.avec_table_serveur().avec_lignes(),
         id=commande_id
     )
     
@@ -239,39 +409,47 @@ def detail_commande(request, commande_id):
 @login_required
 def generer_facture(request, commande_id):
     """Generer une facture"""
-    commande = get_object_or_404(Commande, id=commande_id)
-    
-    total = commande.total()                     # total est déjà un Decimal
-    tva_rate = Decimal("0.18")                  # taux de TVA en Decimal
-    
-    tva = total * tva_rate                       # OK
-    ttc = total + tva                            # OK
-    
     if request.method == 'POST':
-        methode_paiement = request.POST.get('methode_paiement')
-        
-        facture = Facture.objects.create(
-            commande=commande,
-            methode_paiement=methode_paiement
-        )
-        
-        commande.statut = 'PAYEE'
-        commande.save()
-        
-        commande.table.disponible = True
-        commande.table.save()
+        try:
+            facture, creee = encaisser(
+                commande_id,
+                request.POST.get('methode_paiement'),
+                request.POST.get('cle_idempotence')
+            )
+        except EncaissementImpossible as e:
+            messages.error(request, str(e))
+            return redirect('generer_facture', commande_id=commande_id)
         
-        messages.success(
-            request,
-            f'Facture {facture.numero_facture} generee'
-        )
+        if creee:
+            messages.success(
+                request,
+                f'Facture {facture.numero_facture} generee'
+            )
+        else:
+            messages.info(
+                request,
+                f'Facture {facture.numero_facture} deja generee'
+            )
         return redirect('detail_facture', facture_id=facture.id)
     
+    commande = get_object_or_404(
+        Commande.objects.avec_table_serveur(),
+        id=commande_id
+    )
+    facture = Facture.objects.filter(commande=commande).first()
+    if facture is not None:
+        return redirect('detail_facture', facture_id=facture.id)
+    
+    total = commande.total()
+    tva = total * Facture.TAUX_TVA
+    ttc = total + tva
+    
     context = {
         'commande': commande,
         'total': total,
         'tva': tva,
         'ttc': ttc,
+        'cle_idempotence': uuid.uuid4().hex,
     }
     return render(request, 'restaurant/generer_facture.html', context)
 
@@ -281,7 +459,9 @@ def generer_facture(request, commande_id):
 def detail_facture(request, facture_id):
     """Detail d'une facture"""
     facture = get_object_or_404(
-        Facture.objects.select_related('commande__table'),
+        Facture.objects.select_related('commande__table', 'commande__serveur').prefetch_related(
+            Prefetch('commande__items', queryset=ItemCommande.objects.avec_sous_totaux())
+        ),
         id=facture_id
     )
     
@@ -290,20 +470,34 @@ def detail_facture(request, facture_id):
     }
     return render(request, 'restaurant/detail_facture.html', context)
 
+@login_required
+def recu_facture(request, facture_id):
+    """Recu PDF d'une facture, rendu une fois puis relu du stockage"""
+    donnees = recus.lire(pk=facture_id)
+    if not donnees:
+        raise Http404("Facture introuvable")
+    chemin, _ = recus.enregistrer(donnees, processus=1)
+    return FileResponse(
+        default_storage.open(chemin, 'rb'),
+        content_type='application/pdf',
+        filename=f"recu-{donnees[0]['numero']}.pdf"
+    )
+
 @login_required
 def liste_factures(request):
     """Liste des factures"""
-    factures = Facture.objects.select_related(
-        'commande__table'
-    ).order_by('-date_emission')
+    factures = Facture.objects.select_related('commande__table')
     
-    # Statistiques
-    total_factures = factures.aggregate(
+    # Statistiques, lues dans le cumul journalier
+    total_factures = VenteJournaliere.objects.aggregate(
         Sum('montant_ttc')
     )['montant_ttc__sum'] or 0
     
+    page = paginer(factures, 'date_emission', request.GET.get('curseur'))
+    
     context = {
-        'factures': factures,
+        'factures': page,
+        'page': page,
         'total_factures': total_factures,
     }
     return render(request, 'restaurant/liste_factures.html', context)
@@ -311,35 +505,135 @@ def liste_factures(request):
 @login_required
 def dashboard(request):
     """Tableau de bord"""
-    today = datetime.now().date()
+    aujourd_hui = timezone.localdate()
+    debut, fin = bornes_jour(aujourd_hui)
     
     # Statistiques du jour
     commandes_jour = Commande.objects.filter(
-        date_creation__date=today
+        date_creation__gte=debut,
+        date_creation__lt=fin
     )
     
     reservations_jour = Reservation.objects.filter(
-        date_reservation__date=today
+        date_reservation__gte=debut,
+        date_reservation__lt=fin
     )
     
-    factures_jour = Facture.objects.filter(
-        date_emission__date=today
+    ventes_jour = VenteJournaliere.objects.filter(jour=aujourd_hui).aggregate(
+        Sum('montant_ttc'),
+        Sum('couverts')
     )
     
-    chiffre_affaires_jour = factures_jour.aggregate(
-        Sum('montant_ttc')
-    )['montant_ttc__sum'] or 0
+    chiffre_affaires_jour = ventes_jour['montant_ttc__sum'] or 0
     
-    tables_occupees = Table.objects.filter(
-        disponible=False
-    ).count()
+    tables_occupees = sum(
+        not table['disponible'] for table in occupation.etat_salle()
+    )
     
     context = {
         'commandes_jour': commandes_jour.count(),
         'reservations_jour': reservations_jour.count(),
         'chiffre_affaires_jour': chiffre_affaires_jour,
+        'couverts_jour': ventes_jour['couverts__sum'] or 0,
         'tables_occupees': tables_occupees,
-        'commandes_recentes': commandes_jour[:5],
+        'commandes_recentes': commandes_jour.avec_table_serveur()[:5],
         'reservations_recentes': reservations_jour[:5],
     }
-    return render(request, 'restaurant/dashboard.html', context)
\ No newline at end of file
+    return render(request, 'restaurant/dashboard.html', context)
+
+@login_required
+def exporter(request, jeu):
+    """Export CSV (ou CSV pour Excel) d'une periode, envoye au fil de l'eau"""
+    if jeu not in export.JEUX:
+        raise Http404("Export inconnu")
+    
+    du, au = export.periode_par_defaut()
+    try:
+        du = parse_date(request.GET.get('du') or '') or du
+        au = parse_date(request.GET.get('au') or '') or au
+        # Verifie la periode avant de commencer a envoyer le fichier
+        export.bornes(du, au)
+    except (ValueError, OverflowError):
+        return HttpResponse("Date invalide, format attendu : AAAA-MM-JJ", status=400)
+    format_export = request.GET.get('format')
+    if format_export not in export.FORMATS:
+        format_export = 'csv'
+    
+    response = StreamingHttpResponse(
+        export.flux(jeu, du, au, format_export),
+        content_type='text/csv; charset=utf-8'
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{export.nom_fichier(jeu, du, au)}"'
+    )
+    return response
+
+@staff_member_required
+def analyses_ventes(request):
+    """Analyses des ventes d'une periode (30 derniers jours par defaut)"""
+    try:
+        au = parse_date(request.GET.get('au') or '') or timezone.localdate()
+        du = parse_date(request.GET.get('du') or '') or au - timedelta(days=29)
+        if du > au:
+            du, au = au, du
+        bornes_jour(au)
+        premier = au - timedelta(days=analyses.PERIODE_MAX - 1)
+    except (ValueError, OverflowError):
+        return HttpResponse("Date invalide, format attendu : AAAA-MM-JJ", status=400)
+    if du < premier:
+        messages.warning(
+            request, f"Periode limitee a {analyses.PERIODE_MAX} jours : depuis le {premier:%d/%m/%Y}"
+        )
+        du = premier
+    
+    context = {'rapport': analyses.rapport(du, au)}
+    return render(request, 'restaurant/analyses.html', context)
+
+@staff_member_required
+def instrumentation(request):
+    """Requetes les plus lentes mesurees par InstrumentationMiddleware"""
+    if request.method == 'POST':
+        plus_lentes.vider()
+        return redirect('instrumentation')
+    
+    context = {
+        'mesures': plus_lentes.lister(),
+        'echantillon': getattr(settings, 'INSTRUMENTATION_ECHANTILLON', 0),
+    }
+    return render(request, 'restaurant/instrumentation.html', context)
+
+
+@login_required
+@require_safe
+def chronologie_tables(request):
+    """Occupation de toutes les tables sur une soiree (JSON), pour le plan de salle"""
+    try:
+        jour = parse_date(request.GET.get('date') or '') or timezone.localdate()
+        debut, fin = occupation.soiree(jour)
+    except (ValueError, OverflowError):
+        return JsonResponse({'erreurs': ["Date invalide"]}, status=400)
+    return JsonResponse({
+        'date': jour.isoformat(),
+        'debut': debut,
+        'fin': fin,
+        'tables': occupation.chronologie(debut, fin),
+    })
+
+
+@require_safe
+def api_liste(request, ressource):
+    """API JSON des tablettes : liste paginee (voir api.py)"""
+    return api.repondre(request, ressource)
+
+
+@require_safe
+def api_detail(request, ressource, pk):
+    return api.repondre(request, ressource, pk)
+
+
+@never_cache
+def sante_cache(request):
+    """Sonde du cache : 503 si un cache ne repond pas"""
+    etat = sante.etat_caches()
+    ok = all(cache['ok'] for cache in etat['caches'].values())
+    return JsonResponse(etat, status=200 if ok else 503)
@@ -66,6 +66,7 @@ STATICFILES_DIRS = [
 ]
 
 MIDDLEWARE = [
+    'restaurant.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -76,11 +77,15 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Part des requetes mesurees par InstrumentationMiddleware (0 = aucune)
+INSTRUMENTATION_ECHANTILLON = float(os.environ.get('INSTRUMENTATION_ECHANTILLON', '0'))
+
 ROOT_URLCONF = 'restaurant_management.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Moteur Django, avec mesure du rendu pour InstrumentationMiddleware
+        'BACKEND': 'restaurant.instrumentation.DjangoTemplatesMesures',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -103,10 +108,94 @@ WSGI_APPLICATION = 'restaurant_management.wsgi.application'
 DATABASES = {
     'default': dj_database_url.config(
         default='sqlite:///db.sqlite3',
-        conn_max_age=600
+        conn_max_age=600,
+        conn_health_checks=True
     )
 }
 
+# SQLite en production (petites succursales sous gunicorn), reglages
+# appliques a chaque nouvelle connexion :
+# - journal WAL : les lectures ne bloquent plus les ecritures ni l'inverse ;
+#   synchronous=NORMAL y reste sur en cas de crash applicatif ;
+# - busy_timeout : attendre le verrou plutot que lever "database is locked" ;
+# - transactions IMMEDIATE : le verrou d'ecriture est pris des le BEGIN. En
+#   mode DEFERRED, une transaction qui a lu puis veut ecrire echoue
+#   aussitot si une autre ecrit, sans attendre (busy_timeout ignore) ;
+# - mmap et cache de pages : lectures servies depuis la memoire.
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', '20000'))
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-32000',
+    'PRAGMA temp_store=MEMORY',
+]
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['OPTIONS'] = {
+        'init_command': ';'.join(SQLITE_PRAGMAS),
+        'transaction_mode': 'IMMEDIATE',
+    }
+
+# Base de test SQLite sur disque plutot qu'en memoire partagee : les tests
+# de concurrence (plusieurs connexions) ont besoin du verrouillage reel
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['TEST'] = {
+        'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+    }
+
+
+# Cache
+# CACHE_BACKEND :
+# - locmem (defaut) : memoire de chaque worker, rien n'est partage ;
+# - file : dossier CACHE_DOSSIER, partage par les workers d'un meme hote ;
+# - redis : serveur CACHE_URL (Redis ou compatible, paquet `redis` requis).
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('CACHE_URL', 'redis://127.0.0.1:6379/0'),
+            'KEY_PREFIX': 'restaurant',
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DOSSIER', os.path.join(BASE_DIR, 'cache')),
+            'KEY_PREFIX': 'restaurant',
+            # Chaque ecriture declenche le nettoyage au-dela de MAX_ENTRIES,
+            # qui parcourt tout le dossier : seuil large
+            'OPTIONS': {'MAX_ENTRIES': 20000, 'CULL_FREQUENCY': 4},
+        }
+    }
+elif CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'restaurant',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+else:
+    raise ValueError(f"CACHE_BACKEND inconnu : {CACHE_BACKEND!r} (locmem, file ou redis)")
+
+# Sessions et utilisateurs connectes ne passent par le cache que s'il est
+# partage : avec un cache par worker, une deconnexion ou un compte
+# desactive resteraient valides dans le cache des autres workers
+CACHE_PARTAGE = CACHE_BACKEND != 'locmem'
+
+if CACHE_PARTAGE:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    AUTHENTICATION_BACKENDS = ['restaurant.authentification.UtilisateurCacheBackend']
+
+# Duree de vie (s) d'un utilisateur en cache ; les modifications faites par
+# save() l'invalident aussitot, celles faites par update() au bout de ce delai
+UTILISATEUR_CACHE_DUREE = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -143,6 +232,28 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'index'
 
+# E-mails (confirmations de reservation, via la file de taches). Par defaut
+# un serveur SMTP local de developpement : python -m aiosmtpd -n -l localhost:1025
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', '1025'))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'False') == 'True'
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'Restaurant Pro <reservations@localhost>')
+
+# File de taches (restaurant/taches.py, manage.py runworker)
+# Bail (s) d'une tache en cours : au-dela, le travailleur est suppose mort
+TACHES_BAIL = 300
+# Attente (s) d'un travailleur entre deux tours sans tache prete
+TACHES_ATTENTE = 1.0
+# Intervalle (s) de reprise des baux expires et de purge
+TACHES_ENTRETIEN = 60
+TACHES_CONSERVATION_JOURS = 7
+
+# Duree (s) de conservation en cache des analyses d'un jour clos
+# (restaurant/analyses.py)
+ANALYSES_CACHE_DUREE = 30 * 24 * 3600
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 